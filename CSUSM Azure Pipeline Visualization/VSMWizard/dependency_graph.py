@@ -0,0 +1,130 @@
+"""Ordering of the pipeline dependency graph.
+
+Pipelines that depend on each other in a loop are collapsed into one group
+(a strongly connected component) first, so the rest of the graph can be put
+in dependency order in linear time and the loop stays together.
+"""
+import heapq
+
+
+def strongly_connected_components(successors):
+    """Finds the strongly connected components of a graph (Tarjan).
+
+    Iterative, so long dependency chains don't hit the recursion limit.
+
+    Args:
+        successors (list): The nodes each node points at, nodes numbered from 0
+
+    Returns:
+        list: The components, each a list of nodes. A component comes after
+        every component it points at.
+    """
+    node_count = len(successors)
+    visit_order = [None] * node_count
+    low = [0] * node_count
+    on_stack = [False] * node_count
+    stack = []
+    components = []
+    counter = 0
+
+    for start in range(node_count):
+        if visit_order[start] is not None:
+            continue
+        visit_order[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack[start] = True
+        work = [(start, 0)]
+
+        while work:
+            node, edge = work[-1]
+            if edge < len(successors[node]):
+                work[-1] = (node, edge + 1)
+                target = successors[node][edge]
+                if visit_order[target] is None:
+                    visit_order[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = True
+                    work.append((target, 0))
+                elif on_stack[target] and visit_order[target] < low[node]:
+                    low[node] = visit_order[target]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[node] < low[parent]:
+                    low[parent] = low[node]
+            if low[node] == visit_order[node]:
+                members = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    members.append(member)
+                    if member == node:
+                        break
+                components.append(members)
+    return components
+
+
+def dependency_order(ranks, edges):
+    """Orders nodes so each comes after everything it depends on.
+
+    Loops are kept together as one group. Nodes are taken one chain at a
+    time: a node with no dependencies, then everything that becomes ready
+    once it is placed, lowest rank first, before the next chain starts.
+
+    Args:
+        ranks (list): Sort key of each node, lower ranks go first when there is a choice
+        edges (list): (dependency, dependent) pairs
+
+    Returns:
+        tuple: The groups of nodes in order, each a list of nodes in rank
+        order, and a flag for each group that is True if the group is a loop
+        (more than one node, or a node that depends on itself).
+    """
+    node_count = len(ranks)
+    successors = [[] for _ in range(node_count)]
+    looped = [False] * node_count
+    for source, target in edges:
+        successors[source].append(target)
+        if source == target:
+            looped[source] = True
+
+    components = strongly_connected_components(successors)
+    component_of = [0] * node_count
+    for number, members in enumerate(components):
+        members.sort(key=ranks.__getitem__)
+        for member in members:
+            component_of[member] = number
+    component_rank = [ranks[members[0]] for members in components]
+
+    component_successors = [[] for _ in components]
+    waiting = [0] * len(components)
+    for source, target in edges:
+        source_component = component_of[source]
+        target_component = component_of[target]
+        if source_component != target_component:
+            component_successors[source_component].append(target_component)
+            waiting[target_component] += 1
+
+    roots = sorted(
+        (number for number in range(len(components)) if waiting[number] == 0),
+        key=component_rank.__getitem__,
+    )
+
+    ordered = []
+    for root in roots:
+        chain = [(component_rank[root], root)]
+        while chain:
+            _, number = heapq.heappop(chain)
+            ordered.append(number)
+            for successor in component_successors[number]:
+                waiting[successor] -= 1
+                if waiting[successor] == 0:
+                    heapq.heappush(chain, (component_rank[successor], successor))
+
+    groups = [components[number] for number in ordered]
+    loops = [len(group) > 1 or looped[group[0]] for group in groups]
+    return groups, loops
@@ -0,0 +1,35 @@
+// edge_highlight.js
+// Embedded at the end of the VSM by addHighlightScript(). Highlights the
+// dependency lines going into a card while the mouse is over it.
+
+(function () {
+  // Card id -> the lines going into it, from the lines' data-target
+  const incoming = {};
+  const edges = document.querySelectorAll("line.edge");
+  for (let i = 0; i < edges.length; i++) {
+    const target = edges[i].getAttribute("data-target");
+    if (!incoming[target]) {
+      incoming[target] = [];
+    }
+    incoming[target].push(edges[i]);
+  }
+
+  /**
+   * @name highlight
+   * @description Adds or removes the highlight class on the lines into the card under the mouse
+   * @param {Event} evt
+   * @param {boolean} on
+   * @returns {void}
+   */
+  function highlight(evt, on) {
+    const lines = incoming[evt.target.id];
+    if (!lines) return;
+    for (let i = 0; i < lines.length; i++) {
+      lines[i].classList.toggle("highlight", on);
+    }
+  }
+
+  // One listener for the whole VSM instead of one per card
+  document.documentElement.addEventListener("mouseover", function (evt) { highlight(evt, true); });
+  document.documentElement.addEventListener("mouseout", function (evt) { highlight(evt, false); });
+})();
@@ -0,0 +1,61 @@
+"""Where the line from one card to another goes.
+
+A dependency line is drawn in two segments: the first runs from the card
+depended on to a point just off the dependent card, the second from there to
+the edge of the dependent card, where the arrowhead is. The line leaves the
+right edge of the source card and comes into the left edge of the target,
+unless the target isn't far enough to the right; then it leaves from the
+top or bottom of the source and comes in from above or below the target.
+
+The VSM is drawn with these points, and they are worked out again the same
+way when cards are moved after the fact.
+"""
+
+# How far off the target card the first segment ends
+EDGE_GAP = 30
+
+
+def route(source, target, width, height, gap=EDGE_GAP):
+    """Returns the points of the line from one card to another.
+
+    Args:
+        source (tuple): x and y of the top left corner of the card depended on
+        target (tuple): x and y of the top left corner of the dependent card
+        width (float): Width of a card
+        height (float): Height of a card
+        gap (float): How far off the target card the first segment ends
+
+    Returns:
+        tuple: The start of the line, the end of the first segment and the
+        end of the second one, each an (x, y) tuple
+    """
+    source_x, source_y = source
+    target_x, target_y = target
+
+    # Line begins at the right edge of the dependency
+    start = (source_x + width, source_y + (height / 2))
+    # Line ends at the left edge of the new pipeline, the arrow right on it
+    end = (target_x - gap, target_y + (height / 2))
+    end_arrow = (target_x, target_y + (height / 2))
+
+    # Depending on where the second box is, it will detect if it is not to the
+    # right then below or above the previous pipeline box
+    if target_x - gap < source_x + width:
+        if target_y > source_y:
+            # Line begins from the bottom middle of the dependency
+            start = (source_x + (width / 2), source_y + height)
+        else:
+            # Line begins from the top middle of the dependency
+            start = (source_x + (width / 2), source_y)
+
+    # If the middle of the second box is to the left of the right edge of the
+    # first box, it will connect to the top or bottom
+    if target_x + (width / 2) < source_x + width:
+        if target_y > source_y:
+            end = (target_x + (width / 2), target_y - gap)
+            end_arrow = (target_x + (width / 2), target_y)
+        else:
+            end = (target_x + (width / 2), target_y + height + gap)
+            end_arrow = (target_x + (width / 2), target_y + height)
+
+    return start, end, end_arrow
@@ -0,0 +1,339 @@
+"""Ids of the cards and dependency lines on a VSM, and the index of them.
+
+A card's id comes from the name of its pipeline, the same name the
+dependencies refer to it by, so it stays the same when the card moves and
+when the VSM is generated again. Pipelines that share a name, like the ones
+whose file couldn't be read, are numbered in the order they are drawn, and
+every one after the first has its number added to the id. Coordinates are
+only kept in the x and y attributes. A line's id is made of the ids of the
+two cards it joins.
+
+Every VSM carries an index of its cards and lines as a JSON script with the
+id "vsmIndex", so a card's pipeline and position, and the lines between
+cards, can be looked up by id without searching the document.
+
+VSMs made before the ids were stable named cards after their coordinates,
+"rect_0_0", and lines after those, "post_rect_0_0_pre_rect_400_0-SegmentA".
+migrate_svg() and migrate_positions() bring those files up to date.
+"""
+import hashlib
+import json
+import re
+import weakref
+
+from VSMWizard.pipeline_index import name_key
+
+SVG_NAMESPACE = "{http://www.w3.org/2000/svg}"
+
+# Id of the script holding the index
+INDEX_ID = "vsmIndex"
+# Hex digits of the name hash kept in a card id
+CARD_HASH_LENGTH = 12
+
+# Ids of VSMs made before the ids were stable
+LEGACY_CARD_ID = re.compile(r"rect_-?\d+_-?\d+$")
+LEGACY_EDGE_ID = re.compile(r"post_(rect_-?\d+_-?\d+)_pre_(rect_-?\d+_-?\d+)(.*)$")
+
+# Per drawing, dropped along with the drawing
+_indexes = weakref.WeakKeyDictionary()
+_cards = weakref.WeakKeyDictionary()
+
+
+def card_id(name, occurrence=1):
+    """Returns the id of the card of a pipeline.
+
+    Names that only differ in case get the same id, like they are the same
+    pipeline everywhere else.
+
+    Args:
+        name (str): Name of the pipeline, None for no name
+        occurrence (int): Which of the pipelines with this name it is, from 1
+
+    Returns:
+        str: "card_" and a hash of the name, then "_<occurrence>" after the first
+    """
+    key = name_key(name) or ""
+    cardId = "card_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:CARD_HASH_LENGTH]
+    if occurrence > 1:
+        cardId += f"_{occurrence}"
+    return cardId
+
+
+def next_card_id(counts, name, report=True):
+    """Returns the id of the next card for a pipeline name.
+
+    Args:
+        counts (dict): How many cards each name has had so far, updated
+        name (str): Name of the pipeline, None for no name
+        report (bool): Whether to print a warning when the name is taken
+
+    Returns:
+        str: The card id
+    """
+    key = name_key(name)
+    counts[key] = counts.get(key, 0) + 1
+    cardId = card_id(name, counts[key])
+    if report and counts[key] > 1:
+        print(f"Warning: more than one pipeline is named {name}, card {counts[key]} of them gets the id {cardId}")
+    return cardId
+
+
+def pipeline_card(canvas, pipeline):
+    """Returns the id of a pipeline's card on a drawing, giving it one the first time.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+        pipeline (Pipeline): The pipeline
+
+    Returns:
+        str: The card id
+    """
+    cards = _cards.get(canvas)
+    if cards is None:
+        cards = _cards[canvas] = ({}, {})
+    ids, counts = cards
+    cardId = ids.get(pipeline)
+    if cardId is None:
+        cardId = ids[pipeline] = next_card_id(counts, pipeline.getName())
+    return cardId
+
+
+def assign_cards(canvas, pipelines):
+    """Gives the pipelines on a drawing their card ids, in list order.
+
+    Pipelines that already have an id on the drawing keep it, so the ids can
+    be given in config order before the pipelines are sorted.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+        pipelines (list): The pipelines
+
+    Returns:
+        dict: The card id of each pipeline
+    """
+    return {pipeline: pipeline_card(canvas, pipeline) for pipeline in pipelines}
+
+
+def edge_id(source, target):
+    """Returns the id of the line from one card to another.
+
+    The segments of the line add "-SegmentA" and "-SegmentB" to it.
+
+    Args:
+        source (str): Id of the card the line starts at
+        target (str): Id of the card the line points to
+
+    Returns:
+        str: "post_<source>_pre_<target>"
+    """
+    return f"post_{source}_pre_{target}"
+
+
+def new_index():
+    """Returns an empty index."""
+    return {"cards": {}, "edges": {}}
+
+
+def index(canvas):
+    """Returns the index of what has been drawn on a drawing.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+
+    Returns:
+        dict: "cards" maps card ids to their pipeline, x and y, "edges" maps
+        line ids to the cards they join
+    """
+    entries = _indexes.get(canvas)
+    if entries is None:
+        entries = _indexes[canvas] = new_index()
+    return entries
+
+
+def add_card(entries, card, pipeline, x, y):
+    """Adds a card to an index, replacing any card with the same id."""
+    entries["cards"][card] = {"pipeline": pipeline, "x": x, "y": y}
+
+
+def add_edge(entries, edge, source, target):
+    """Adds a line to an index."""
+    entries["edges"][edge] = {"source": source, "target": target}
+
+
+def index_json(entries):
+    """Writes an index as JSON that can go in a script element.
+
+    ">" only appears inside strings in JSON, escaping it there keeps "]]>"
+    out of the script's CDATA section.
+    """
+    return json.dumps(entries, separators=(",", ":")).replace(">", "\\u003e")
+
+
+def read_index(root):
+    """Returns the index of a VSM read with ElementTree.
+
+    Args:
+        root (xml.etree.ElementTree.Element): The svg element
+
+    Returns:
+        dict: The index, None if the VSM has none or it can't be read
+    """
+    script = _index_script(root)
+    if script is None or not script.text:
+        return None
+    try:
+        return json.loads(script.text)
+    except json.JSONDecodeError as e:
+        print(f"Could not read the index of the VSM: {e}")
+        return None
+
+
+def write_index(root, entries):
+    """Puts an index into a VSM read with ElementTree, replacing the one it has."""
+    script = _index_script(root)
+    if script is None:
+        script = root.makeelement(SVG_NAMESPACE + "script", {"id": INDEX_ID, "type": "application/json"})
+        root.append(script)
+    script.text = index_json(entries)
+
+
+def build_index(root):
+    """Makes the index of a VSM read with ElementTree from its elements.
+
+    Cards are the rects with a data-pipeline attribute, lines are the first
+    segments with data-source and data-target attributes.
+
+    Args:
+        root (xml.etree.ElementTree.Element): The svg element
+
+    Returns:
+        dict: The index
+    """
+    entries = new_index()
+    for element in root.iter():
+        tag = element.tag
+        if tag == SVG_NAMESPACE + "rect" and element.get("data-pipeline") is not None:
+            add_card(
+                entries,
+                element.get("id"),
+                element.get("data-pipeline"),
+                parse_number(element.get("x", "0")),
+                parse_number(element.get("y", "0")),
+            )
+        elif tag == SVG_NAMESPACE + "line" and element.get("data-source") is not None:
+            edge = element.get("id", "")
+            if edge.endswith("-SegmentA"):
+                add_edge(entries, edge[: -len("-SegmentA")], element.get("data-source"), element.get("data-target"))
+    return entries
+
+
+def migrate_svg(root):
+    """Renames the coordinate ids of a VSM read with ElementTree to stable ids.
+
+    A card's pipeline is the text of the link on it. Lines get data-source
+    and data-target attributes if they don't have them, and the VSM gets an
+    index if it doesn't have one. VSMs with stable ids are left as they are.
+
+    Args:
+        root (xml.etree.ElementTree.Element): The svg element
+
+    Returns:
+        dict: The new id of each card that was renamed, by its old id
+    """
+    renamed = migrate_cards(root)
+    if renamed:
+        migrate_edges(root, renamed)
+    if renamed or _index_script(root) is None:
+        write_index(root, build_index(root))
+    return renamed
+
+
+def migrate_cards(root, report=True, counts=None):
+    """Gives the cards in a VSM, or in part of one, stable ids.
+
+    Cards that share a pipeline name are numbered in document order.
+
+    Args:
+        root (xml.etree.ElementTree.Element): The svg element, or any element in it
+        report (bool): Whether to print the cards with no pipeline name or a taken one
+        counts (dict): Cards per name so far, shared by the parts of one VSM
+
+    Returns:
+        dict: The new id of each card that was renamed, by its old id
+    """
+    if counts is None:
+        counts = {}
+    renamed = {}
+    for group in root.iter(SVG_NAMESPACE + "g"):
+        for rect in group.findall(SVG_NAMESPACE + "rect"):
+            oldId = rect.get("id", "")
+            if not LEGACY_CARD_ID.match(oldId):
+                continue
+            name = rect.get("data-pipeline")
+            if name is None:
+                link = group.find(f"{SVG_NAMESPACE}a/{SVG_NAMESPACE}text")
+                if link is None or link.text is None:
+                    if report:
+                        print(f"No pipeline name found for {oldId}, its id is left as it is")
+                    continue
+                name = link.text
+                rect.set("data-pipeline", name)
+            renamed[oldId] = next_card_id(counts, name, report)
+            rect.set("id", renamed[oldId])
+    return renamed
+
+
+def migrate_edges(root, renamed):
+    """Renames the lines in a VSM, or in part of one, after the cards they join.
+
+    Args:
+        root (xml.etree.ElementTree.Element): The svg element, or any element in it
+        renamed (dict): The new card ids by old id, from migrate_cards()
+    """
+    for element in root.iter():
+        match = LEGACY_EDGE_ID.match(element.get("id", ""))
+        if match is None:
+            continue
+        source, target, suffix = match.groups()
+        source = renamed.get(source, source)
+        target = renamed.get(target, target)
+        element.set("id", edge_id(source, target) + suffix)
+        if element.tag == SVG_NAMESPACE + "line":
+            element.set("data-source", source)
+            element.set("data-target", target)
+
+
+def migrate_positions(entries, renamed, cards):
+    """Brings saved positions from before the ids were stable up to date.
+
+    Entries of renamed cards get their new id, and entries without a
+    pipeline get the one from the index, so generate can pin them.
+
+    Args:
+        entries (list): The saved {"id", "x", "y"} entries
+        renamed (dict): The new card ids by old id, from migrate_svg()
+        cards (dict): The cards of the VSM's index
+
+    Returns:
+        list: The entries, updated in place
+    """
+    for entry in entries:
+        card = renamed.get(entry.get("id"), entry.get("id"))
+        entry["id"] = card
+        if entry.get("pipeline") is None and card in cards:
+            entry["pipeline"] = cards[card]["pipeline"]
+    return entries
+
+
+def parse_number(value):
+    """Reads a number attribute, as an int when it is a whole number."""
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def _index_script(root):
+    for script in root.iter(SVG_NAMESPACE + "script"):
+        if script.get("id") == INDEX_ID:
+            return script
+    return None
+
@@ -0,0 +1,347 @@
+"""Layered layout of the pipeline dependency graph.
+
+Places every pipeline in one pass over the whole graph instead of one
+pipeline at a time:
+
+1. Layering: each pipeline goes one column to the right of its deepest
+   dependency (longest path), so every arrow points right.
+2. Ordering: the pipelines in each column are reordered by the average row of
+   their neighbours, sweeping right then left, and the order with the fewest
+   line crossings is kept.
+3. Coordinates: columns become x values, and each pipeline is lined up with
+   its dependencies, siblings centred around them, without overlapping the
+   card above.
+
+Dependency cycles are broken at the pipeline that comes first in the config,
+and the edge closing the cycle is left out of the layout.
+
+Pipelines can be pinned to a saved position. They stay where they are, the
+others are placed around them and follow them like any other dependency.
+"""
+import heapq
+from collections import defaultdict
+
+from VSMWizard.pipeline_index import PipelineIndex
+from VSMWizard.spatial_grid import SpatialGrid
+
+# Right/left sweeps tried when reordering the columns
+CROSSING_SWEEPS = 4
+
+# Placeholders allowed per node and edge before the longest lines are left out of the ordering
+PLACEHOLDER_BUDGET = 4
+
+
+def dependency_edges(pipelines, index=None):
+    """Resolves dependency names to the pipelines they point at.
+
+    Names are matched ignoring case, like the rest of the VSM. Dependencies on
+    pipelines that are not in the list are left out.
+
+    Args:
+        pipelines (Array(Pipeline)): The pipelines to connect
+        index (PipelineIndex): The same pipelines by name, built if not given
+
+    Returns:
+        list: (dependency index, pipeline index) pairs, without repeats or self loops
+    """
+    if index is None:
+        index = PipelineIndex(pipelines)
+
+    edges = []
+    seen = set()
+    for target, pipeline in enumerate(pipelines):
+        for dependency in pipeline.getDependencies():
+            source = index.position(dependency.getName())
+            if source is None or source == target or (source, target) in seen:
+                continue
+            seen.add((source, target))
+            edges.append((source, target))
+    return edges
+
+
+def assign_layers(node_count, edges):
+    """Puts every node one layer after its deepest predecessor.
+
+    Nodes are visited in topological order, lowest index first when there is
+    a choice. When only nodes on a cycle are left, the lowest index one is
+    taken as if its remaining predecessors were not there.
+
+    Nodes with no predecessors are then moved right, up to the layer before
+    their nearest successor, so a pipeline late in a long chain doesn't start
+    all the way over in the first column.
+
+    Args:
+        node_count (int): Number of nodes, numbered from 0
+        edges (list): (source, target) pairs
+
+    Returns:
+        list: The layer of each node, starting at 0
+    """
+    successors = [[] for _ in range(node_count)]
+    remaining = [0] * node_count
+    for source, target in edges:
+        successors[source].append(target)
+        remaining[target] += 1
+
+    layers = [0] * node_count
+    order = []
+    done = [False] * node_count
+    ready = [node for node in range(node_count) if remaining[node] == 0]
+    heapq.heapify(ready)
+    next_unplaced = 0
+
+    for _ in range(node_count):
+        if not ready:
+            # Everything left waits on a cycle, break it at the first node
+            while done[next_unplaced]:
+                next_unplaced += 1
+            remaining[next_unplaced] = 0
+            heapq.heappush(ready, next_unplaced)
+        node = heapq.heappop(ready)
+        done[node] = True
+        order.append(node)
+        for successor in successors[node]:
+            if done[successor]:
+                continue
+            if layers[node] + 1 > layers[successor]:
+                layers[successor] = layers[node] + 1
+            remaining[successor] -= 1
+            if remaining[successor] == 0:
+                heapq.heappush(ready, successor)
+
+    has_predecessor = [False] * node_count
+    for source, target in edges:
+        if layers[source] < layers[target]:
+            has_predecessor[target] = True
+    for node in order:
+        if has_predecessor[node]:
+            continue
+        later = [layers[s] for s in successors[node] if layers[s] > layers[node]]
+        if later:
+            layers[node] = min(later) - 1
+    return layers
+
+
+def count_crossings(columns, position, successors):
+    """Counts the crossings between lines joining neighbouring columns.
+
+    Args:
+        columns (list): The nodes of each layer, top to bottom
+        position (list): The row of each node within its layer
+        successors (list): The neighbours of each node in the next column
+
+    Returns:
+        int: The number of crossing pairs
+    """
+    total = 0
+    for layer in range(len(columns) - 1):
+        size = len(columns[layer + 1])
+        # Lines sorted by their top end, crossings are inversions of their bottom ends
+        ends = []
+        for node in columns[layer]:
+            ends.extend(sorted(position[s] for s in successors[node]))
+        tree = [0] * (size + 1)
+        for seen, end in enumerate(ends):
+            # Lines already seen ending below this one cross it
+            above = 0
+            i = end + 1
+            while i > 0:
+                above += tree[i]
+                i -= i & -i
+            total += seen - above
+            i = end + 1
+            while i <= size:
+                tree[i] += 1
+                i += i & -i
+    return total
+
+
+def order_layers(layers, edges, sweeps=CROSSING_SWEEPS):
+    """Orders the nodes of each layer to cut down on crossing lines.
+
+    Lines spanning several layers are split with a placeholder in every layer
+    they pass, so each sweep only compares neighbouring columns. Shorter lines
+    get their placeholders first; once PLACEHOLDER_BUDGET per node and edge is
+    used up, the remaining long lines don't steer the ordering. They are still
+    drawn, this only keeps deep graphs from costing edges times depth.
+
+    Args:
+        layers (list): The layer of each node
+        edges (list): (source, target) pairs
+        sweeps (int): Right then left passes to try
+
+    Returns:
+        tuple: The nodes of each layer top to bottom, placeholders left out,
+        and the number of crossings left
+    """
+    node_count = len(layers)
+    layer_of = list(layers)
+    predecessors = [[] for _ in layers]
+    successors = [[] for _ in layers]
+
+    # Edges closing a cycle point left, they don't take part
+    forward = sorted(
+        (edge for edge in edges if layers[edge[0]] < layers[edge[1]]),
+        key=lambda edge: layers[edge[1]] - layers[edge[0]],
+    )
+    budget = PLACEHOLDER_BUDGET * (node_count + len(edges))
+    for source, target in forward:
+        budget -= layers[target] - layers[source] - 1
+        if budget < 0:
+            break
+        previous = source
+        for layer in range(layers[source] + 1, layers[target]):
+            placeholder = len(layer_of)
+            layer_of.append(layer)
+            predecessors.append([previous])
+            successors.append([])
+            successors[previous].append(placeholder)
+            previous = placeholder
+        predecessors[target].append(previous)
+        successors[previous].append(target)
+
+    columns = [[] for _ in range(max(layers, default=-1) + 1)]
+    for node, layer in enumerate(layer_of):
+        columns[layer].append(node)
+
+    position = [0] * len(layer_of)
+
+    def renumber(column):
+        for row, node in enumerate(column):
+            position[node] = row
+
+    def reorder(column, neighbours):
+        def barycenter(node):
+            nodes = neighbours[node]
+            if not nodes:
+                return position[node]
+            return sum(position[n] for n in nodes) / len(nodes)
+
+        # Stable, so ties keep their current order
+        column.sort(key=barycenter)
+        renumber(column)
+
+    for column in columns:
+        renumber(column)
+    best = [list(column) for column in columns]
+    best_crossings = count_crossings(columns, position, successors)
+
+    for _ in range(sweeps):
+        if best_crossings == 0:
+            break
+        for layer in range(1, len(columns)):
+            reorder(columns[layer], predecessors)
+        for layer in range(len(columns) - 2, -1, -1):
+            reorder(columns[layer], successors)
+        crossings = count_crossings(columns, position, successors)
+        if crossings < best_crossings:
+            best = [list(column) for column in columns]
+            best_crossings = crossings
+    return [[node for node in column if node < node_count] for column in best], best_crossings
+
+
+def assign_coordinates(columns, edges, layers, width, height, gap=50, margin=50, pinned=None):
+    """Turns layers and rows into top left corners for the cards.
+
+    Each card is lined up with the average height of its dependencies. Cards
+    that want the same spot are centred around it, and any card that would
+    overlap the one above it in the column, or a pinned card, is pushed down.
+
+    Args:
+        columns (list): The nodes of each layer, top to bottom
+        edges (list): (source, target) pairs
+        layers (list): The layer of each node
+        width (int): Card width
+        height (int): Card height
+        gap (int): Space between cards
+        margin (int): Space between the canvas edge and the first cards
+        pinned (dict): The (x, y) of nodes that keep their position
+
+    Returns:
+        list: An (x, y) pair for each node
+    """
+    predecessors = defaultdict(list)
+    for source, target in edges:
+        if layers[source] < layers[target]:
+            predecessors[target].append(source)
+
+    step = height + gap
+    coordinates = [None] * len(layers)
+    pinned = pinned or {}
+    taken = SpatialGrid(width + gap, height + gap)
+    for node, (x, y) in pinned.items():
+        coordinates[node] = (x, y)
+        taken.insert(node, x, y, width, height)
+
+    for layer, column in enumerate(columns):
+        x = margin + layer * (width + gap)
+        column = [node for node in column if node not in pinned]
+
+        wanted = []
+        for node in column:
+            sources = predecessors[node]
+            if sources:
+                wanted.append(sum(coordinates[s][1] for s in sources) / len(sources))
+            else:
+                wanted.append(None)
+
+        next_free = margin
+        row = 0
+        while row < len(column):
+            if wanted[row] is None:
+                top = taken.next_free_y(x, next_free, width, height, step)
+                coordinates[column[row]] = (x, top)
+                next_free = top + step
+                row += 1
+                continue
+            # Siblings wanting the same spot are spread evenly around it
+            end = row
+            while end + 1 < len(column) and wanted[end + 1] == wanted[row]:
+                end += 1
+            top = int(round(wanted[row] - (end - row) * step / 2))
+            top = max(top, next_free)
+            for node in column[row : end + 1]:
+                top = taken.next_free_y(x, top, width, height, step)
+                coordinates[node] = (x, top)
+                top += step
+            next_free = top
+            row = end + 1
+    return coordinates
+
+
+def layout_pipelines(
+    pipelines, width, height, gap=50, margin=50, sweeps=CROSSING_SWEEPS, index=None, pinned=None
+):
+    """Sets the x and y of every pipeline using the layered layout.
+
+    When every pipeline is pinned nothing is laid out, the pipelines are just
+    moved to their positions.
+
+    Args:
+        pipelines (Array(Pipeline)): The pipelines to place, dependencies included
+        width (int): Card width
+        height (int): Card height
+        gap (int): Space between cards
+        margin (int): Space between the canvas edge and the first cards
+        sweeps (int): Right then left passes tried when ordering the columns
+        index (PipelineIndex): The same pipelines by name, built if not given
+        pinned (dict): The (x, y) of the pipelines that keep their position, by position in the list
+
+    Returns:
+        list: The pipelines in each column, top to bottom, or None if every pipeline was pinned
+    """
+    pinned = pinned or {}
+    if pipelines and len(pinned) == len(pipelines):
+        for node, (x, y) in pinned.items():
+            pipelines[node].setX(x)
+            pipelines[node].setY(y)
+        return None
+
+    edges = dependency_edges(pipelines, index)
+    layers = assign_layers(len(pipelines), edges)
+    columns, _ = order_layers(layers, edges, sweeps)
+    coordinates = assign_coordinates(columns, edges, layers, width, height, gap, margin, pinned)
+    for pipeline, (x, y) in zip(pipelines, coordinates):
+        pipeline.setX(x)
+        pipeline.setY(y)
+    return [[pipelines[node] for node in column] for column in columns]
@@ -2,16 +2,29 @@ from cgitb import text  # to center task!
 import svgwrite
 import os
 import json
+import math
 from pathlib import Path
 import sys
-from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 path_root = Path(__file__).parents[1]
 sys.path.append(str(path_root))
 print(sys.path)
 
 from YMLParser import parser
+from YMLParser import devops_client
+from YMLParser import parse_cache
+from YMLParser import response_cache
 from VSMWizard import menu_gui
+from VSMWizard.spatial_grid import SpatialGrid
+from VSMWizard import layout
+from VSMWizard import dependency_graph
+from VSMWizard import svg_stream
+from VSMWizard import svg_defs
+from VSMWizard import svg_bounds
+from VSMWizard import element_ids
+from VSMWizard import edge_route
+from VSMWizard.pipeline_index import PipelineIndex, name_key
 
 CONST_STROKE_WIDTH = 1
 CONST_PIPELINE_WIDTH = 300
@@ -22,13 +35,29 @@ CONST_ICON_WIDTH = 30
 CONST_ICON_HEIGHT = 30
 
 CONST_ARROW_HEIGHT = 25
+# Open chevron drawn at the end of each dependency line, its tip at (20, 12)
+CONST_ARROWHEAD_PATH = "M2,2 L20,12 L2,22"
 
 CONST_LANG_MARGIN = 68
 CONST_LANG_WIDTH = 5
 CONST_LANG_HEIGHT = 5
 
-CONST_ARROW_X = 9
-CONST_ARROW_Y = 12
+# Default number of YML specs fetched and parsed at the same time
+CONST_INGEST_WORKERS = 8
+
+# Layout modes, picked with "layout" in the config file
+CONST_LAYOUT_INCREMENTAL = "incremental"
+CONST_LAYOUT_LAYERED = "layered"
+CONST_DEFAULT_LAYOUT = CONST_LAYOUT_INCREMENTAL
+
+# Renderers, picked with "renderer" in the config file
+CONST_RENDERER_SVGWRITE = "svgwrite"
+CONST_RENDERER_STREAM = "stream"
+CONST_DEFAULT_RENDERER = CONST_RENDERER_SVGWRITE
+
+# The canvas is at least this wide and high, with a margin around everything drawn
+CONST_MIN_CANVAS_SIZE = 3000
+CONST_CANVAS_MARGIN = 50
 
 ICON_PATH_MAP = {
     "python": "resources\\python.png",
@@ -42,38 +71,139 @@ ICON_PATH_MAP = {
     "npm": "resources\\npm.png",
 }
 
+# Outline of pipelines that are part of a dependency loop
+CONST_CYCLE_STROKE = "red"
+CONST_CYCLE_STROKE_WIDTH = 3
+
 CONST_GRADIENTS = {
     "dummyGradientTop": "#f0f0f0",
     "dummyGradientBottom": "#c0c0c0",
     "mainGradientTop": "#d8f3ff",
     "mainGradientBottom": "#89baff",
+    "hiddenGradientTop": "#fffecd",
+    "hiddenGradientBottom": "#ffe8a4",
+}
+
+# Class rules in the drawing's style sheet, shared by every text element
+CONST_STYLES = {
+    "label": "font-family:Helvetica;",
+    "link": "text-decoration: underline;font-family:Helvetica;",
+    "edge": "stroke:black;stroke-width:1;",
+    # Lines into the card under the mouse, see edge_highlight.js
+    "highlight": "stroke:#2f80ed;stroke-width:3;",
 }
 
-dummyPipelinesDict = {}
+# Script that highlights the lines into a card while the mouse is over it, embedded in every VSM
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "edge_highlight.js"), encoding="utf-8") as highlightScript:
+    CONST_HIGHLIGHT_SCRIPT = highlightScript.read()
+
+
+# Makes svgwrite elements for code that only has a container at hand
+svgwriteFactory = svgwrite.Drawing(profile="full")
+# svgwrite's validation rejects data attributes, elements carrying them are made here
+svgwriteUnvalidatedFactory = svgwrite.Drawing(profile="full", debug=False)
+
+
+def elementFactory(container, validate=True):
+    """Returns what new elements for a container are made with
+
+    Args:
+        container: The drawing or element the new elements go in
+        validate (bool): False to skip svgwrite's attribute checks, for data attributes
+
+    Returns:
+        The streamed element factory for streamed drawings, svgwrite otherwise
+    """
+    if isinstance(container, (svg_stream.Element, svg_stream.StreamingDrawing)):
+        return svg_stream.factory
+    if not validate:
+        return svgwriteUnvalidatedFactory
+    return svgwriteFactory
+
+
+def createDrawing(fileName, renderer=CONST_DEFAULT_RENDERER):
+    """Creates the drawing the VSM is drawn on
+
+    Args:
+        fileName (str): The file the drawing is saved to
+        renderer (str): CONST_RENDERER_SVGWRITE or CONST_RENDERER_STREAM
+
+    Returns:
+        svgwrite.Drawing or StreamingDrawing: The empty drawing
+    """
+    if renderer == CONST_RENDERER_STREAM:
+        return svg_stream.StreamingDrawing(fileName, profile="full", onload="makeDraggable(evt)")
+    if renderer != CONST_RENDERER_SVGWRITE:
+        print(f"Unknown renderer {renderer}, using {CONST_RENDERER_SVGWRITE}")
+    return svgwrite.Drawing(fileName, profile="full", onload="makeDraggable(evt)")
+
+
+def flushDrawing(vsm):
+    """Writes out everything drawn so far if the drawing is streamed
+
+    Args:
+        vsm (svgwrite.Drawing or StreamingDrawing): The VSM being drawn
+
+    Returns:
+        None
+    """
+    if isinstance(vsm, svg_stream.StreamingDrawing):
+        vsm.flush()
+
+
+def closeDrawing(vsm):
+    """Lets go of the temporary file a streamed drawing keeps its body in
+
+    Args:
+        vsm (svgwrite.Drawing or StreamingDrawing): The VSM, saved or not
+
+    Returns:
+        None
+    """
+    if isinstance(vsm, svg_stream.StreamingDrawing):
+        vsm.close()
 
 
 def insertIcon(canvas, href, x, y, width, height, description=None):
     # draw logic here - only puts it onto canvis
     # TODO Figure out how to place them into the Rectangle from drawRect
-    img = svgwrite.image.Image(
+    img = elementFactory(canvas).image(
         href, insert=(x, y), size=(width, height), class_="draggable"
     )
 
     if description != None:
         img.set_desc(description)
 
+    svg_bounds.include_box(canvas, x, y, width, height)
     return canvas.add(img)
 
-# insert icon with rotation
-def insertIconRotation(canvas, href, x, y, width, height, rotation, description=None):
-    rotate = "rotate(" + str(rotation) + ' ' + str(x) + ' ' + str(y) + ')'
-    img = svgwrite.image.Image(
-        href, insert=(x, y), size=(width, height), class_="draggable", transform=rotate
+
+def useIcon(canvas, container, href, x, y, width, height, description=None):
+    """Places an icon, the image itself is only defined once per drawing
+
+    Args:
+        canvas (svgwrite.Drawing): The drawing whose defs hold the icon
+        container (svgwrite.container.Group): The group the icon goes in
+        href (str): Path of the icon image
+        x (int): Left edge of the icon
+        y (int): Top edge of the icon
+        width (int): Width of the icon
+        height (int): Height of the icon
+        description (str): Title shown when hovering over the icon
+
+    Returns:
+        svgwrite.container.Use: The icon
+    """
+    symbol = svg_defs.image_symbol(canvas, href)
+    icon = elementFactory(container).use(
+        "#" + symbol["id"], insert=(x, y), size=(width, height), class_="draggable"
     )
 
-    img.set_desc(None)
+    if description != None:
+        icon.set_desc(description)
 
-    return canvas.add(img)
+    svg_bounds.include_box(canvas, x, y, width, height)
+    return container.add(icon)
 
 
 def drawLine(canvas, start, end, id=None):
@@ -81,23 +211,92 @@ def drawLine(canvas, start, end, id=None):
         start=start, end=end, stroke="black", stroke_width=CONST_STROKE_WIDTH, id=id
     )
     canvas.add(line) 
+    svg_bounds.include_line(canvas, start, end, CONST_STROKE_WIDTH / 2)
+    return line
+
+
+def arrowheadMarker(canvas):
+    """Returns the arrowhead marker, adding it to the defs the first time
+
+    Args:
+        canvas (svgwrite.Drawing): The VSM
+
+    Returns:
+        The marker, placed at the end of a line with marker-end
+    """
+
+    def draw(marker):
+        # Sized in pixels rather than line widths, so highlighting doesn't grow it
+        marker["markerUnits"] = "userSpaceOnUse"
+        marker.add(
+            canvas.path(
+                d=CONST_ARROWHEAD_PATH,
+                fill="none",
+                stroke="black",
+                stroke_width=2,
+                stroke_linecap="round",
+                stroke_linejoin="round",
+            )
+        )
+
+    return svg_defs.marker(
+        canvas, "arrowhead", draw, insert=(20, 12), size=(CONST_ARROW_HEIGHT, CONST_ARROW_HEIGHT)
+    )
+
+
+def drawEdge(canvas, start, end, id, source, target, arrowhead=False):
+    """Draws a dependency line, styled by the drawing's style sheet
+
+    Args:
+        canvas (svgwrite.Drawing): The VSM
+        start (tuple): Start of the line
+        end (tuple): End of the line
+        id (str): Id of the line
+        source (str): Id of the card the line comes from
+        target (str): Id of the card the line goes into
+        arrowhead (bool): Whether the line ends in an arrowhead
+
+    Returns:
+        The line
+    """
+    # The highlight rule has to come after the edge rule to win over it
+    edgeClass = svg_defs.style(canvas, "edge", CONST_STYLES["edge"])
+    svg_defs.style(canvas, "highlight", CONST_STYLES["highlight"])
+
+    extra = {}
+    if arrowhead:
+        extra["marker_end"] = "url(#" + arrowheadMarker(canvas)["id"] + ")"
+    line = elementFactory(canvas, validate=False).line(
+        start=start, end=end, id=id, class_=edgeClass, data_source=source, data_target=target, **extra
+    )
+    canvas.add(line)
+    svg_bounds.include_line(canvas, start, end, CONST_STROKE_WIDTH / 2)
+    if arrowhead:
+        svg_bounds.include_circle(canvas, end[0], end[1], CONST_ARROW_HEIGHT)
     return line
 
 
 def drawText(canvas, container, x, y, text, color="black"):
+    svg_bounds.include_text(canvas, x, y, text)
     return container.add(
         canvas.text(
             text,
             insert=(x, y),
             fill=color,
-            class_="draggable",
-            style="font-family:Helvetica;",
+            class_="draggable " + svg_defs.style(canvas, "label", CONST_STYLES["label"]),
         )
     )
 
 
-def drawRect(canvas, container, x, y, width, height, gradient):
-    rect = canvas.rect(
+def drawRect(canvas, container, x, y, width, height, gradient, pipeline=None):
+    extra = {}
+    factory = canvas
+    # The pipeline the card stands for, index.js saves it with the card's position
+    if pipeline is not None:
+        # svgwrite's validation rejects data attributes
+        factory = elementFactory(canvas, validate=False)
+        extra["data_pipeline"] = pipeline
+    rect = factory.rect(
         class_="draggable",
         insert=(x, y),
         size=(width, height),
@@ -106,8 +305,10 @@ def drawRect(canvas, container, x, y, width, height, gradient):
         rx=10,
         ry=10,
         stroke_width=CONST_STROKE_WIDTH,
+        **extra,
     )
 
+    svg_bounds.include_box(canvas, x, y, width, height)
     return container.add(rect)
 
 
@@ -120,21 +321,26 @@ def drawCircle(canvas, container, centerX, centerY, radius, fillColor):
     )
 
     container.add(c)
+    svg_bounds.include_circle(canvas, centerX, centerY, radius)
     return c
 
 
-def drawHyperlink(canvas, x, y, text, url):
+def drawHyperlink(canvas, x, y, text, url, drawing=None):
     # TODO figure out something better here?
     if url == None:
         return
-    link = canvas.add(svgwrite.container.Hyperlink(url, class_="draggable"))
+    # The link is only counted in the canvas size if the drawing is given
+    if drawing is not None:
+        svg_bounds.include_text(drawing, x, y, text)
+    factory = elementFactory(canvas)
+    link = canvas.add(factory.a(url, class_="draggable"))
+    # The link class is added to the style sheet by drawPipeline
     link.add(
-        svgwrite.text.Text(
+        factory.text(
             text,
             insert=(x, y),
             fill="black",
-            style="text-decoration: underline;font-family:Helvetica;",
-            class_="draggable",
+            class_="draggable link",
         )
     )
     return link
@@ -148,12 +354,13 @@ def getIconPath(taskIcon):
     return ICON_PATH_MAP.get(taskIcon, "resources\\defaulttech.png")
 
 
-def drawOSIcon(canvas, osString, x, y):
+def drawOSIcon(canvas, container, osString, x, y):
     # TODO: Replace with check for attribute includes 'windows' to account for
     #       specific OS versions
     if osString == "windows-latest":
-        insertIcon(
+        useIcon(
             canvas,
+            container,
             "resources\\windows.png",
             x + (CONST_PIPELINE_WIDTH - CONST_ICON_WIDTH - CONST_ICON_MARGIN),
             y + CONST_ICON_MARGIN,
@@ -162,8 +369,9 @@ def drawOSIcon(canvas, osString, x, y):
             osString,
         )
     elif osString == "ubuntu-latest":
-        insertIcon(
+        useIcon(
             canvas,
+            container,
             "resources\\ubuntu.png",
             x + (CONST_PIPELINE_WIDTH - CONST_ICON_WIDTH - CONST_ICON_MARGIN),
             y + CONST_ICON_MARGIN,
@@ -172,8 +380,9 @@ def drawOSIcon(canvas, osString, x, y):
             osString,
         )
     elif osString == "macOS-latest":
-        insertIcon(
+        useIcon(
             canvas,
+            container,
             "resources\\macOS.png",
             x + (CONST_PIPELINE_WIDTH - CONST_ICON_WIDTH - CONST_ICON_MARGIN),
             y + CONST_ICON_MARGIN,
@@ -252,13 +461,17 @@ def drawTrigger(canvas, container, triggerString, x, y):
 
 
 def drawHiddenContainer(canvas, parentContainer, rect_id, x, y):
-    # Draw gradients for hidden container
-    hiddenContainerYellowGradient = canvas.linearGradient((0, 0), (0, 1))
-    canvas.defs.add(hiddenContainerYellowGradient)
-    hiddenContainerYellowGradient.add_stop_color(0, "#fffecd")
-    hiddenContainerYellowGradient.add_stop_color(0.7, "#ffe8a4")
+    # Gradient shared by every hidden container
+    hiddenContainerYellowGradient = svg_defs.linear_gradient(
+        canvas,
+        "hiddenGradient",
+        (
+            (0, CONST_GRADIENTS["hiddenGradientTop"]),
+            (0.7, CONST_GRADIENTS["hiddenGradientBottom"]),
+        ),
+    )
 
-    hiddenContainer = svgwrite.container.Group()
+    hiddenContainer = canvas.g()
 
     hiddenRect = drawRect(
         canvas,
@@ -276,7 +489,7 @@ def drawHiddenContainer(canvas, parentContainer, rect_id, x, y):
     hiddenContainer["class"] = "draggable"
 
     hiddenContainer.add(
-        svgwrite.animate.Animate(
+        canvas.animate(
             attributeName="visibility",
             values="visible",
             dur="3.0s",
@@ -288,7 +501,7 @@ def drawHiddenContainer(canvas, parentContainer, rect_id, x, y):
     )
 
     hiddenContainer.add(
-        svgwrite.animate.Animate(
+        canvas.animate(
             attributeName="visibility",
             values="hidden",
             dur="0.0s",
@@ -305,7 +518,7 @@ def drawHiddenContainer(canvas, parentContainer, rect_id, x, y):
     #       replaced with logic to parse useful info from the YML and populate the
     #       hidden container
     drawOSIcon(
-        hiddenContainer, "windows-latest", x + CONST_ICON_WIDTH, y + CONST_ICON_WIDTH
+        canvas, hiddenContainer, "windows-latest", x + CONST_ICON_WIDTH, y + CONST_ICON_WIDTH
     )
 
     # Add the hidden container group to the visible container group
@@ -328,7 +541,8 @@ def handleDuplicateTasks(canvas, visibleContainer, Pipeline, x, y):
         if taskIconPath is not None:
             # if the pipeline is to generate an artifact
             if taskIcon == "artifact":
-                insertIcon(
+                useIcon(
+                    canvas,
                     visibleContainer,
                     taskIconPath,
                     x + (CONST_PIPELINE_WIDTH - CONST_ICON_WIDTH - CONST_ICON_MARGIN),
@@ -365,7 +579,8 @@ def handleDuplicateTasks(canvas, visibleContainer, Pipeline, x, y):
                     # If at the end of the box's bounds, put an additional tasks counter instead
                     if drawIndex < 5 or (additionalTaskCount == 0 and index == len(Pipeline.getTasks()) - 1):
                         dupeCount = 2
-                        insertIcon(
+                        useIcon(
+                            canvas,
                             visibleContainer,
                             taskIconPath,
                             x + 10 + (CONST_LANG_WIDTH) * (10 * drawIndex),
@@ -396,25 +611,31 @@ def handleDuplicateTasks(canvas, visibleContainer, Pipeline, x, y):
 
 
 def drawPipeline(canvas, x, y, Pipeline):
-    # If pipeline is a dummy, color it gray 
+    # If pipeline is a dummy, color it gray. Every card of a color shares
+    # one gradient in the defs
     if isDummy(Pipeline):
-        mainContainerGradient = canvas.linearGradient((0, 0), (0, 1))
-        canvas.defs.add(mainContainerGradient)
-        mainContainerGradient.add_stop_color(0, CONST_GRADIENTS["dummyGradientTop"])
-        mainContainerGradient.add_stop_color(
-            0.7, CONST_GRADIENTS["dummyGradientBottom"]
+        mainContainerGradient = svg_defs.linear_gradient(
+            canvas,
+            "dummyGradient",
+            (
+                (0, CONST_GRADIENTS["dummyGradientTop"]),
+                (0.7, CONST_GRADIENTS["dummyGradientBottom"]),
+            ),
         )
     # else, color it blue
     else:
-        # Draw gradients for main container
-        mainContainerGradient = canvas.linearGradient((0, 0), (0, 1))
-        canvas.defs.add(mainContainerGradient)
-        mainContainerGradient.add_stop_color(0, CONST_GRADIENTS["mainGradientTop"])
-        mainContainerGradient.add_stop_color(0.7, CONST_GRADIENTS["mainGradientBottom"])
+        mainContainerGradient = svg_defs.linear_gradient(
+            canvas,
+            "mainGradient",
+            (
+                (0, CONST_GRADIENTS["mainGradientTop"]),
+                (0.7, CONST_GRADIENTS["mainGradientBottom"]),
+            ),
+        )
 
     # Draw rectangle
     # create new container
-    visibleContainer = svgwrite.container.Group()
+    visibleContainer = canvas.g()
 
     rect = drawRect(
         canvas,
@@ -424,19 +645,22 @@ def drawPipeline(canvas, x, y, Pipeline):
         CONST_PIPELINE_WIDTH,
         CONST_PIPELINE_HEIGHT,
         mainContainerGradient,
+        Pipeline.getName(),
     )
 
     # Draw text
+    svg_defs.style(canvas, "link", CONST_STYLES["link"])
     drawHyperlink(
         visibleContainer,
         x + 10,
         y + 20,
         Pipeline.getName(),
         Pipeline.getOrigin(),
+        drawing=canvas,
     )
 
     # Draw OS icon
-    drawOSIcon(visibleContainer, Pipeline.getOS(), x, y)
+    drawOSIcon(canvas, visibleContainer, Pipeline.getOS(), x, y)
 
     # Draw trigger
     drawTrigger(canvas, visibleContainer, Pipeline.getTrigger(), x, y)
@@ -444,9 +668,16 @@ def drawPipeline(canvas, x, y, Pipeline):
     # Draw tasks
     handleDuplicateTasks(canvas, visibleContainer, Pipeline, x, y)
 
-    # Adding a unique ID to the rectangle we create
-    rect_id = f"rect_{x}_{y}"
+    # The card's id comes from the pipeline's name, so it stays put when the card moves
+    rect_id = element_ids.pipeline_card(canvas, Pipeline)
     rect["id"] = rect_id
+    element_ids.add_card(element_ids.index(canvas), rect_id, Pipeline.getName(), x, y)
+
+    # Outline pipelines stuck in a dependency loop
+    if Pipeline.getCycle() is not None:
+        rect["class"] = "draggable cycle"
+        rect["stroke"] = CONST_CYCLE_STROKE
+        rect["stroke-width"] = CONST_CYCLE_STROKE_WIDTH
 
     # TODO: If you'd like to add a hidden container that displays on click,
     #       uncomment the line below
@@ -458,26 +689,79 @@ def drawPipeline(canvas, x, y, Pipeline):
     return visibleContainer
 
 
-def syncDependencyCoordinates(pipelines):
+def syncPipelineDependencies(pipeline, index):
+    """Copies the coordinates of a pipeline's dependencies onto its dependency objects
+
+    Args:
+        pipeline (Pipeline): The pipeline whose dependencies are updated
+        index (PipelineIndex): The pipelines on the VSM, by name
+
+    Returns:
+        None
+    """
+    for dep in pipeline.getDependencies():
+        otherPipeline = index.get(dep.getName())
+        if otherPipeline is not None:
+            dep.setX(otherPipeline.getX())
+            dep.setY(otherPipeline.getY())
+
+
+def syncDependencyCoordinates(pipelines, index=None):
+    """Copies the coordinates of every pipeline onto the dependencies naming it
+
+    Args:
+        pipelines (Array(Pipeline)): The pipelines on the VSM
+        index (PipelineIndex): The pipelines by name, built from pipelines if not given
+
+    Returns:
+        None
+    """
+    if index is None:
+        index = PipelineIndex(pipelines)
     for pipeline in pipelines:
-        for dep in pipeline.getDependencies():
-            for otherPipeline in pipelines:
-                if dep.getName() is not None and otherPipeline.getName() is not None:
-                    if dep.getName().lower() == otherPipeline.getName().lower():
-                        dep.setX(otherPipeline.getX())
-                        dep.setY(otherPipeline.getY())
+        syncPipelineDependencies(pipeline, index)
+
+
+def placedCards(pipelines):
+    """Indexes the cards of the pipelines that have been given a position
+
+    Pipelines still at 0, 0 have not been placed yet and are left out.
 
+    Args:
+        pipelines (Array(Pipeline)): The pipelines to index
 
-def willCollide(plToDraw, pipelines):
+    Returns:
+        SpatialGrid: The card rectangles, keyed by pipeline
+    """
+    grid = SpatialGrid(CONST_PIPELINE_WIDTH + 50, CONST_PIPELINE_HEIGHT + 50)
     for p in pipelines:
-        # Don't check exact coordinates, check if the width and height overlap
-        if (plToDraw.getX() < p.getX() + CONST_PIPELINE_WIDTH) and (
-            plToDraw.getY() < p.getY() + CONST_PIPELINE_HEIGHT
-        ):
-            if p.getX() == 0 and p.getY() == 0:
-                continue
-            return True
-    return False
+        if p.getX() == 0 and p.getY() == 0:
+            continue
+        grid.insert(p, p.getX(), p.getY(), CONST_PIPELINE_WIDTH, CONST_PIPELINE_HEIGHT)
+    return grid
+
+
+def willCollide(plToDraw, pipelines, grid=None):
+    """Checks if a pipeline's card would overlap a card already placed
+
+    Args:
+        plToDraw (Pipeline): The pipeline about to be drawn
+        pipelines (Array(Pipeline)): The pipelines already placed
+        grid (SpatialGrid): Index of the placed cards, built from pipelines if not given
+
+    Returns:
+        bool: True if the cards overlap
+    """
+    if grid is None:
+        grid = placedCards(pipelines)
+    # Don't check exact coordinates, check if the width and height overlap
+    return grid.overlaps(
+        plToDraw.getX(),
+        plToDraw.getY(),
+        CONST_PIPELINE_WIDTH,
+        CONST_PIPELINE_HEIGHT,
+        exclude=plToDraw,
+    )
 
 
 def isDummy(pipeline):
@@ -485,211 +769,83 @@ def isDummy(pipeline):
     return pipeline.getOrigin() is None
 
 
-def consolidateDummies(vsm, pipelines):
-    """
-    Consolidates dummy pipelines into real pipelines
+def createDummyPipeline(name):
+    """Creates the gray stand-in for a dependency that isn't in the config
 
     Args:
-        vsm (svgwrite.Drawing): The VSM to add the pipelines to
-        pipelines (Array(Pipeline)): A list of Pipeline objects to add to the VSM
+        name (str): Name of the missing pipeline
 
     Returns:
-        None
-
-    Raises:
-        None
+        Pipeline: The dummy pipeline
     """
+    dummyPipeline = parser.createPipeline("")
+    dummyPipeline.setName(name)
+    dummyPipeline.setTrigger(f"Dependent pipeline {name} not found")
+    return dummyPipeline
 
-    dummyCoords = []
 
-    print("Cleaning up dummy pipelines...")
+def resolveDependencies(pipelines):
+    """Adds a dummy pipeline for every dependency that isn't in the config
 
-    # Check if the pipeline name is in the dictionary
-    # If it is, replace the pipeline with the real pipeline
-    for pipeline in pipelines:
-        # Only delete dummy pipelines if we're replacing with a drawn pipeline
-        if isDummy(pipeline):
-            continue
-        # Only check after confirming the pipeline has a dummy drawn
-        elif pipeline.getName() in dummyPipelinesDict:
-
-            # Find the drawn rectangle with the same name as dummy
-            for pipelineContainer in vsm.elements:
-                # Quick skips when we can
-                if pipelineContainer.elements is None:
-                    continue
-                if pipelineContainer.attribs.get("id") is None:
-                    continue
-                # Check the container is a dummy pipeline
-                if "dummy" in pipelineContainer.attribs.get("id"):
-                    # Check text element matches dummy pipeline name
-                    for element in pipelineContainer.elements:
-                        if element.elementname == "text":
-                            # If text shows we're at a correct dummy,
-                            # save the coordinates to the rectangle
-                            if pipeline.getName() in element.text:
-                                # Rect are drawn before text, index 0 is the rect
-                                dummy_x = pipelineContainer.elements[0].attribs.get("x")
-                                dummy_y = pipelineContainer.elements[0].attribs.get("y")
-                                dummyCoords.append((dummy_x, dummy_y))
-                                # Kill this dummy
-                                # TODO kinda nasty fix that later
-                                pipelineContainer.attribs["visibility"] = "hidden"
-
-        if len(dummyCoords) > 0:
-            for element in vsm.elements:
-                if element.elementname == "line":
-                    for coords in dummyCoords:
-                        # If line ID contains "post_rect_xcoord_ycoord"
-                        if f"post_rect_{coords[0]}_{coords[1]}_" in element.attribs.get(
-                            "id"
-                        ) and "SegmentA" in element.attribs.get("id"):
-                            # Replace x1,y1 of lines with real pipeline coordinates
-                            oldID = element.attribs.get("id")
-                            id_chunks = oldID.split("pre")
-                            # ID Chunks now contains ["post_rect_xcoord_ycoord", "_xcoord_ycoord-SegmentA"]
-                            newID = (
-                                f"post_rect_{pipeline.getX()}_{pipeline.getY()}_"
-                                + "pre"
-                                + id_chunks[1]
-                            )
-                            element.attribs["id"] = newID
-
-                            element.attribs["x1"] = (
-                                pipeline.getX() + CONST_PIPELINE_WIDTH
-                            )
-                            element.attribs["y1"] = pipeline.getY() + (
-                                CONST_PIPELINE_HEIGHT / 2
-                            )
-                            break
-
-
-def drawDummyPipeline(vsm, pipelines, dependency, x_coord, y_coord):
-    print("Dependency not drawn")
-    dummyPipeline = parser.createPipeline("")
-    dummyPipeline.setName(dependency.getName())
-    dummyPipeline.setTrigger(f"Dependent pipeline {dependency.getName()} not found")
-    dummyPipeline.setX(x_coord)
-    dummyPipeline.setY(y_coord)
-    # Offset dummy pipeline so it's not colliding with another
-    while willCollide(dummyPipeline, pipelines):
-        y_coord += CONST_PIPELINE_HEIGHT + 50
-        dummyPipeline.setY(y_coord)
-
-    dependency.setX(x_coord)
-    dependency.setY(y_coord)
-    container = drawPipeline(vsm, x_coord, y_coord, dummyPipeline)
-    # Set id of container to "dummy" + pipeline name for easy identification
-    container.attribs["id"] = "dummy_" + dummyPipeline.getName()
-
-    # Sync coordinates after drawing dummy pipeline
-    syncDependencyCoordinates(pipelines)
-    print("Dummy dep drawn:" + dummyPipeline.getName())
-    # Add name of dummy pipeline to dictionary
-    dummyPipelinesDict[dummyPipeline.getName()] = dummyPipeline
-    print("At coords: " + str(x_coord) + ", " + str(y_coord))
-    pipelines.append(dummyPipeline)
-    return x_coord, y_coord
+    Every name is collected before any dummy is made, so a dependency that
+    comes later in the list is not mistaken for a missing one. Each dummy
+    goes just before the first pipeline that needs it.
 
+    Args:
+        pipelines (Array(Pipeline)): The pipelines to check, dummies are inserted in place
 
-def checkDepenciesDrawn(vsm, pipelines, newPipelineIndex):
+    Returns:
+        set: The dummy pipelines added
+    """
+    index = PipelineIndex(pipelines)
+    dummies = set()
+    resolved = []
+    for pipeline in pipelines:
+        for d in pipeline.getDependencies():
+            if d.getName() is not None and d.getName() not in index:
+                print("Dependency not found, adding dummy pipeline: " + d.getName())
+                dummyPipeline = createDummyPipeline(d.getName())
+                index.add(dummyPipeline)
+                dummies.add(dummyPipeline)
+                resolved.append(dummyPipeline)
+        resolved.append(pipeline)
+    pipelines[:] = resolved
+    return dummies
+
+
+def checkDepenciesDrawn(pipelines, newPipelineIndex, index=None):
     x_coord, y_coord = 50, 50
     #a_coord, b_coord = 
+    if index is None:
+        index = PipelineIndex(pipelines)
 
     # Find the x coordinate of the dependency
     for d in pipelines[newPipelineIndex].getDependencies():
-        depDrawn = False
-
-        # Check if the dependency is already drawn in list of existing pipelines.
-        # Loop through all pipelines from zero up to new index to check the pipelines that have already been drawn
-        for otherPipelinesIndex in range(newPipelineIndex):
-            if (
-                d.getName() is not None
-                and pipelines[otherPipelinesIndex].getName() is not None
-            ):
-                if (
-                    d.getName().lower()
-                    == pipelines[otherPipelinesIndex].getName().lower()
-                ):
-                    # Dependency is already drawn, update coordinates
-                    x_coord = pipelines[otherPipelinesIndex].getX()
-                    x_coord += CONST_PIPELINE_WIDTH + 50
-                    depDrawn = True
-
-        # If dependency not found, draw dummy rect and offset from that
-        if not depDrawn:
-            print(
-                "\nDrawing dummy pipeline for dependency: "
-                + d.getName()
-                + " at "
-                + str(x_coord)
-                + ", "
-                + str(y_coord)
-                + "\n"
-            )
-            x_coord, y_coord = drawDummyPipeline(vsm, pipelines, d, x_coord, y_coord)
-            depDrawn = True
+        # Check if the dependency is already placed in list of existing pipelines.
+        # Only the pipelines before the new index have been placed, a dependency
+        # after it closes a dependency loop and doesn't move the new pipeline
+        placedPipeline = index.get(d.getName(), before=newPipelineIndex)
+        if placedPipeline is not None:
+            # Dependency is already placed, update coordinates
+            x_coord = placedPipeline.getX()
+            x_coord += CONST_PIPELINE_WIDTH + 50
 
     # If there are sibling dependencies, draw below the sibling
     # find max y for sibling dependencies
     maxX = 0
     maxY = 0
-    for p in pipelines:
-        for d in p.getDependencies():
-            if (
-                d.getName()
-                == pipelines[newPipelineIndex].getDependencies()[0].getName()
-            ):
-                if p.getX() > maxX:
-                    maxX = p.getX()
-                    maxY = p.getY()
-                    # offset new pipeline below sibling
-                    y_coord = CONST_PIPELINE_WIDTH + 5
+    firstDependency = pipelines[newPipelineIndex].getDependencies()[0].getName()
+    for p in index.dependents(firstDependency):
+        if p.getX() > maxX:
+            maxX = p.getX()
+            maxY = p.getY()
+            # offset new pipeline below sibling
+            y_coord = CONST_PIPELINE_WIDTH + 5
 
     return x_coord, y_coord
 
 
-def animateLine(line, rectID):
-    """
-    This function animates the given line by changing its stroke color when the associated box is hovered over.
-
-    Args:
-    - line: The line to be animated.
-    - rectID: The ID of the associated box.
-
-
-    Returns:
-        None
-
-    Raises:
-        None
-    """
-
-    line.add(
-        svgwrite.animate.Animate(
-            attributeName="stroke",
-            values="black;white;black",
-            dur="1.0s",
-            begin=f"{rectID}.mouseover",
-            end=f"{rectID}.mouseout",
-            repeatCount="500",
-            fill="freeze",
-        )
-    )
-
-    line.add(
-        svgwrite.animate.Animate(
-            attributeName="stroke",
-            values="white;black",
-            dur="0.5s",
-            begin=f"{rectID}.mouseout",
-            end=f"{rectID}.mouseover",
-            fill="freeze",
-        )
-    )
-
-
-def connectDependencies(vsm, container, pipelines, newPipelineIndex):
+def connectDependencies(vsm, container, pipelines, newPipelineIndex, index=None):
     """
     Connects dependencies to the new pipeline by drawing lines between them
 
@@ -698,6 +854,7 @@ def connectDependencies(vsm, container, pipelines, newPipelineIndex):
         container (svgwrite.container.Group): The container to add the lines to
         pipelines (Array(Pipeline)): A list of Pipeline objects to add to the VSM
         newPipelineIndex (int): The index of the pipeline to connect dependencies to
+        index (PipelineIndex): The pipelines by name, built from pipelines if not given
 
     Returns:
         None
@@ -705,136 +862,58 @@ def connectDependencies(vsm, container, pipelines, newPipelineIndex):
     Raises:
         None
     """
+    if index is None:
+        index = PipelineIndex(pipelines)
     dep = pipelines[newPipelineIndex].getDependencies()
     for d in dep:
         print(
             f"(connectingDependencies) Drawing lines from:  {str(d.getName())} ({d.getX()}, {d.getY()}) to {str(pipelines[newPipelineIndex].getName())}  ({pipelines[newPipelineIndex].getX()}, {pipelines[newPipelineIndex].getY()}"
         )
 
-        # Line begins at the right edge of the dependency
-        start = (
-            d.getX() + CONST_PIPELINE_WIDTH,
-            d.getY() + (CONST_PIPELINE_HEIGHT / 2),
-        )
-        # Line may begin from the top middle of another pipeline
-        top = (
-            d.getX() + (CONST_PIPELINE_WIDTH / 2),
-            d.getY(),
-        )
-        # Line may begin from the bottom middle of another pipeline
-        bottom = (
-            d.getX() + (CONST_PIPELINE_WIDTH / 2),
-            d.getY() + CONST_PIPELINE_HEIGHT,
-        )
-
-        # Line ends at the left edge of the new pipeline
-        end = (
-            pipelines[newPipelineIndex].getX() - 30,
-            pipelines[newPipelineIndex].getY() + (CONST_PIPELINE_HEIGHT / 2),
+        # The line leaves the dependency and comes into the new pipeline on
+        # the sides facing each other
+        start, end, end_arrow = edge_route.route(
+            (d.getX(), d.getY()),
+            (pipelines[newPipelineIndex].getX(), pipelines[newPipelineIndex].getY()),
+            CONST_PIPELINE_WIDTH,
+            CONST_PIPELINE_HEIGHT,
         )
 
-        # Line ends at the top edge of the new pipeline
-        end_top = (
-            pipelines[newPipelineIndex].getX() + (CONST_PIPELINE_WIDTH / 2),
-            pipelines[newPipelineIndex].getY() - 30,
-        )
-
-        # Line ends at the bottom edge of the new pipeline
-        end_bottom = (
-            pipelines[newPipelineIndex].getX() + (CONST_PIPELINE_WIDTH / 2),
-            pipelines[newPipelineIndex].getY() + CONST_PIPELINE_HEIGHT + 30,
-        )
-
-        # Arrow line ends at the left edge of the new pipeline
-        end_arrow = (
-                pipelines[newPipelineIndex].getX(),
-                pipelines[newPipelineIndex].getY() + (CONST_PIPELINE_HEIGHT / 2)
-        )
-
-        # Arrow line ends at the top edge of the new pipeline
-        end_arrow_top = (
-            pipelines[newPipelineIndex].getX() + (CONST_PIPELINE_WIDTH / 2),
-            pipelines[newPipelineIndex].getY(),
-        )
-
-        # Arrow line ends at the bottom edge of the new pipeline
-        end_arrow_bottom = (
-            pipelines[newPipelineIndex].getX() + (CONST_PIPELINE_WIDTH / 2),
-            pipelines[newPipelineIndex].getY() + CONST_PIPELINE_HEIGHT,
-        )
-
-        # default arrowhead position and rotation (point to the right)
-        arrowhead_x = end[0] + CONST_ARROW_X
-        arrowhead_y = end[1] - CONST_ARROW_Y
-        arrowhead_rotation = 0
+        # The cards the line joins, edge_highlight.js looks lines up by these.
+        # The dependency is the card its coordinates were copied from
+        source = index.get(d.getName())
+        if source is not None:
+            sourceID = element_ids.pipeline_card(vsm, source)
+        else:
+            sourceID = element_ids.card_id(d.getName())
+        targetID = element_ids.pipeline_card(vsm, pipelines[newPipelineIndex])
 
         # Line ID is formatted as
-        # "post_0_0_pre_400_150"
-        # Read as "Line between (0,0) and (400,150)"
-        lineID = f"post_rect_{d.getX()}_{d.getY()}_pre_rect_{pipelines[newPipelineIndex].getX()}_{pipelines[newPipelineIndex].getY()}"
-
-        #Depending on where the second box is, it will detect if it is not to the right then below or above the previous pipeline box
-        if (pipelines[newPipelineIndex].getX() - 30 < d.getX() + CONST_PIPELINE_WIDTH):
-            if pipelines[newPipelineIndex].getY() > d.getY():
-                start = bottom
-            else:
-                start = top 
-        #If it is to the right, its placed to the right of the prev pipeline
-
-        # If the middle of the second box is to the left of the right edge of the first box, it will connect to the top or bottom
-        if (pipelines[newPipelineIndex].getX() + (CONST_PIPELINE_WIDTH / 2) < d.getX() + CONST_PIPELINE_WIDTH):
-            if pipelines[newPipelineIndex].getY() > d.getY():
-                end = end_top
-                end_arrow = end_arrow_top
-                arrowhead_x = end[0] + CONST_ARROW_Y
-                arrowhead_y = end[1] + CONST_ARROW_X
-                arrowhead_rotation = 90
-            else:
-                end = end_bottom 
-                end_arrow = end_arrow_bottom
-                arrowhead_x = end[0] + CONST_ARROW_Y
-                arrowhead_y = end[1] - CONST_ARROW_X
-                arrowhead_rotation = 270
-        # otherwise it will connect to the left
+        # "post_card_<source hash>_pre_card_<target hash>"
+        # Read as "Line from the source card to the target card"
+        lineID = element_ids.edge_id(sourceID, targetID)
+        element_ids.add_edge(element_ids.index(vsm), lineID, sourceID, targetID)
 
-        
         # Draw first line segment
-        lineA = drawLine(
+        drawEdge(
             vsm,
             start,
             end,
-            id=f"{lineID}-SegmentA",
+            f"{lineID}-SegmentA",
+            sourceID,
+            targetID,
         )
-        # Draw second line segment (arrow)
-        lineB = drawLine(
+        # Draw second line segment, ending in the arrowhead
+        drawEdge(
             vsm,
             end,
             end_arrow,
-            id=f"{lineID}-SegmentB",
+            f"{lineID}-SegmentB",
+            sourceID,
+            targetID,
+            arrowhead=True,
         )
 
-        # Add animations for line segments
-        animateLine(
-            lineA,
-            f"rect_{pipelines[newPipelineIndex].getX()}_{pipelines[newPipelineIndex].getY()}",
-        )
-        animateLine(
-            lineB,
-            f"rect_{pipelines[newPipelineIndex].getX()}_{pipelines[newPipelineIndex].getY()}",
-        )
-
-        arrow = insertIconRotation(
-            container,
-            "resources\\arrowhead.png",
-            arrowhead_x,
-            arrowhead_y,
-            CONST_ARROW_HEIGHT,
-            CONST_ARROW_HEIGHT,
-            arrowhead_rotation
-        )
-
-        arrow["id"] = lineID + "-arrow"
-
         # checking the current pipelines
         print("IN ConnectDependencies(): ")
         for i in range(len(pipelines)):
@@ -849,6 +928,84 @@ def connectDependencies(vsm, container, pipelines, newPipelineIndex):
                 + str(pipelines[i].getY())
             )
 
+def loadPositions(positionsFile):
+    """Reads the card positions saved with the VSM's Save Positions button
+
+    Args:
+        positionsFile (str): Path of the saved JSON file
+
+    Returns:
+        dict: The (x, y) of each saved card by card id. Empty if the file
+        can't be read
+    """
+    try:
+        with open(positionsFile, "r") as f:
+            saved = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Could not load positions from {positionsFile}: {e}")
+        return {}
+
+    positions = {}
+    for item in saved:
+        cardId = item.get("id")
+        # Cards saved before their ids were stable are found by pipeline name
+        if cardId is None or element_ids.LEGACY_CARD_ID.match(cardId):
+            name = item.get("pipeline")
+            if name is None:
+                print(f"Saved position for {cardId} has no pipeline name, skipping")
+                continue
+            cardId = element_ids.card_id(name)
+        positions[cardId] = (int(item["x"]), int(item["y"]))
+    return positions
+
+
+def pinnedPipelines(pipelines, positions, cards):
+    """Matches saved positions to the pipelines they belong to
+
+    Pipelines that share a name have cards of their own, each keeps its own
+    position.
+
+    Args:
+        pipelines (Array(Pipeline)): The pipelines on the VSM
+        positions (dict): Saved (x, y) by card id, from loadPositions
+        cards (dict): The card id of each pipeline, from element_ids.assign_cards
+
+    Returns:
+        dict: The saved (x, y) of each pipeline that has one, by pipeline
+    """
+    if not positions:
+        return {}
+    pins = {}
+    for pipeline in pipelines:
+        position = positions.get(cards[pipeline])
+        if position is not None:
+            pins[pipeline] = position
+    return pins
+
+
+def nextFreeY(corners, pinnedCards, pipeline, x, y):
+    """Moves a card down until it is off every other card's corner and off the pinned cards
+
+    Args:
+        corners (SpatialGrid): Top left corners of the cards
+        pinnedCards (SpatialGrid): Cards that keep their saved position
+        pipeline (Pipeline): The pipeline being placed
+        x (int): Left edge of the card
+        y (int): Top edge to start from
+
+    Returns:
+        int: The top edge of the first free spot
+    """
+    while True:
+        y = corners.next_free_y(x, y, 0, 0, 1, exclude=pipeline)
+        free = pinnedCards.next_free_y(
+            x, y, CONST_PIPELINE_WIDTH, CONST_PIPELINE_HEIGHT, CONST_PIPELINE_HEIGHT + 50, exclude=pipeline
+        )
+        if free == y:
+            return y
+        y = free
+
+
 def alignPipelineChain(y_coord, maxSiblings, chain):
     if maxSiblings > 0:
         new_y_offset = maxSiblings * 150 + 50
@@ -866,12 +1023,45 @@ def alignPipelineChain(y_coord, maxSiblings, chain):
     return int(new_y_offset)
 
 
-def addPipelinesToVSM(vsm, pipelines):
+def addPipelinesLayered(vsm, pipelines, dummies=(), pins=None):
+    """Places every pipeline with the layered layout, then draws them
+
+    Args:
+        vsm (svgwrite.Drawing): The VSM to add the pipelines to
+        pipelines (Array(Pipeline)): A list of Pipeline objects to add to the VSM
+        dummies (set): The dummy pipelines added by resolveDependencies
+        pins (dict): The (x, y) of pipelines that keep their saved position, by pipeline
+
+    Returns:
+        None
+    """
+    index = PipelineIndex(pipelines)
+    pinned = {}
+    if pins:
+        pinned = {node: pins[p] for node, p in enumerate(pipelines) if p in pins}
+    layout.layout_pipelines(
+        pipelines, CONST_PIPELINE_WIDTH, CONST_PIPELINE_HEIGHT, index=index, pinned=pinned
+    )
+    syncDependencyCoordinates(pipelines, index)
+
+    for pipelineIndex, pipeline in enumerate(pipelines):
+        print(f"Drawing {pipeline.getName()} at {pipeline.getX()}, {pipeline.getY()}")
+        pipelineContainer = drawPipeline(vsm, pipeline.getX(), pipeline.getY(), pipeline)
+        if pipeline in dummies:
+            pipelineContainer.attribs["id"] = "dummy_" + pipeline.getName()
+        connectDependencies(vsm, pipelineContainer, pipelines, pipelineIndex, index)
+        flushDrawing(vsm)
+
+
+def addPipelinesToVSM(vsm, pipelines, layoutMode=CONST_DEFAULT_LAYOUT, positions=None):
     """Adds a list of multiple pipelines to the VSM
 
     Args:
         vsm (svgwrite.Drawing): The VSM to add the pipelines to
         pipelines (Array(Pipeline)):       A list of Pipeline objects to add to the VSM
+        layoutMode (str): CONST_LAYOUT_INCREMENTAL or CONST_LAYOUT_LAYERED
+        positions (dict): Saved (x, y) of cards by card id, from loadPositions.
+            These pipelines are drawn there and only the others are laid out
 
     Returns:
         None
@@ -879,6 +1069,18 @@ def addPipelinesToVSM(vsm, pipelines):
     Raises:
         None
     """
+    # Dependencies missing from the config get their dummy before anything
+    # is placed, so every pipeline is placed and drawn exactly once
+    dummies = resolveDependencies(pipelines)
+    # Pipelines that share a name get numbered card ids, in list order
+    cards = element_ids.assign_cards(vsm, pipelines)
+    pins = pinnedPipelines(pipelines, positions, cards)
+
+    if layoutMode == CONST_LAYOUT_LAYERED:
+        addPipelinesLayered(vsm, pipelines, dummies, pins)
+        return
+    if layoutMode != CONST_LAYOUT_INCREMENTAL:
+        print(f"Unknown layout mode {layoutMode}, using {CONST_LAYOUT_INCREMENTAL}")
 
     # As it goes through the pipelines, it will append each to an array. If the next pipeline is a sibling of another depedent pipeline,
     # it will pair it with the previous one and increase the sibling count and check if the max sibling count needs to change.
@@ -889,6 +1091,9 @@ def addPipelinesToVSM(vsm, pipelines):
     chain = []
     y_offset = 0
 
+    # Built once for the whole layout pass
+    index = PipelineIndex(pipelines)
+
     # For each pipeline in pipelines
     for newPipelineIndex in range(len(pipelines)):
         # Minimum x, y is 50,50
@@ -898,11 +1103,12 @@ def addPipelinesToVSM(vsm, pipelines):
 
         # If pipeline depends on another pipeline, draw to the right of dependency
         if len(pipelines[newPipelineIndex].getDependencies()) > 0:
-            x_coord, y_coord = checkDepenciesDrawn(vsm, pipelines, newPipelineIndex)
+            x_coord, y_coord = checkDepenciesDrawn(pipelines, newPipelineIndex, index)
             y_coord += y_offset
 
-            # If sibling of the last pipeline, append to the last chain element, otherwise append to the end of the chain
-            if newPipelineIndex - 1 >= 0 and newPipelineIndex - 1 < len(pipelines):
+            # If sibling of the last pipeline, append to the last chain element, otherwise append to the end of the chain.
+            # Pinned pipelines stay out of the chain, they aren't lined up with their siblings
+            if pipelines[newPipelineIndex] not in pins and newPipelineIndex - 1 >= 0 and newPipelineIndex - 1 < len(pipelines):
                 if len(chain) > 0 and pipelines[newPipelineIndex - 1].getX() == x_coord:
                     chain[-1].append(pipelines[newPipelineIndex])
                     if len(chain[-1]) > maxSiblings:
@@ -913,6 +1119,10 @@ def addPipelinesToVSM(vsm, pipelines):
         # Update coords to new values at the right of their dependencies
         pipelines[newPipelineIndex].setX(x_coord)
         pipelines[newPipelineIndex].setY(y_coord)
+        # Pinned pipelines go where they were saved, what depends on them follows
+        if pipelines[newPipelineIndex] in pins:
+            pipelines[newPipelineIndex].setX(pins[pipelines[newPipelineIndex]][0])
+            pipelines[newPipelineIndex].setY(pins[pipelines[newPipelineIndex]][1])
 
         if len(pipelines[newPipelineIndex].getDependencies()) <= 0 or newPipelineIndex == len(pipelines) - 1:
             # align pipelines in the chain to be centered and clear the chain for the next row
@@ -920,7 +1130,16 @@ def addPipelinesToVSM(vsm, pipelines):
             y_coord += y_offset
             chain.clear()
             maxSiblings = 0
-            chain.append([pipelines[newPipelineIndex]])
+            if pipelines[newPipelineIndex] not in pins:
+                chain.append([pipelines[newPipelineIndex]])
+
+    # Top left corner of every card, to find cards drawn on the exact same spot.
+    # Corners are points, so a one pixel cell holds only the cards on that spot
+    corners = SpatialGrid(1, 1)
+    for pipeline in pipelines:
+        corners.insert(pipeline, pipeline.getX(), pipeline.getY(), 0, 0)
+    # Cards that were moved by hand, the others are kept off them
+    pinnedCards = placedCards(pins)
 
     for pipelineIndex in range(len(pipelines)):
         x_coord = pipelines[pipelineIndex].getX()
@@ -928,7 +1147,7 @@ def addPipelinesToVSM(vsm, pipelines):
 
         # Sync coordinates before checking collisions
         # Ensure pipeline dependency objects reflect what is actually drawn on screen
-        syncDependencyCoordinates(pipelines)
+        syncPipelineDependencies(pipelines[pipelineIndex], index)
 
         # Check incoming pipeline for collisions with existing pipelines
         #while willCollide(
@@ -943,13 +1162,9 @@ def addPipelinesToVSM(vsm, pipelines):
 
         #    pipelines[pipelineIndex].setY(y_coord)
 
-        while any(
-            i != pipelineIndex and 
-            pipelines[i].getX() == x_coord and 
-            pipelines[i].getY() == y_coord
-            for i in range(len(pipelines))
-        ):
-            y_coord += 1
+        if pipelines[pipelineIndex] not in pins:
+            y_coord = nextFreeY(corners, pinnedCards, pipelines[pipelineIndex], x_coord, y_coord)
+        corners.insert(pipelines[pipelineIndex], x_coord, y_coord, 0, 0)
 
         pipelines[pipelineIndex].setX(x_coord)
         pipelines[pipelineIndex].setY(y_coord)
@@ -960,89 +1175,151 @@ def addPipelinesToVSM(vsm, pipelines):
         pipelineContainer = drawPipeline(
             vsm, x_coord, y_coord, pipelines[pipelineIndex]
         )
+        # Set id of container to "dummy" + pipeline name for easy identification
+        if pipelines[pipelineIndex] in dummies:
+            pipelineContainer.attribs["id"] = "dummy_" + pipelines[pipelineIndex].getName()
 
         # Draw line from dependencies to new pipeline
         print("CONNECTING LINES - message inside addPipelineToVSM")
-        connectDependencies(vsm, pipelineContainer, pipelines, pipelineIndex)
+        connectDependencies(vsm, pipelineContainer, pipelines, pipelineIndex, index)
+        # Nothing touches this pipeline's elements again
+        flushDrawing(vsm)
+
+    syncDependencyCoordinates(pipelines, index)
+
+
+def addHighlightScript(vsm):
+    """Embeds the script that highlights the lines into a card on mouse over
+
+    It goes after the pipelines, so the lines are there when it runs.
+
+    Args:
+        vsm (svgwrite.Drawing): The VSM
+
+    Returns:
+        None
+    """
+    vsm.add(vsm.script(content=CONST_HIGHLIGHT_SCRIPT))
+
+
+def addIdIndex(vsm):
+    """Embeds the index of the cards and lines drawn on the VSM
+
+    It maps each card id to its pipeline and position and each line id to
+    the cards it joins, so they can be found without searching the VSM.
+
+    Args:
+        vsm (svgwrite.Drawing): The VSM
+
+    Returns:
+        None
+    """
+    vsm.add(
+        vsm.script(
+            content=element_ids.index_json(element_ids.index(vsm)),
+            type="application/json",
+            id=element_ids.INDEX_ID,
+        )
+    )
 
 
 def resizeSVG(vsm):
     """
-    Resize the SVG by setting the width and height of the canvas based on the elements' positions.
+    Resize the SVG to fit everything drawn on it.
+
+    The drawing helpers keep a running bounding box of what they draw, so the
+    elements aren't walked again. The canvas is at least
+    CONST_MIN_CANVAS_SIZE wide and high and leaves CONST_CANVAS_MARGIN around
+    the drawing, growing left or up when something was drawn at negative
+    coordinates. The viewBox matches the canvas.
 
     Args:
-        vsm (dict): The SVG data represented as a dictionary.
+        vsm (svgwrite.Drawing or StreamingDrawing): The VSM
 
     Returns:
-        dict: The updated SVG data with the width and height adjusted.
+        svgwrite.Drawing or StreamingDrawing: The VSM with its width, height and viewBox set
     """
-    # Set the width and height of the canvas
-    max_x, max_y = 3000 - CONST_PIPELINE_WIDTH, 3000 - CONST_PIPELINE_HEIGHT
-
-    for group in vsm.elements:
-        for e in group.elements:
-            if e.attribs.get("x") is not None:
-                x = int(float(e.attribs.get("x")))
-                y = int(float(e.attribs.get("y")))
-                if x > max_x:
-                    max_x = x
-                if y > max_y:
-                    max_y = y
-
-    vsm["width"] = max_x + CONST_PIPELINE_WIDTH
-    vsm["height"] = max_y + CONST_PIPELINE_HEIGHT
+    min_x, min_y = 0, 0
+    max_x, max_y = CONST_MIN_CANVAS_SIZE, CONST_MIN_CANVAS_SIZE
+
+    box = svg_bounds.bounds(vsm)
+    if not box.is_empty():
+        if box.min_x < 0:
+            min_x = math.floor(box.min_x) - CONST_CANVAS_MARGIN
+        if box.min_y < 0:
+            min_y = math.floor(box.min_y) - CONST_CANVAS_MARGIN
+        max_x = max(max_x, math.ceil(box.max_x) + CONST_CANVAS_MARGIN)
+        max_y = max(max_y, math.ceil(box.max_y) + CONST_CANVAS_MARGIN)
+
+    vsm["width"] = max_x - min_x
+    vsm["height"] = max_y - min_y
+    vsm["viewBox"] = f"{min_x} {min_y} {max_x - min_x} {max_y - min_y}"
     return vsm
 
 
 def sortPipelines(pipelines):
-    # Step 1: Build dependencies list
-    dependencies = []
-    for pipeline in pipelines:
-        for dep in pipeline.getDependencies():
-            dependencies.append((dep.getName(), pipeline.getName()))
-
-    # Step 2: Build adjacency list and in-degree dictionary
-    graph = defaultdict(list)
-    in_degree = defaultdict(int)
-    for parent, child in dependencies:
-        graph[parent].append(child)
-        in_degree[child] += 1
-        if parent not in in_degree:
-            in_degree[parent] = 0
-
-    # Step 3: Identify independent pipelines (no dependencies)
-    queue = deque(sorted([node for node in in_degree if in_degree[node] == 0]))
-
-    # Step 4: Process chains of dependent pipelines
-    sorted_list = []  # Maintain full dependency chains
-    visited = set()
-
-    while queue:
-        node = queue.popleft()
-        if node in visited:
-            continue
-        chain = []  # Store full dependency chain
-        chain_queue = deque([node])
+    """Orders pipelines so each one comes after the pipelines it depends on
 
-        while chain_queue:
-            current = chain_queue.popleft()
-            if current in visited:
-                continue
-            visited.add(current)
-            chain.append(current)
-            for neighbor in sorted(graph[current]):  # Process dependencies
-                in_degree[neighbor] -= 1
-                if in_degree[neighbor] == 0:
-                    chain_queue.append(neighbor)
+    Pipelines are ordered one chain at a time, starting from a pipeline with
+    no dependencies, and config order decides whenever there is a choice.
+    Pipelines that depend on each other in a loop stay next to each other
+    and are flagged with setCycle so they stand out on the VSM.
 
-        sorted_list.append(chain)  # Add full chain to sorted list
+    Args:
+        pipelines (Array(Pipeline)): The pipelines to sort, sorted in place
 
-    # Flatten the chains into a single sorted order
-    ordered_names = [name for chain in sorted_list for name in chain]
+    Returns:
+        None
+    """
+    # Step 1: One node per pipeline name, in config order
+    nodeOf = {}
+    ranks = []
+    pipelineNodes = []
+    for configIndex, pipeline in enumerate(pipelines):
+        key = name_key(pipeline.getName())
+        if key is None or key not in nodeOf:
+            ranks.append((configIndex, 1))
+            if key is not None:
+                nodeOf[key] = len(ranks) - 1
+            pipelineNodes.append(len(ranks) - 1)
+        else:
+            pipelineNodes.append(nodeOf[key])
 
-    # Step 5: Sort pipelines based on dependency chain order
-    name_index_map = {name: i for i, name in enumerate(ordered_names)}
-    pipelines.sort(key=lambda pipeline: name_index_map.get(pipeline.getName(), float('inf')))
+    # Step 2: Edges from each dependency to its dependent. Dependencies missing
+    # from the config go just before the first pipeline needing them
+    edges = []
+    for configIndex, pipeline in enumerate(pipelines):
+        for dep in pipeline.getDependencies():
+            key = name_key(dep.getName())
+            if key is None:
+                continue
+            if key not in nodeOf:
+                ranks.append((configIndex, 0))
+                nodeOf[key] = len(ranks) - 1
+            edges.append((nodeOf[key], pipelineNodes[configIndex]))
+
+    # Step 3: Order the graph with dependency loops collapsed into groups
+    groups, loops = dependency_graph.dependency_order(ranks, edges)
+
+    position = [0] * len(ranks)
+    cycleOf = {}
+    placed = 0
+    cycles = 0
+    for group, isLoop in zip(groups, loops):
+        for node in group:
+            position[node] = placed
+            placed += 1
+            if isLoop:
+                cycleOf[node] = cycles
+        if isLoop:
+            cycles += 1
+
+    # Step 4: Sort pipelines based on the order of their nodes
+    for pipeline, node in zip(pipelines, pipelineNodes):
+        if node in cycleOf:
+            pipeline.setCycle(cycleOf[node])
+    order = [position[node] for node in pipelineNodes]
+    pipelines[:] = [pipelines[i] for i in sorted(range(len(pipelines)), key=order.__getitem__)]
 
 
 def addSaveButton(canvas):
@@ -1055,8 +1332,72 @@ def addSaveButton(canvas):
     button_group.add(text)
 
     canvas.add(button_group)
+    svg_bounds.include_box(canvas, 10, 10, 130, 30)
+
+def loadSpec(spec):
+    """
+    Loads a single YML spec, turning any unexpected exception into a failed load.
+
+    Args:
+        spec (list): A [pipeline name, file path or URL] pair from the config file
+
+    Returns:
+        dict: The parsed YML object, or None if the spec could not be loaded
+    """
+    try:
+        return parser.parse_yml_file(spec)
+    except Exception as e:
+        print(f"Error loading {spec}: {str(e)}")
+        return None
+
+
+def ingestPipelines(specs, max_workers=CONST_INGEST_WORKERS, templates=None):
+    """
+    Fetches and parses every YML spec concurrently, then builds the pipelines in config order.
+
+    Args:
+        specs (list): The yml_filepath entries from the config file
+        max_workers (int): The maximum number of specs loaded at the same time
+        templates (TemplateResolver): Parses each template once for all specs, a new one if None
+
+    Returns:
+        list: One Pipeline object per spec, in the same order as specs. Specs that fail
+        to load are returned as "File Error" pipelines.
+    """
+    if len(specs) == 0:
+        return []
+
+    # Bounded pool, map() hands results back in submission order
+    workers = max(1, min(int(max_workers), len(specs)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        ymlObjects = list(executor.map(loadSpec, specs))
+
+    # Describe every schedule in the config at once, createPipeline looks them up here
+    schedules = parser.describe_schedules(ymlObjects)
+
+    # Templates shared by several pipelines are only parsed once
+    if templates is None:
+        templates = parser.TemplateResolver()
+
+    pipelines = []
+    for spec, ymlObject in zip(specs, ymlObjects):
+        # Create pipeline object from YML file
+        pl = None
+        if ymlObject is None:
+            # We still want to create a pipeline to display an error to the user
+            # Malformed specs still get reported, with whatever was given
+            badPath = spec[1] if len(spec) > 1 else spec
+            pl = parser.createPipeline("")
+            pl.setTrigger(f"File Error check config file path for: {badPath}")
+        else:
+            pl = parser.createPipeline(ymlObject, templates, schedules)
+
+        pipelines.append(pl)
+
+    return pipelines
+
 
-def generate(vsm_name):
+def generate(vsm_name, max_workers=None, positionsFile=None):
     config_data = None
 
     try:
@@ -1079,54 +1420,89 @@ def generate(vsm_name):
         print(message)
         return message
 
-    pipelines = []
+    if max_workers is None:
+        max_workers = config_data.get("ingest_workers", CONST_INGEST_WORKERS)
 
-    # Create a pipeline object for every yml file read
-    for spec in config_data["yml_filepath"]:
-        # Load in YML file as object
-        ymlObject = parser.parse_yml_file(spec)
+    # Fresh DevOps session per run so .env changes are picked up, loaded once
+    devops_client.reset_client()
 
-        # Create pipeline object from YML file
-        pl = None
-        if ymlObject is None:
-            # We still want to create a pipeline to display an error to the user
-            pl = parser.createPipeline("")
-            pl.setTrigger(f"File Error check config file path for: {spec[1]}")
-        else:
-            pl = parser.createPipeline(ymlObject)
+    # Reuse parsed local yml files from earlier runs unless turned off
+    if config_data.get("parse_cache", True):
+        cache = parse_cache.configure(
+            config_data.get("parse_cache_dir", parse_cache.DEFAULT_CACHE_DIR),
+            config_data.get("parse_cache_max_bytes", parse_cache.DEFAULT_MAX_BYTES),
+        )
+    else:
+        cache = None
+        parse_cache.disable()
+
+    # Revalidate remote yml files instead of downloading them, or skip the network when offline
+    if config_data.get("response_cache", True):
+        remote_cache = response_cache.configure(
+            config_data.get("response_cache_dir", response_cache.DEFAULT_CACHE_DIR),
+            config_data.get("offline", False),
+        )
+    else:
+        remote_cache = None
+        response_cache.disable()
 
-        pipelines.append(pl)
+    # Template paths are indexed once for every pipeline in the run
+    templateIndex = parser.TemplateIndex(config_data.get("template_dictionary", []))
+    templates = parser.TemplateResolver(templateIndex)
+
+    # Create a pipeline object for every yml file read
+    pipelines = ingestPipelines(config_data["yml_filepath"], max_workers, templates=templates)
+
+    if cache is not None:
+        print("parse cache ", cache.stats())
+        parse_cache.disable()
+    if remote_cache is not None:
+        print("response cache ", remote_cache.stats())
+        response_cache.disable()
+    print("cron cache ", parser.cron_service.describer.stats())
 
     if(vsm_name == ""):
         fileName = pipelines[len(pipelines) - 1].getName() + "_VSM.svg"
     else:
         fileName = vsm_name + ".svg"
 
-    vsm = svgwrite.Drawing(fileName, profile="full", onload="makeDraggable(evt)")
+    vsm = createDrawing(fileName, config_data.get("renderer", CONST_DEFAULT_RENDERER))
+    try:
+        # Pipelines that share a name are numbered in config order
+        element_ids.assign_cards(vsm, pipelines)
+
+        # Put each icon in the SVG once so it works without the resources folder
+        if config_data.get("embed_icons", False):
+            svg_defs.embed_images(vsm)
 
-    sortPipelines(pipelines)
+        sortPipelines(pipelines)
 
-    for p in pipelines:
-        print("order ", p.getName())
+        for p in pipelines:
+            print("order ", p.getName())
 
-    # Draw pipeline with parameters on SVG file
-    addPipelinesToVSM(vsm, pipelines)
+        # Cards moved by hand and saved with the Save Positions button stay where they were put
+        if positionsFile is None:
+            positionsFile = config_data.get("positions")
+        positions = loadPositions(positionsFile) if positionsFile else None
 
-    # Check for any dummy pipelines that need to be replaced.
-    # This is done after all pipelines are drawn, and handles the scenario
-    # where the config file is out of order.
-    consolidateDummies(vsm, pipelines)
+        # Draw pipeline with parameters on SVG file
+        addPipelinesToVSM(vsm, pipelines, config_data.get("layout", CONST_DEFAULT_LAYOUT), positions)
 
-    # Add the save button to the SVG
-    addSaveButton(vsm)
+        # Add the save button to the SVG
+        addSaveButton(vsm)
 
-    vsm.add(svgwrite.container.Script(href=".\\index.js"))
+        vsm.add(vsm.script(href=".\\index.js"))
+        addHighlightScript(vsm)
+        addIdIndex(vsm)
 
-    # Resize the SVG to fit all elements if necessary
-    vsm = resizeSVG(vsm)
+        # Resize the SVG to fit all elements if necessary
+        vsm = resizeSVG(vsm)
 
-    # Save the vsm to the canvas.
-    vsm.save()
+        # Save the vsm to the canvas.
+        vsm.save()
+    finally:
+        # The body of a streamed drawing may have spilled to a file on disk
+        closeDrawing(vsm)
 
     # Try to delete the existing symlink if it exists
     if os.path.islink("latest.svg"):
@@ -5,7 +5,8 @@ import webbrowser
 from tkinter import filedialog, messagebox, simpledialog
 import xml.etree.ElementTree as ET
 import json
-import re
+
+from VSMWizard import svg_patch
 
 class MenuGUI:
     def __init__(self):
@@ -377,101 +378,27 @@ class MenuGUI:
         with open(json_file, "r") as f:
             positions = json.load(f)
 
-        # Parse the SVG file
-        tree = ET.parse(svg_file)
-        root = tree.getroot()
-
-        ns = {"svg": "http://www.w3.org/2000/svg"}  # Namespace support
-
-        id_updates = {}
-
-        # Find all <g> groups in the SVG
-        groups = root.findall(".//{http://www.w3.org/2000/svg}g")
-
-        # Update elements based on JSON
-        for item in positions:
-            element_id = item["id"]
-            new_x = int(item["x"])
-            new_y = int(item["y"])
-
-            # Find element by ID
-            element = root.find(f".//*[@id='{element_id}']", ns)
-            if element is None:
-                print(f"Element with id {element_id} not found.")
-                continue
-
-            # Find the parent <g> container
-            parent_group = None
-            for group in groups:
-                if element in list(group):
-                    parent_group = group
-                    break
-
-            if parent_group is not None:
-                print(f"Moving group for {element_id}")
-
-                # Find original position
-                old_x = int(float(element.get("x", "0")))
-                old_y = int(float(element.get("y", "0")))
-                dx, dy = new_x - old_x, new_y - old_y
-
-                # Move everything inside <g>
-                for child in parent_group:
-                    # Update x and y attributes for elements that have them
-                    if "x" in child.attrib and "y" in child.attrib:
-                        child.set("x", str(int(float(child.get("x"))) + dx))
-                        child.set("y", str(int(float(child.get("y"))) + dy))
-
-                    elif "cx" in child.attrib and "cy" in child.attrib:  # for circles
-                        child.set("cx", str(int(float(child.get("cx"))) + dx))
-                        child.set("cy", str(int(float(child.get("cy"))) + dy))
-
-                    # check children inside anchor for x and y
-                    if child.tag.endswith("a"):  # Check if it's an anchor tag
-                        for sub_child in child:
-                            if "x" in sub_child.attrib and "y" in sub_child.attrib:
-                                sub_child.set("x", str(int(float(sub_child.get("x"))) + dx))
-                                sub_child.set("y", str(int(float(sub_child.get("y"))) + dy))
-
-                    print(f"Moved {child.tag} inside <g>")
-
-                # Store ID changes for renaming related elements
-                new_element_id = f"rect_{new_x}_{new_y}"
-                id_updates[element_id] = new_element_id
-                element.set("id", new_element_id)
-
-            else:
-                # If no <g>, move just the element
-                element.set("x", str(new_x))
-                element.set("y", str(new_y))
-                new_element_id = f"rect_{new_x}_{new_y}"
-                id_updates[element_id] = new_element_id
-                element.set("id", new_element_id)
-                print(f"Updated {element_id}: x={new_x}, y={new_y}")
-
-        # Update related element IDs (post_ and pre_)
-        for elem in root.findall(".//*[@id]", ns):
-            old_id = elem.get("id")
-            if not old_id:
-                continue
-
-            # Match both post and pre components
-            match = re.match(r"(post_(rect_\d+_\d+))_(pre_(rect_\d+_\d+))(.*)", old_id)
-            if match:
-                post_full, post_rect_id, pre_full, pre_rect_id, suffix = match.groups()
-
-                new_post_id = id_updates.get(post_rect_id, post_rect_id)
-                new_pre_id = id_updates.get(pre_rect_id, pre_rect_id)
-
-                new_id = f"post_{new_post_id}_pre_{new_pre_id}{suffix}"
-                elem.set("id", new_id)
-                print(f"Updated ID: {old_id} → {new_id}")
-
-        # Save and open the updated SVG
         base_name = os.path.splitext(os.path.basename(svg_file))[0]
         output_file = os.path.join(project_root, f"{base_name}_updated.svg")
-        tree.write(output_file)
+
+        # VSMs and saves from before card ids were stable get the new ids first,
+        # then the cards are moved and their lines follow them
+        if svg_patch.should_stream(svg_file):
+            # Too large to hold in memory twice, patched as it is copied
+            renamed = svg_patch.patch_file(svg_file, output_file, positions)
+        else:
+            tree = ET.parse(svg_file)
+            renamed = svg_patch.patch_tree(tree, positions)
+            tree.write(output_file)
         print(f"Updated SVG saved as {output_file}")
+
+        # Saves from before card ids were stable are written again with the new ids
+        if renamed:
+            json_base_name = os.path.splitext(os.path.basename(json_file))[0]
+            positions_file = os.path.join(project_root, f"{json_base_name}_updated.json")
+            with open(positions_file, "w") as f:
+                json.dump(positions, f, indent=2)
+            print(f"Updated save file saved as {positions_file}")
         webbrowser.open(f'file://{output_file}')
 
 
@@ -0,0 +1,100 @@
+"""Case-insensitive lookup of pipelines by name.
+
+Dependencies name the pipeline they wait on, and the VSM matches those names
+ignoring case. The index is built once per layout pass and pipelines added to
+the VSM afterwards, like dummies, are added to it as they are created.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+
+
+def name_key(name):
+    """Returns the key a pipeline name is indexed under, None for no name."""
+    if name is None:
+        return None
+    return name.lower()
+
+
+class PipelineIndex:
+    """Pipelines by name and by the names they depend on.
+
+    Each pipeline keeps the position it was added at, which is its index in
+    the pipeline list when the index is built from that list. When several
+    pipelines share a name, lookups return the last one, as the old scans
+    over the list did.
+    """
+
+    def __init__(self, pipelines=()):
+        self._pipelines = []
+        self._positions = defaultdict(list)
+        self._dependents = defaultdict(list)
+        for pipeline in pipelines:
+            self.add(pipeline)
+
+    def __len__(self):
+        return len(self._pipelines)
+
+    def __contains__(self, name):
+        return name_key(name) in self._positions
+
+    def add(self, pipeline):
+        """Adds a pipeline after the ones already indexed.
+
+        Args:
+            pipeline (Pipeline): The pipeline to add
+
+        Returns:
+            int: The position of the pipeline
+        """
+        position = len(self._pipelines)
+        self._pipelines.append(pipeline)
+        key = name_key(pipeline.getName())
+        if key is not None:
+            self._positions[key].append(position)
+        for dependency in pipeline.getDependencies():
+            dependency_key = name_key(dependency.getName())
+            if dependency_key is not None:
+                self._dependents[dependency_key].append(pipeline)
+        return position
+
+    def position(self, name, before=None):
+        """Finds where the pipeline with a name was added.
+
+        Args:
+            name (str): Pipeline name, any case
+            before (int): Only look at pipelines added before this position
+
+        Returns:
+            int: The position of the last match, or None if there is none
+        """
+        positions = self._positions.get(name_key(name))
+        if not positions:
+            return None
+        if before is None:
+            return positions[-1]
+        found = bisect_left(positions, before)
+        return positions[found - 1] if found > 0 else None
+
+    def get(self, name, before=None):
+        """Finds the pipeline with a name.
+
+        Args:
+            name (str): Pipeline name, any case
+            before (int): Only look at pipelines added before this position
+
+        Returns:
+            Pipeline: The last match, or None if there is none
+        """
+        position = self.position(name, before)
+        return None if position is None else self._pipelines[position]
+
+    def dependents(self, name):
+        """Lists the pipelines that depend on a name.
+
+        Args:
+            name (str): Pipeline name, any case
+
+        Returns:
+            list: The dependent pipelines, in the order they were added
+        """
+        return list(self._dependents.get(name_key(name), ()))
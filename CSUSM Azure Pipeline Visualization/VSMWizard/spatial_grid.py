@@ -0,0 +1,156 @@
+"""Spatial hash of the rectangles placed on the VSM.
+
+The canvas is split into fixed size cells and every rectangle is listed in
+each cell it touches, so an overlap query only looks at the few rectangles
+near the area asked about instead of every card on the canvas.
+"""
+from collections import defaultdict
+
+
+class SpatialGrid:
+    """Rectangles bucketed by the grid cells they cover.
+
+    Rectangles are closed: two cards that share an edge overlap, and a
+    rectangle with no width or height is a point that only overlaps what
+    covers it.
+
+    Attributes:
+        cell_width: Width of a grid cell
+        cell_height: Height of a grid cell
+    """
+
+    def __init__(self, cell_width, cell_height):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self._cells = defaultdict(set)
+        self._rects = {}
+
+    def __len__(self):
+        return len(self._rects)
+
+    def __contains__(self, item):
+        return item in self._rects
+
+    def _cell_range(self, x, y, width, height):
+        first_col = int(x // self.cell_width)
+        last_col = int((x + width) // self.cell_width)
+        first_row = int(y // self.cell_height)
+        last_row = int((y + height) // self.cell_height)
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                yield col, row
+
+    def insert(self, item, x, y, width, height):
+        """Adds a rectangle, replacing any rectangle already stored for the item.
+
+        Args:
+            item (hashable): The object the rectangle belongs to
+            x (int): Left edge
+            y (int): Top edge
+            width (int): Width of the rectangle
+            height (int): Height of the rectangle
+        """
+        if item in self._rects:
+            self.remove(item)
+        self._rects[item] = (x, y, width, height)
+        for cell in self._cell_range(x, y, width, height):
+            self._cells[cell].add(item)
+
+    def remove(self, item):
+        """Removes the rectangle stored for the item, if there is one.
+
+        Args:
+            item (hashable): The object the rectangle belongs to
+        """
+        rect = self._rects.pop(item, None)
+        if rect is None:
+            return
+        for cell in self._cell_range(*rect):
+            bucket = self._cells[cell]
+            bucket.discard(item)
+            if not bucket:
+                del self._cells[cell]
+
+    def move(self, item, x, y):
+        """Moves the item's rectangle, keeping its size.
+
+        Args:
+            item (hashable): The object the rectangle belongs to
+            x (int): New left edge
+            y (int): New top edge
+
+        Raises:
+            KeyError: If the item has no rectangle
+        """
+        _, _, width, height = self._rects[item]
+        self.insert(item, x, y, width, height)
+
+    def query(self, x, y, width, height, exclude=None):
+        """Lists the items whose rectangles overlap an area.
+
+        Args:
+            x (int): Left edge of the area
+            y (int): Top edge of the area
+            width (int): Width of the area
+            height (int): Height of the area
+            exclude (hashable): Item to leave out, usually the one being placed
+
+        Returns:
+            list: The overlapping items
+        """
+        return list(self._overlapping(x, y, width, height, exclude))
+
+    def overlaps(self, x, y, width, height, exclude=None):
+        """Checks if anything other than exclude overlaps an area.
+
+        Args:
+            x (int): Left edge of the area
+            y (int): Top edge of the area
+            width (int): Width of the area
+            height (int): Height of the area
+            exclude (hashable): Item to leave out, usually the one being placed
+
+        Returns:
+            bool: True if at least one rectangle overlaps the area
+        """
+        for _ in self._overlapping(x, y, width, height, exclude):
+            return True
+        return False
+
+    def next_free_y(self, x, y, width, height, step, exclude=None):
+        """Finds the first free spot going down a column.
+
+        Tries y, y + step, y + 2 * step, ... until the area is clear.
+
+        Args:
+            x (int): Left edge of the area
+            y (int): Top edge to start from
+            width (int): Width of the area
+            height (int): Height of the area
+            step (int): How far to move down after each clash, must be positive
+            exclude (hashable): Item to leave out, usually the one being placed
+
+        Returns:
+            int: The top edge of the first free spot
+        """
+        while self.overlaps(x, y, width, height, exclude):
+            y += step
+        return y
+
+    def _overlapping(self, x, y, width, height, exclude):
+        right = x + width
+        bottom = y + height
+        seen = set()
+        for cell in self._cell_range(x, y, width, height):
+            for item in self._cells.get(cell, ()):
+                if item == exclude or item in seen:
+                    continue
+                seen.add(item)
+                other_x, other_y, other_width, other_height = self._rects[item]
+                if (
+                    x <= other_x + other_width
+                    and other_x <= right
+                    and y <= other_y + other_height
+                    and other_y <= bottom
+                ):
+                    yield item
@@ -0,0 +1,120 @@
+"""Running bounding box of everything drawn on a VSM.
+
+The drawing helpers report the extent of each shape as they draw it, so the
+size of the canvas is known once drawing is done without walking the
+elements, and works the same for drawings that were already written out.
+Lines, circles and text count with their full extent, not just an x and y.
+
+Text has no measured size before a browser lays it out, so its width is
+estimated from the number of characters, the same way the cards center it.
+
+Works with svgwrite drawings and StreamingDrawing alike.
+"""
+import weakref
+
+# Estimated size of a character of text, in pixels
+CHAR_WIDTH = 8
+# Text is placed by its baseline, it reaches this far above it and below it
+TEXT_ASCENT = 16
+TEXT_DESCENT = 4
+
+# Per drawing, dropped along with the drawing
+_bounds = weakref.WeakKeyDictionary()
+
+
+class Bounds:
+    """The smallest box holding every shape reported so far."""
+
+    __slots__ = ("min_x", "min_y", "max_x", "max_y")
+
+    def __init__(self):
+        self.min_x = None
+        self.min_y = None
+        self.max_x = None
+        self.max_y = None
+
+    def is_empty(self):
+        return self.min_x is None
+
+    def add(self, left, top, right, bottom):
+        """Grows the box to hold another box."""
+        if self.min_x is None:
+            self.min_x, self.min_y, self.max_x, self.max_y = left, top, right, bottom
+            return
+        if left < self.min_x:
+            self.min_x = left
+        if top < self.min_y:
+            self.min_y = top
+        if right > self.max_x:
+            self.max_x = right
+        if bottom > self.max_y:
+            self.max_y = bottom
+
+
+def bounds(canvas):
+    """Returns the bounds of what has been drawn on a drawing.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+
+    Returns:
+        Bounds: Empty if nothing has been reported yet
+    """
+    box = _bounds.get(canvas)
+    if box is None:
+        box = _bounds[canvas] = Bounds()
+    return box
+
+
+def include_box(canvas, x, y, width, height):
+    """Adds a rectangle, image or icon to the bounds.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+        x (float): Left edge
+        y (float): Top edge
+        width (float): Width
+        height (float): Height
+    """
+    bounds(canvas).add(x, y, x + width, y + height)
+
+
+def include_circle(canvas, center_x, center_y, radius):
+    """Adds a circle to the bounds.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+        center_x (float): x of the center
+        center_y (float): y of the center
+        radius (float): Radius
+    """
+    bounds(canvas).add(center_x - radius, center_y - radius, center_x + radius, center_y + radius)
+
+
+def include_line(canvas, start, end, padding=0):
+    """Adds a line to the bounds.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+        start (tuple): x and y of one end
+        end (tuple): x and y of the other end
+        padding (float): How far the stroke, or a marker on an end, reaches past the line
+    """
+    bounds(canvas).add(
+        min(start[0], end[0]) - padding,
+        min(start[1], end[1]) - padding,
+        max(start[0], end[0]) + padding,
+        max(start[1], end[1]) + padding,
+    )
+
+
+def include_text(canvas, x, y, text):
+    """Adds a line of text, placed by the left end of its baseline, to the bounds.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+        x (float): Left edge
+        y (float): Baseline
+        text: The text, anything str() turns into what is shown
+    """
+    bounds(canvas).add(x, y - TEXT_ASCENT, x + len(str(text)) * CHAR_WIDTH, y + TEXT_DESCENT)
@@ -0,0 +1,184 @@
+"""Definitions shared by every card on the VSM.
+
+Gradients, style rules and markers go in the drawing's defs the first time
+they are asked for and are reused after that, so a map with thousands of
+cards still holds a single copy of each. Each is named by the caller and
+referenced by that name as its id.
+
+Works with svgwrite drawings and StreamingDrawing alike.
+"""
+import base64
+import mimetypes
+import os
+import re
+import weakref
+
+# Per drawing, dropped along with the drawing
+_registries = weakref.WeakKeyDictionary()
+
+
+class _Registry:
+    """What has been added to one drawing's defs so far."""
+
+    def __init__(self):
+        self.gradients = {}
+        self.markers = {}
+        self.symbols = {}
+        self.style_names = set()
+        self.style_sheet = None
+        self.embed_images = False
+
+
+def _registry(canvas):
+    registry = _registries.get(canvas)
+    if registry is None:
+        registry = _registries[canvas] = _Registry()
+    return registry
+
+
+def linear_gradient(canvas, name, stops, start=(0, 0), end=(0, 1)):
+    """Returns the gradient with an id, adding it to the defs if it isn't there yet.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+        name (str): Id of the gradient
+        stops (tuple): (offset, color) pairs, used when the gradient is added
+        start (tuple): Start of the gradient vector
+        end (tuple): End of the gradient vector
+
+    Returns:
+        The gradient element, for get_paint_server()
+    """
+    registry = _registry(canvas)
+    gradient = registry.gradients.get(name)
+    if gradient is None:
+        gradient = canvas.linearGradient(start, end, id=name)
+        for offset, color in stops:
+            gradient.add_stop_color(offset, color)
+        canvas.defs.add(gradient)
+        registry.gradients[name] = gradient
+    return gradient
+
+
+def style(canvas, name, declarations):
+    """Adds a class rule to the drawing's style sheet if it isn't there yet.
+
+    All rules share one style element in the defs.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+        name (str): The class name
+        declarations (str): The CSS declarations, like "font-family:Helvetica;"
+
+    Returns:
+        str: The class name
+    """
+    registry = _registry(canvas)
+    if name not in registry.style_names:
+        if registry.style_sheet is None:
+            registry.style_sheet = canvas.defs.add(canvas.style())
+        registry.style_sheet.append(f".{name}{{{declarations}}}")
+        registry.style_names.add(name)
+    return name
+
+
+def marker(canvas, name, draw, insert, size, orient="auto"):
+    """Returns the marker with an id, adding it to the defs if it isn't there yet.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+        name (str): Id of the marker
+        draw (callable): Called with the new marker to add its shapes
+        insert (tuple): The point of the marker placed on the line end
+        size (tuple): Width and height of the marker
+        orient: "auto" to follow the line, or an angle
+
+    Returns:
+        The marker element
+    """
+    registry = _registry(canvas)
+    element = registry.markers.get(name)
+    if element is None:
+        element = canvas.marker(insert=insert, size=size, orient=orient, id=name)
+        draw(element)
+        canvas.defs.add(element)
+        registry.markers[name] = element
+    return element
+
+
+def symbol(canvas, name, draw, view_box=None):
+    """Returns the symbol with an id, adding it to the defs if it isn't there yet.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+        name (str): Id of the symbol
+        draw (callable): Called with the new symbol to add its content
+        view_box (str): The area of the symbol scaled to each use
+
+    Returns:
+        The symbol element
+    """
+    registry = _registry(canvas)
+    element = registry.symbols.get(name)
+    if element is None:
+        element = canvas.symbol(id=name, viewBox=view_box)
+        draw(element)
+        canvas.defs.add(element)
+        registry.symbols[name] = element
+    return element
+
+
+def embed_images(canvas, embed=True):
+    """Makes image symbols added from now on carry the image itself as a data URI.
+
+    The SVG then works without the resources folder next to it.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+        embed (bool): False to link to the image files again
+    """
+    _registry(canvas).embed_images = embed
+
+
+def data_uri(path):
+    """Reads an image file into a data URI.
+
+    Args:
+        path (str): Path of the image, either slash works
+
+    Returns:
+        str: The data URI, or None if the file can't be read
+    """
+    local_path = os.path.normpath(path.replace("\\", "/"))
+    try:
+        with open(local_path, "rb") as image:
+            content = base64.b64encode(image.read()).decode("ascii")
+    except OSError as e:
+        print(f"Could not embed {path}: {e}")
+        return None
+    mime = mimetypes.guess_type(local_path)[0] or "image/png"
+    return f"data:{mime};base64,{content}"
+
+
+def image_symbol(canvas, href):
+    """Returns the symbol showing an image, adding it to the defs if it isn't there yet.
+
+    The image fills a 1 by 1 view box, so each use sets the size it is shown at.
+
+    Args:
+        canvas (svgwrite.Drawing or StreamingDrawing): The drawing
+        href (str): Path of the image
+
+    Returns:
+        The symbol element, its id is "icon_" and the file name
+    """
+    stem = os.path.splitext(re.split(r"[\\/]", href)[-1])[0]
+    name = "icon_" + re.sub(r"[^A-Za-z0-9_-]", "_", stem)
+
+    def draw(element):
+        source = None
+        if _registry(canvas).embed_images:
+            source = data_uri(href)
+        element.add(canvas.image(source or href, insert=(0, 0), size=(1, 1)))
+
+    return symbol(canvas, name, draw, view_box="0 0 1 1")
@@ -0,0 +1,694 @@
+"""Moves cards on a VSM to the positions in a save file.
+
+One pass over the document maps every id to its element, every element to
+its parent and every card to the lines joining it to other cards. The moves
+are then applied in a second pass over the saved positions, so patching takes
+time in proportion to the size of the VSM plus the number of moves, however
+many cards are moved.
+
+A moved card takes everything in its group along with it. The lines into and
+out of it are drawn again between the cards where they are now, the same way
+the VSM draws them, so they stay attached to both ends.
+
+patch_tree() patches a VSM read into memory with ElementTree. patch_file()
+patches a VSM file in one pass while copying it to another one, writing each
+element directly in the svg element out once it is patched. Cards are moved
+as they are read, and a line is drawn again as soon as both its cards have
+been read. Only the position and size of each card and the index are kept
+for the whole file, so memory grows with the number of cards and lines, not
+with the size of the file.
+"""
+import json
+import os
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
+from collections import defaultdict
+
+from VSMWizard import edge_route
+from VSMWizard import element_ids
+from VSMWizard.element_ids import SVG_NAMESPACE, parse_number
+
+# Files larger than this are patched as they are read instead of in memory
+STREAM_BYTES = 64 * 1024 * 1024
+# Elements of the svg element patch_file() writes out together
+WRITE_BATCH = 256
+
+SVG_URI = SVG_NAMESPACE[1:-1]
+XML_URI = "http://www.w3.org/XML/1998/namespace"
+
+
+class DocumentMap:
+    """The elements of a VSM by id, their parents and the lines of each card.
+
+    Args:
+        root (xml.etree.ElementTree.Element): The svg element
+    """
+
+    __slots__ = ("elements", "parents", "segments", "ends", "card_lines")
+
+    def __init__(self, root):
+        # Id -> element
+        self.elements = {}
+        # Element -> the element it is in
+        self.parents = {}
+        # Line id -> the copies of its first and of its second segment
+        self.segments = defaultdict(lambda: ([], []))
+        # Line id -> the ids of the cards it starts and ends at
+        self.ends = {}
+        # Card id -> the ids of the lines into and out of it
+        self.card_lines = defaultdict(list)
+
+        for element in root.iter():
+            for child in element:
+                self.parents[child] = element
+            element_id = element.get("id")
+            if element_id is None:
+                continue
+            self.elements[element_id] = element
+            if element.tag != SVG_NAMESPACE + "line" or element.get("data-source") is None:
+                continue
+            add_segment(self, element_id, element, element.get("data-source"), element.get("data-target"))
+
+
+def add_segment(document, element_id, segment, source, target):
+    """Adds a segment of a line to a map of the lines, a line drawn twice has two copies of it.
+
+    Args:
+        document: A DocumentMap, or anything with its segments, ends and card_lines
+        element_id (str): Id of the segment
+        segment: The segment, or whatever stands for it
+        source (str): Id of the card the line starts at
+        target (str): Id of the card the line points to
+    """
+    line_id, _, part = element_id.rpartition("-")
+    if part == "SegmentA":
+        first = document.segments[line_id][0]
+        if not first:
+            document.card_lines[source].append(line_id)
+            if target != source:
+                document.card_lines[target].append(line_id)
+        first.append(segment)
+        document.ends[line_id] = (source, target)
+    elif part == "SegmentB":
+        document.segments[line_id][1].append(segment)
+
+
+def move_group(group, element, x, y):
+    """Moves a card and everything in its group so the card is at x and y.
+
+    Args:
+        group (xml.etree.ElementTree.Element): The group the card is in
+        element (xml.etree.ElementTree.Element): The card
+        x (int): Where the card goes
+        y (int): Where the card goes
+    """
+    dx = x - int(float(element.get("x", "0")))
+    dy = y - int(float(element.get("y", "0")))
+    for child in group:
+        # Update x and y attributes for elements that have them
+        if "x" in child.attrib and "y" in child.attrib:
+            child.set("x", str(int(float(child.get("x"))) + dx))
+            child.set("y", str(int(float(child.get("y"))) + dy))
+        elif "cx" in child.attrib and "cy" in child.attrib:  # for circles
+            child.set("cx", str(int(float(child.get("cx"))) + dx))
+            child.set("cy", str(int(float(child.get("cy"))) + dy))
+
+        # Links hold the text that is on the card
+        if child.tag == SVG_NAMESPACE + "a":
+            for sub_child in child:
+                if "x" in sub_child.attrib and "y" in sub_child.attrib:
+                    sub_child.set("x", str(int(float(sub_child.get("x"))) + dx))
+                    sub_child.set("y", str(int(float(sub_child.get("y"))) + dy))
+
+
+def move_element(element, parent, x, y):
+    """Moves an element to x and y, along with its group if it is in one.
+
+    Returns:
+        bool: True if the group was moved
+    """
+    if parent is not None and parent.tag == SVG_NAMESPACE + "g":
+        move_group(parent, element, x, y)
+        return True
+    # If no <g>, move just the element
+    element.set("x", str(x))
+    element.set("y", str(y))
+    return False
+
+
+def line_points(source, target):
+    """Returns where the two segments of a line between two cards go.
+
+    Args:
+        source: The card the line starts at, anything with the card's
+            attributes under get(), like an element
+        target: The card the line points to
+
+    Returns:
+        tuple: The start and end of the first segment and of the second one
+    """
+    start, end, end_arrow = edge_route.route(
+        (parse_number(source.get("x", "0")), parse_number(source.get("y", "0"))),
+        (parse_number(target.get("x", "0")), parse_number(target.get("y", "0"))),
+        parse_number(source.get("width", "0")),
+        parse_number(source.get("height", "0")),
+    )
+    return (start, end), (end, end_arrow)
+
+
+def set_segment(segment, points):
+    """Sets the start and end of a line segment."""
+    (x1, y1), (x2, y2) = points
+    segment.set("x1", str(x1))
+    segment.set("y1", str(y1))
+    segment.set("x2", str(x2))
+    segment.set("y2", str(y2))
+
+
+def reroute_line(document, line_id):
+    """Draws a line again between the cards at its ends, where they are now.
+
+    Args:
+        document (DocumentMap): The map of the VSM
+        line_id (str): Id of the line, without the segment
+    """
+    source_id, target_id = document.ends[line_id]
+    source = document.elements.get(source_id)
+    target = document.elements.get(target_id)
+    first, second = document.segments[line_id]
+    if source is None or target is None or not second:
+        return
+
+    first_points, second_points = line_points(source, target)
+    for segment in first:
+        set_segment(segment, first_points)
+    for segment in second:
+        set_segment(segment, second_points)
+
+
+def lines_of(document, moved):
+    """Returns the ids of the lines into and out of the moved cards, each once."""
+    lines = {}
+    for card in moved:
+        for line_id in document.card_lines.get(card, ()):
+            lines[line_id] = True
+    return list(lines)
+
+
+def move_cards(root, positions, index=None):
+    """Moves the cards of a VSM to saved positions and redraws their lines.
+
+    Args:
+        root (xml.etree.ElementTree.Element): The svg element
+        positions (list): The saved {"id", "x", "y"} entries
+        index (dict): The VSM's index, its cards are moved too
+
+    Returns:
+        set: The ids of the cards that were moved
+    """
+    document = DocumentMap(root)
+
+    moved = set()
+    for item in positions:
+        element_id = item["id"]
+        new_x = int(item["x"])
+        new_y = int(item["y"])
+
+        element = document.elements.get(element_id)
+        if element is None:
+            print(f"Element with id {element_id} not found.")
+            continue
+
+        if move_element(element, document.parents.get(element), new_x, new_y):
+            print(f"Moving group for {element_id}")
+        else:
+            print(f"Updated {element_id}: x={new_x}, y={new_y}")
+        moved.add(element_id)
+
+        # The id stays, only the position in the index changes
+        if index is not None and element_id in index["cards"]:
+            index["cards"][element_id]["x"] = new_x
+            index["cards"][element_id]["y"] = new_y
+
+    for line_id in lines_of(document, moved):
+        reroute_line(document, line_id)
+    return moved
+
+
+def patch_tree(tree, positions):
+    """Moves the cards of a VSM read with ElementTree to saved positions.
+
+    VSMs and saves from before card ids were stable are brought up to date
+    first, and the VSM's index is updated.
+
+    Args:
+        tree (xml.etree.ElementTree.ElementTree): The VSM
+        positions (list): The saved {"id", "x", "y"} entries, updated in place
+
+    Returns:
+        dict: The new id of each card that was renamed, by its old id
+    """
+    root = tree.getroot()
+    renamed = element_ids.migrate_svg(root)
+    index = element_ids.read_index(root) or element_ids.new_index()
+    element_ids.migrate_positions(positions, renamed, index["cards"])
+
+    # Move the cards, their lines follow them
+    move_cards(root, positions, index)
+    element_ids.write_index(root, index)
+    return renamed
+
+
+def should_stream(path):
+    """Returns True if a VSM file is large enough to be patched with patch_file()."""
+    try:
+        return os.path.getsize(path) > STREAM_BYTES
+    except OSError:
+        return False
+
+
+def _children(source, namespaces):
+    """Reads a VSM, yielding each element directly in the svg element once it is complete.
+
+    Args:
+        source (str): Path of the VSM
+        namespaces (list): Filled in with the (prefix, uri) pairs declared on the svg element
+
+    Yields:
+        tuple: The svg element and the element in it, then the svg element
+        and None once the file is read. Each element is taken out of the svg
+        element once it is yielded; its tail is read by the time the next one is.
+    """
+    depth = 0
+    root = None
+    for event, item in ET.iterparse(source, events=("start-ns", "start", "end")):
+        if event == "start-ns":
+            if root is None:
+                namespaces.append(item)
+            continue
+        if event == "start":
+            if root is None:
+                root = item
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            root.remove(item)
+            yield root, item
+    yield root, None
+
+
+def _group_parents(element):
+    """Returns the group each element directly in a group is in, for part of a VSM."""
+    return {child: group for group in element.iter(SVG_NAMESPACE + "g") for child in group}
+
+
+class _StreamPatch:
+    """Patches a VSM for patch_file(), one element of the svg element at a time.
+
+    Kept for the whole file are the position and size of each card, the
+    ids of each card and line for the index, and the saved positions.
+
+    In a VSM this tool draws, a line comes after the cards it joins and the
+    index comes last. A line that comes before a card it joins and the index
+    are held until the file is read, along with everything after them, so
+    the file is still written in order.
+
+    Args:
+        positions (list): The saved {"id", "x", "y"} entries
+    """
+
+    def __init__(self, positions):
+        # Id -> the saved (order, x, y) of the element, in the order of the save file
+        self.saved = defaultdict(list)
+        for order, item in enumerate(positions):
+            self.saved[item["id"]].append((order, int(item["x"]), int(item["y"])))
+        self.renamed = {}
+        self.moved = set()
+        # Id -> x, y, width and height of the cards and saved elements read so far
+        self.geometry = {}
+        # What build_index() would make the index of: (id, pipeline, x, y)
+        # of each card before it moves and (id, source, target) of each line
+        self.cards = []
+        self.lines = []
+        self.index_script = None
+        self.index = None
+        # Elements of the svg element held until the file is read
+        self.held = []
+        self._counts = {}
+        # The cards of the last line drawn again and where its segments went
+        self._last_route = (None, None, None)
+
+    def read(self, element):
+        """Patches the cards in an element of the svg element, and its lines if it can.
+
+        Returns:
+            bool: True if the element is ready to be written, False if it is held
+        """
+        cards, lines, index_script = self._scan(element)
+        if cards:
+            self._move(element, cards)
+        if index_script is not None and self.index_script is None:
+            self.index_script = index_script
+            self.held.append(element)
+            return False
+        if self.held or not self._ready(lines):
+            self.held.append(element)
+            return False
+        self._route(element, lines)
+        return True
+
+    def finish(self):
+        """Patches the held elements and the index once the file is read.
+
+        Returns:
+            list: The held elements, then the index if the VSM had none
+        """
+        for element in self.held:
+            self._route(element)
+
+        cards, lines = self.cards, self.lines
+        self.cards = self.lines = None
+        index = None
+        if self.index_script is not None and not self.renamed:
+            del cards, lines
+            # Read the same way read_index() reads it
+            text = self.index_script.text
+            try:
+                index = json.loads(text) if text else None
+            except json.JSONDecodeError as e:
+                print(f"Could not read the index of the VSM: {e}")
+        else:
+            index = element_ids.new_index()
+            for card_id, pipeline, x, y in cards:
+                element_ids.add_card(index, card_id, pipeline, parse_number(x), parse_number(y))
+            for line_id, source_id, target_id in lines:
+                element_ids.add_edge(index, line_id, source_id, target_id)
+        self.index = index or element_ids.new_index()
+
+        # The id stays, only the position in the index changes
+        for element_id in self.moved:
+            if element_id in self.index["cards"]:
+                _, new_x, new_y = self.saved[element_id][-1]
+                self.index["cards"][element_id]["x"] = new_x
+                self.index["cards"][element_id]["y"] = new_y
+
+        if self.index_script is None:
+            self.index_script = ET.Element(SVG_NAMESPACE + "script", {"id": element_ids.INDEX_ID, "type": "application/json"})
+            self.held.append(self.index_script)
+        self.index_script.text = element_ids.index_json(self.index)
+        return self.held
+
+    def _scan(self, element):
+        """Returns the cards, the lines and the index script in an element of the svg element.
+
+        The cards in it are given stable ids first if one of them doesn't
+        have one. Rects with an id and elements the save file names count as
+        cards, lines are the lines with a data-source attribute and anything
+        with an old line id.
+        """
+        cards = []
+        lines = []
+        index_script = None
+        migrated = False
+        for item in element.iter():
+            tag = item.tag
+            item_id = item.get("id")
+            if tag == SVG_NAMESPACE + "rect":
+                if not migrated and item_id is not None and element_ids.LEGACY_CARD_ID.match(item_id):
+                    # Cards before this one already have stable ids, migrating doesn't change them
+                    migrated = True
+                    self._migrate(element)
+                    item_id = item.get("id")
+                if item_id is not None or item.get("data-pipeline") is not None:
+                    cards.append(item)
+            elif item_id is None:
+                continue
+            elif item_id in self.saved:
+                cards.append(item)
+            elif tag == SVG_NAMESPACE + "line" and item.get("data-source") is not None:
+                lines.append(item)
+            elif tag == SVG_NAMESPACE + "script" and item_id == element_ids.INDEX_ID:
+                index_script = item
+            elif element_ids.LEGACY_EDGE_ID.match(item_id):
+                lines.append(item)
+        return cards, lines, index_script
+
+    def _migrate(self, element):
+        renamed = element_ids.migrate_cards(element, counts=self._counts)
+        for old_id, new_id in renamed.items():
+            # Saves from before the ids were stable name the card by its old id
+            if old_id in self.saved:
+                self.saved[new_id] = sorted(self.saved[new_id] + self.saved.pop(old_id))
+        self.renamed.update(renamed)
+
+    def _move(self, element, cards):
+        """Moves the saved cards in an element of the svg element and keeps where every card is."""
+        moves = []
+        for card in cards:
+            card_id = card.get("id")
+            pipeline = card.get("data-pipeline")
+            if pipeline is not None and self.cards is not None and card.tag == SVG_NAMESPACE + "rect":
+                self.cards.append((card_id, pipeline, card.get("x", "0"), card.get("y", "0")))
+            for order, new_x, new_y in self.saved.get(card_id, ()):
+                moves.append((order, card, new_x, new_y))
+
+        # In the order of the save file, like move_cards()
+        if moves:
+            parents = _group_parents(element)
+            for _, card, new_x, new_y in sorted(moves, key=lambda move: move[0]):
+                if move_element(card, parents.get(card), new_x, new_y):
+                    print(f"Moving group for {card.get('id')}")
+                else:
+                    print(f"Updated {card.get('id')}: x={new_x}, y={new_y}")
+                self.moved.add(card.get("id"))
+
+        for card in cards:
+            card_id = card.get("id")
+            if card_id is not None:
+                get = card.get
+                self.geometry[card_id] = {
+                    "x": get("x", "0"),
+                    "y": get("y", "0"),
+                    "width": get("width", "0"),
+                    "height": get("height", "0"),
+                }
+
+    def _ready(self, lines):
+        """Returns True if the cards at the ends of the lines are known."""
+        geometry = self.geometry
+        for line in lines:
+            source_id = line.get("data-source")
+            if source_id is None:
+                # Renamed after cards that aren't read yet
+                ends = element_ids.LEGACY_EDGE_ID.match(line.get("id")).groups()[:2]
+                if any(end not in geometry and end not in self.renamed for end in ends):
+                    return False
+                continue
+            target_id = line.get("data-target")
+            if source_id in geometry and target_id in geometry:
+                continue
+            # Only a line that is drawn again needs both its cards
+            if any(end in self.moved or end in self.saved for end in (source_id, target_id)):
+                return False
+        return True
+
+    def _route(self, element, lines=None):
+        """Renames the lines in an element after their cards and draws the ones into and out of moved cards again."""
+        if self.renamed:
+            element_ids.migrate_edges(element, self.renamed)
+            lines = None
+        if lines is None:
+            lines = element.iter(SVG_NAMESPACE + "line")
+        for line in lines:
+            source_id = line.get("data-source")
+            if source_id is None or line.tag != SVG_NAMESPACE + "line":
+                continue
+            target_id = line.get("data-target")
+            line_id = line.get("id", "")
+            if line_id.endswith("-SegmentA"):
+                first = True
+                if self.lines is not None:
+                    self.lines.append((line_id[: -len("-SegmentA")], source_id, target_id))
+            elif line_id.endswith("-SegmentB"):
+                first = False
+            else:
+                continue
+            if source_id not in self.moved and target_id not in self.moved:
+                continue
+            source = self.geometry.get(source_id)
+            target = self.geometry.get(target_id)
+            if source is None or target is None:
+                continue
+            # The two segments of a line are next to each other
+            last_source, last_target, points = self._last_route
+            if source is not last_source or target is not last_target:
+                points = line_points(source, target)
+                self._last_route = (source, target, points)
+            set_segment(line, points[0] if first else points[1])
+
+
+class _Names:
+    """The names of a VSM's elements and attributes as patch_file() writes them.
+
+    The namespaces declared on the svg element keep their prefixes, and the
+    SVG one is the default when the svg element is in it, so elements can
+    be written with ElementTree.tostring() without declarations of their own.
+
+    Args:
+        declared (list): The (prefix, uri) pairs declared on the svg element
+        root_tag (str): Tag of the svg element
+    """
+
+    def __init__(self, declared, root_tag):
+        self.declarations = {}
+        self.prefixes = {XML_URI: "xml"}
+        self.attribute_prefixes = {XML_URI: "xml"}
+        if root_tag.startswith(SVG_NAMESPACE):
+            self.declarations[""] = SVG_URI
+            self.prefixes[SVG_URI] = ""
+        for prefix, uri in declared:
+            if not uri or uri == XML_URI:
+                continue
+            # Attributes only have a namespace with a prefix
+            if uri in self.prefixes and not prefix:
+                continue
+            number = 0
+            while prefix in self.declarations:
+                prefix = f"ns{number}"
+                number += 1
+            self.declarations[prefix] = uri
+            self.prefixes.setdefault(uri, prefix)
+            if prefix:
+                self.attribute_prefixes.setdefault(uri, prefix)
+        self._tags = {}
+        self._attributes = {}
+
+    def _qualified(self, name, prefixes, names):
+        """Returns the name a tag or attribute is written with, False if its namespace isn't declared."""
+        qualified = names.get(name)
+        if qualified is None:
+            if name[:1] == "{":
+                uri, local = name[1:].split("}", 1)
+                prefix = prefixes.get(uri)
+                qualified = False if prefix is None else f"{prefix}:{local}" if prefix else local
+            else:
+                qualified = name
+            names[name] = qualified
+        return qualified
+
+    def qualify(self, element):
+        """Gives an element and everything in it the names they are written with.
+
+        Returns:
+            bool: False if a name is in a namespace the svg element doesn't
+            declare, that name is left for ElementTree to declare
+        """
+        declared = True
+        tags = self._tags
+        for item in element.iter():
+            tag = tags.get(item.tag) or self._qualified(item.tag, self.prefixes, tags)
+            if tag:
+                item.tag = tag
+            else:
+                declared = False
+            # Only names in a namespace have a "}"
+            if "}" in "".join(item.attrib):
+                attributes = {}
+                for key, value in item.attrib.items():
+                    name = self._qualified(key, self.attribute_prefixes, self._attributes)
+                    if name:
+                        key = name
+                    else:
+                        declared = False
+                    attributes[key] = value
+                item.attrib = attributes
+        return declared
+
+    def start_tag(self, root):
+        """Returns the start tag of the svg element, with the namespaces it declares."""
+        root = root.makeelement(root.tag, root.attrib)
+        self.qualify(root)
+        start = "<" + root.tag
+        for prefix, uri in self.declarations.items():
+            start += f" xmlns:{prefix}={quoteattr(uri)}" if prefix else f" xmlns={quoteattr(uri)}"
+        for key, value in root.items():
+            start += f" {key}={quoteattr(value)}"
+        return start + ">"
+
+    def end_tag(self, root):
+        """Returns the end tag of the svg element."""
+        return f"</{self._qualified(root.tag, self.prefixes, self._tags) or root.tag}>"
+
+    def write(self, write, elements):
+        """Writes elements of the svg element, with their tails, then empties them."""
+        batch = []
+        for element in elements:
+            if self.qualify(element):
+                batch.append(element)
+                continue
+            # Written on its own, with the namespaces it uses declared on it
+            self._write_batch(write, batch)
+            batch = []
+            write(ET.tostring(element, encoding="unicode"))
+            element.clear()
+        self._write_batch(write, batch)
+
+    def _write_batch(self, write, elements):
+        if not elements:
+            return
+        batch = ET.Element("batch")
+        batch.extend(elements)
+        # "<batch>" and "</batch>" are the only parts of it that aren't the elements
+        write(ET.tostring(batch, encoding="unicode")[len("<batch>") : -len("</batch>")])
+        for element in elements:
+            element.clear()
+
+
+def patch_file(source, destination, positions):
+    """Moves the cards of a VSM file to saved positions, writing the result to another file.
+
+    Like patch_tree(), but the file is read once, one element of the svg
+    element at a time, and the elements are written out in batches as soon
+    as they are patched.
+
+    Args:
+        source (str): Path of the VSM
+        destination (str): Path the patched VSM is written to, not the source
+        positions (list): The saved {"id", "x", "y"} entries, updated in place
+
+    Returns:
+        dict: The new id of each card that was renamed, by its old id
+    """
+    patch = _StreamPatch(positions)
+    namespaces = []
+    names = None
+
+    # The same file ElementTree.write() opens
+    with open(destination, "w", encoding="us-ascii", errors="xmlcharrefreplace") as output:
+        write = output.write
+        pending = []
+        for root, element in _children(source, namespaces):
+            # The text of the svg element is known once its first child is read
+            if names is None:
+                names = _Names(namespaces, root.tag)
+                write(names.start_tag(root))
+                if root.text:
+                    write(escape(root.text))
+            if element is None:
+                break
+            if patch.read(element):
+                pending.append(element)
+            # The tail of the last one is only known once the next one is read
+            if len(pending) > WRITE_BATCH:
+                names.write(write, pending[:-1])
+                del pending[:-1]
+
+        names.write(write, pending + patch.finish())
+        write(names.end_tag(root))
+
+    element_ids.migrate_positions(positions, patch.renamed, patch.index["cards"])
+    for item in positions:
+        if item["id"] not in patch.moved:
+            print(f"Element with id {item['id']} not found.")
+    return patch.renamed
@@ -0,0 +1,334 @@
+"""SVG drawing that is written out as it is drawn.
+
+svgwrite keeps every element of the VSM in memory, validates each attribute
+as it is set and serializes the whole tree once at the end. StreamingDrawing
+offers the parts of the svgwrite API the VSM uses, but its elements are plain
+attribute dictionaries and everything added to it is written out on flush():
+the body goes to a temporary file, in memory until it gets large, and is
+dropped from the drawing.
+
+The width and height of the drawing depend on everything drawn, so the
+opening tag is only written by save(), once the body is complete.
+
+The output matches what svgwrite writes for the same calls: attributes in
+sorted order, empty ones left out and numbers written with str().
+"""
+import io
+import shutil
+import tempfile
+
+# Body bytes kept in memory before the temporary file moves to disk
+SPOOL_BYTES = 8 * 1024 * 1024
+
+XML_HEADER = '<?xml version="1.0" encoding="utf-8" ?>\n'
+
+# The same escaping ElementTree does, which is what svgwrite writes with
+TEXT_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+ATTRIBUTE_ESCAPES = str.maketrans(
+    {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "\r": "&#13;",
+        "\n": "&#10;",
+        "\t": "&#09;",
+    }
+)
+
+
+def attribute_name(keyword):
+    """Turns a keyword argument into an attribute name, class_ -> class, stroke_width -> stroke-width."""
+    return keyword.rstrip("_").replace("_", "-")
+
+
+def write_element(element, parts):
+    """Appends the markup of an element and its children to a list of strings.
+
+    Elements made by svgwrite can be mixed in, they are written with their
+    own tostring().
+
+    Args:
+        element (Element): The element to write
+        parts (list): The strings written so far
+    """
+    if not isinstance(element, Element):
+        parts.append(element.tostring())
+        return
+
+    parts.append("<" + element.elementname)
+    for name, value in sorted(element.attribs.items()):
+        if value is None:
+            continue
+        value = str(value)
+        if value:
+            parts.append(f' {name}="{value.translate(ATTRIBUTE_ESCAPES)}"')
+
+    content = element.content if isinstance(element, Script) else ""
+    if element.text is None and not element.elements and not content:
+        parts.append(" />")
+        return
+    parts.append(">")
+    if element.text is not None:
+        parts.append(str(element.text).translate(TEXT_ESCAPES))
+    if content:
+        parts.append(f"<![CDATA[{content}]]>")
+    for child in element.elements:
+        write_element(child, parts)
+    parts.append(f"</{element.elementname}>")
+
+
+class ElementFactory:
+    """Makes the elements the VSM is drawn with, named like svgwrite's factory methods."""
+
+    def g(self, **extra):
+        return Element("g", **extra)
+
+    def a(self, href, target="_blank", **extra):
+        link = Element("a", target=target, **extra)
+        link.attribs["xlink:href"] = href
+        return link
+
+    def image(self, href, insert=None, size=None, **extra):
+        image = Element("image", **extra)
+        image.attribs["xlink:href"] = href
+        if insert is not None:
+            image.attribs["x"], image.attribs["y"] = insert
+        if size is not None:
+            image.attribs["width"], image.attribs["height"] = size
+        return image
+
+    def text(self, text, insert=None, **extra):
+        element = Element("text", **extra)
+        element.text = text
+        if insert is not None:
+            element.attribs["x"], element.attribs["y"] = insert
+        return element
+
+    def rect(self, insert=None, size=None, **extra):
+        rect = Element("rect", **extra)
+        if insert is not None:
+            rect.attribs["x"], rect.attribs["y"] = insert
+        if size is not None:
+            rect.attribs["width"], rect.attribs["height"] = size
+        return rect
+
+    def line(self, start=(0, 0), end=(0, 0), **extra):
+        line = Element("line", **extra)
+        line.attribs["x1"], line.attribs["y1"] = start
+        line.attribs["x2"], line.attribs["y2"] = end
+        return line
+
+    def circle(self, center=(0, 0), r=1, **extra):
+        circle = Element("circle", r=r, **extra)
+        circle.attribs["cx"], circle.attribs["cy"] = center
+        return circle
+
+    def animate(self, attributeName=None, values=None, **extra):
+        animate = Element("animate", **extra)
+        if values is not None:
+            animate.attribs["values"] = values if isinstance(values, str) else ";".join(map(str, values))
+        if attributeName is not None:
+            animate.attribs["attributeName"] = attributeName
+        return animate
+
+    def script(self, href=None, content="", **extra):
+        script = Script("script", content, **extra)
+        if href is not None:
+            script.attribs["xlink:href"] = href
+        return script
+
+    def style(self, content="", **extra):
+        return Script("style", content, type="text/css", **extra)
+
+    def path(self, d=None, **extra):
+        return Element("path", d=d, **extra)
+
+    def symbol(self, **extra):
+        return Element("symbol", **extra)
+
+    def use(self, href, insert=None, size=None, **extra):
+        use = Element("use", **extra)
+        use.attribs["xlink:href"] = href
+        if insert is not None:
+            use.attribs["x"], use.attribs["y"] = insert
+        if size is not None:
+            use.attribs["width"], use.attribs["height"] = size
+        return use
+
+    def marker(self, insert=None, size=None, orient=None, **extra):
+        marker = Element("marker", orient=orient, **extra)
+        if insert is not None:
+            marker.attribs["refX"], marker.attribs["refY"] = insert
+        if size is not None:
+            marker.attribs["markerWidth"], marker.attribs["markerHeight"] = size
+        return marker
+
+
+class Element:
+    """An SVG element: a name, its attributes, its children and any text."""
+
+    __slots__ = ("elementname", "attribs", "elements", "text")
+
+    def __init__(self, elementname, **extra):
+        self.elementname = elementname
+        self.attribs = {attribute_name(key): value for key, value in extra.items()}
+        self.elements = []
+        self.text = None
+
+    def __getitem__(self, key):
+        return self.attribs[key]
+
+    def __setitem__(self, key, value):
+        self.attribs[key] = value
+
+    def add(self, element):
+        self.elements.append(element)
+        return element
+
+    def set_desc(self, title=None, desc=None):
+        """Puts a title and/or description first among the children, like svgwrite."""
+        if desc is not None:
+            self.elements.insert(0, Element("desc"))
+            self.elements[0].text = desc
+        if title is not None:
+            self.elements.insert(0, Element("title"))
+            self.elements[0].text = title
+
+    def tostring(self):
+        parts = []
+        write_element(self, parts)
+        return "".join(parts)
+
+
+class Script(Element):
+    """A script or style element, its content written as CDATA."""
+
+    __slots__ = ("content",)
+
+    def __init__(self, elementname, content="", **extra):
+        super().__init__(elementname, **extra)
+        self.content = content
+
+    def append(self, content):
+        self.content += content
+
+
+class LinearGradient(Element):
+    """A linear gradient, given an id from its drawing the first time it is referenced."""
+
+    __slots__ = ("drawing",)
+
+    def __init__(self, drawing, start=None, end=None, **extra):
+        super().__init__("linearGradient", **extra)
+        self.drawing = drawing
+        if start is not None:
+            self.attribs["x1"], self.attribs["y1"] = start
+        if end is not None:
+            self.attribs["x2"], self.attribs["y2"] = end
+
+    def get_id(self):
+        if "id" not in self.attribs:
+            self.attribs["id"] = self.drawing.next_id()
+        return self.attribs["id"]
+
+    def get_paint_server(self, default="none"):
+        return f"url(#{self.get_id()}) {default}"
+
+    def add_stop_color(self, offset=None, color=None, opacity=None):
+        self.add(Element("stop", offset=offset, stop_color=color, stop_opacity=opacity))
+        return self
+
+
+# For code that only has a container at hand, the drawing makes the same elements
+factory = ElementFactory()
+
+
+class StreamingDrawing(ElementFactory):
+    """Drop-in for svgwrite.Drawing that writes elements out as they are finished.
+
+    Elements added to the drawing stay in `elements` until flush(), so they
+    can still be changed until then. After that they are written out and
+    dropped.
+
+    Args:
+        filename (str): The file save() writes to
+        size (tuple): Width and height of the drawing
+        profile (str): The SVG base profile
+        extra: Any other attributes of the svg element, like onload
+    """
+
+    def __init__(self, filename="noname.svg", size=("100%", "100%"), profile="full", **extra):
+        self.filename = filename
+        self.attribs = {attribute_name(key): value for key, value in extra.items()}
+        self.attribs["width"], self.attribs["height"] = size
+        self.attribs["baseProfile"] = profile
+        self.attribs["version"] = "1.1"
+        self.attribs["xmlns"] = "http://www.w3.org/2000/svg"
+        self.attribs["xmlns:xlink"] = "http://www.w3.org/1999/xlink"
+        self.attribs["xmlns:ev"] = "http://www.w3.org/2001/xml-events"
+        self.defs = Element("defs")
+        self.elements = []
+        self._next_id = 1
+        self._body = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES, mode="w+", encoding="utf-8")
+
+    def __getitem__(self, key):
+        return self.attribs[key]
+
+    def __setitem__(self, key, value):
+        self.attribs[key] = value
+
+    def next_id(self):
+        """Returns the next free id, id1, id2, ..."""
+        nextId = f"id{self._next_id}"
+        self._next_id += 1
+        return nextId
+
+    def linearGradient(self, start=None, end=None, **extra):
+        return LinearGradient(self, start, end, **extra)
+
+    def add(self, element):
+        self.elements.append(element)
+        return element
+
+    def flush(self):
+        """Writes out the elements added since the last flush and lets go of them."""
+        parts = []
+        for element in self.elements:
+            write_element(element, parts)
+        self._body.write("".join(parts))
+        self.elements.clear()
+
+    def write(self, fileobj):
+        """Writes the whole document, flushing anything still pending first.
+
+        Args:
+            fileobj: A text file-like object
+        """
+        self.flush()
+        parts = [XML_HEADER, "<svg"]
+        for name, value in sorted(self.attribs.items()):
+            if value is not None and str(value):
+                parts.append(f' {name}="{str(value).translate(ATTRIBUTE_ESCAPES)}"')
+        parts.append(">")
+        write_element(self.defs, parts)
+        fileobj.write("".join(parts))
+
+        self._body.seek(0)
+        shutil.copyfileobj(self._body, fileobj)
+        self._body.seek(0, io.SEEK_END)
+        fileobj.write("</svg>")
+
+    def tostring(self):
+        """Returns the whole document, without the XML declaration, like svgwrite."""
+        buffer = io.StringIO()
+        self.write(buffer)
+        return buffer.getvalue()[len(XML_HEADER) :]
+
+    def save(self):
+        with open(self.filename, "w", encoding="utf-8") as fileobj:
+            self.write(fileobj)
+
+    def close(self):
+        """Deletes the temporary file holding the body."""
+        self._body.close()
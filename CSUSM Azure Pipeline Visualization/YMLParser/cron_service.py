@@ -0,0 +1,126 @@
+"""Cached human readable descriptions of cron schedules.
+
+The same few schedules ("0 3 * * *" and friends) repeat across most pipelines,
+so descriptions are kept in a bounded LRU cache keyed on the expression and
+the options used, and one Options object is shared per option combination.
+"""
+import threading
+from functools import lru_cache
+
+from cron_descriptor import (
+    Options,
+    CasingTypeEnum,
+    DescriptionTypeEnum,
+    ExpressionDescriptor,
+)
+
+# Distinct expression/option combinations kept before the least recently used go
+CRON_CACHE_SIZE = 512
+
+NO_EXPRESSION_MESSAGE = "No cron expression provided"
+
+
+@lru_cache(maxsize=None)
+def shared_options(casing_type=CasingTypeEnum.Sentence, locale_code=None, use_24hour_time_format=None):
+    """Returns the Options object for a combination of settings.
+
+    The object is shared by every description using these settings, so it
+    must not be changed by callers.
+
+    Args:
+        casing_type (CasingTypeEnum): Casing of the description
+        locale_code (str): Language of the description, None for the default
+        use_24hour_time_format (bool): 24 hour times, None for the locale default
+
+    Returns:
+        Options: The shared options
+    """
+    options = Options()
+    options.casing_type = casing_type
+    options.description_type = DescriptionTypeEnum.FULL
+    if locale_code is not None:
+        options.locale_code = locale_code
+    if use_24hour_time_format is not None:
+        options.use_24hour_time_format = use_24hour_time_format
+    return options
+
+
+class CronDescriber:
+    """Describes cron expressions, remembering recent descriptions.
+
+    Attributes:
+        maxsize: Number of descriptions kept in the cache
+    """
+
+    def __init__(self, maxsize=CRON_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._cached = lru_cache(maxsize=maxsize)(self._describe)
+
+    @staticmethod
+    def _describe(cron_expression, casing_type, locale_code, use_24hour_time_format):
+        options = shared_options(casing_type, locale_code, use_24hour_time_format)
+        try:
+            descriptor = ExpressionDescriptor(cron_expression, options)
+            return descriptor.get_description()
+        except Exception as e:
+            # The same bad expression fails the same way, so errors are cached too
+            return f"Error generating description: {str(e)}"
+
+    def describe(self, cron_expression, casing_type=CasingTypeEnum.Sentence, locale_code=None, use_24hour_time_format=None):
+        """Describes one cron expression.
+
+        Args:
+            cron_expression (str): The cron expression from the YAML file
+            casing_type (CasingTypeEnum): Casing of the description
+            locale_code (str): Language of the description, None for the default
+            use_24hour_time_format (bool): 24 hour times, None for the locale default
+
+        Returns:
+            str: The description, or an error message if it can't be described
+        """
+        if not cron_expression:
+            return NO_EXPRESSION_MESSAGE
+        with self._lock:
+            return self._cached(str(cron_expression), casing_type, locale_code, use_24hour_time_format)
+
+    def describe_many(self, cron_expressions, **options):
+        """Describes a batch of cron expressions, each distinct one once.
+
+        Args:
+            cron_expressions (iterable): Cron expressions, repeats allowed
+            **options: casing_type, locale_code or use_24hour_time_format
+
+        Returns:
+            dict: Description for each distinct expression
+        """
+        descriptions = {}
+        for cron_expression in cron_expressions:
+            if cron_expression not in descriptions:
+                descriptions[cron_expression] = self.describe(cron_expression, **options)
+        return descriptions
+
+    def stats(self):
+        """Returns the cache counters.
+
+        Returns:
+            dict: hits, misses, size, maxsize and hit_rate
+        """
+        info = self._cached.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        """Empties the cache and resets the counters."""
+        with self._lock:
+            self._cached.cache_clear()
+
+
+# Shared by every pipeline parsed in this process
+describer = CronDescriber()
@@ -0,0 +1,103 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Number of distinct hosts that keep a connection pool around
+DEFAULT_POOL_HOSTS = 10
+# Maximum open connections to a single host, extra requests wait for a free one
+DEFAULT_CONNECTIONS_PER_HOST = 8
+# Seconds to wait on a connect or read before giving up on a YML file
+DEFAULT_TIMEOUT = 30
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def load_credentials():
+    """Reads the Azure DevOps credentials from the .env file and environment.
+
+    Returns:
+        tuple: (PAT, ORG_URL), either may be None if it isn't set
+    """
+    load_dotenv()
+    return os.getenv("PAT"), os.getenv("ORG_URL")
+
+
+class DevOpsClient:
+    """Keep-alive HTTP client for fetching YML files from Azure DevOps.
+
+    Every request goes through one requests.Session, so connections (and their
+    TLS handshakes) are reused between files instead of opened per file.
+
+    Attributes:
+        session: The pooled requests.Session
+        organization_url: ORG_URL from the .env file, if any
+        timeout: Seconds to wait on a connect or read
+    """
+
+    def __init__(
+        self,
+        pat=None,
+        organization_url=None,
+        pool_hosts=DEFAULT_POOL_HOSTS,
+        connections_per_host=DEFAULT_CONNECTIONS_PER_HOST,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        self.organization_url = organization_url
+        self.timeout = timeout
+
+        # pool_block caps the connections to each host at connections_per_host
+        adapter = HTTPAdapter(
+            pool_connections=pool_hosts,
+            pool_maxsize=connections_per_host,
+            pool_block=True,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        if pat:
+            self.session.auth = ("", pat)
+
+    def get(self, url, **kwargs):
+        """Sends a GET request over the pooled session.
+
+        Args:
+            url (str): The URL to fetch
+            **kwargs: Extra arguments passed to requests.Session.get
+
+        Returns:
+            requests.Response: The response, with gzip bodies already decoded
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def get_client():
+    """Returns the shared client, creating it (and loading credentials) on first use.
+
+    Safe to call from several ingestion threads at once.
+
+    Returns:
+        DevOpsClient: The client shared by every URL fetched this run
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            pat, organization_url = load_credentials()
+            _client = DevOpsClient(pat, organization_url)
+        return _client
+
+
+def reset_client():
+    """Closes the shared client so the next run reloads credentials."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
@@ -0,0 +1,218 @@
+import hashlib
+import os
+import pickle
+import threading
+
+# Where parsed YML files are kept, relative to the working directory
+DEFAULT_CACHE_DIR = os.path.join(".vsm_cache", "parsed")
+# Total size of the cache on disk before the least recently used entries go
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+CACHE_EXTENSION = ".pickle"
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class ParseCache:
+    """On-disk cache of parsed YML documents.
+
+    Entries are keyed by path, mtime, size and a hash of the file contents, so
+    an edited file never hits a stale entry. Documents are stored as pickles.
+    Every hit refreshes the entry's mtime, and once the cache grows past
+    max_bytes the entries with the oldest mtime are evicted first.
+
+    Attributes:
+        directory: Folder the cache entries are written to
+        max_bytes: Size budget for all entries combined
+        hits: Lookups answered from the cache
+        misses: Lookups that had to parse the file
+        stores: Parsed documents written to the cache
+        evictions: Entries removed to stay under max_bytes
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @staticmethod
+    def make_key(file_path, file_stat, content):
+        """Builds the cache key for one version of a file.
+
+        Args:
+            file_path (str): Path the file was read from
+            file_stat (os.stat_result): Stat of the file when it was read
+            content (bytes): The file contents
+
+        Returns:
+            str: Hex digest identifying this path and content
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        key = f"{os.path.abspath(file_path)}|{file_stat.st_mtime_ns}|{file_stat.st_size}|{content_hash}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key + CACHE_EXTENSION)
+
+    def get(self, key):
+        """Looks up a parsed document.
+
+        Args:
+            key (str): Key from make_key
+
+        Returns:
+            The cached document, or None on a miss
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rb") as entry:
+                document = pickle.load(entry)
+            # Refresh the entry's place in the LRU order
+            os.utime(entry_path)
+        except FileNotFoundError:
+            document = None
+        except Exception as e:
+            print(f"Warning: dropping unreadable cache entry {entry_path} ({str(e)}).")
+            self._remove(entry_path)
+            document = None
+
+        with self._lock:
+            if document is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return document
+
+    def put(self, key, document):
+        """Stores a parsed document, evicting old entries if over budget.
+
+        Args:
+            key (str): Key from make_key
+            document: The parsed YML document
+        """
+        try:
+            data = pickle.dumps(document, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"Warning: could not cache parsed file ({str(e)}).")
+            return
+        if len(data) > self.max_bytes:
+            return
+
+        entry_path = self._entry_path(key)
+        temp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                total = self._current_bytes()
+                if os.path.exists(entry_path):
+                    total -= os.path.getsize(entry_path)
+                with open(temp_path, "wb") as entry:
+                    entry.write(data)
+                # Readers in other threads never see a half written entry
+                os.replace(temp_path, entry_path)
+            except OSError as e:
+                print(f"Warning: could not write cache entry {entry_path} ({str(e)}).")
+                self._remove(temp_path)
+                return
+            self.stores += 1
+            self._total_bytes = total + len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=entry_path)
+
+    def _current_bytes(self):
+        # Only scan the directory once, afterwards the total is kept up to date
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, _, size in self._entries())
+        return self._total_bytes
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith(CACHE_EXTENSION):
+                continue
+            entry_path = os.path.join(self.directory, name)
+            try:
+                entry_stat = os.stat(entry_path)
+            except FileNotFoundError:
+                continue
+            entries.append((entry_stat.st_mtime_ns, entry_path, entry_stat.st_size))
+        return entries
+
+    def _evict(self, keep):
+        # Oldest mtime first, the entry just written always survives
+        for _, entry_path, size in sorted(self._entries()):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if entry_path == keep:
+                continue
+            if self._remove(entry_path):
+                self._total_bytes -= size
+                self.evictions += 1
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def clear(self):
+        """Removes every entry and resets the size total."""
+        with self._lock:
+            for _, entry_path, _ in self._entries():
+                self._remove(entry_path)
+            self._total_bytes = 0
+
+    def stats(self):
+        """Returns the hit/miss counters.
+
+        Returns:
+            dict: hits, misses, stores, evictions and bytes currently on disk
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "bytes": self._current_bytes(),
+            }
+
+
+def configure(directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """Turns on the shared parse cache used by localParser.
+
+    Args:
+        directory (str): Folder the cache entries are written to
+        max_bytes (int): Size budget for all entries combined
+
+    Returns:
+        ParseCache: The new shared cache
+    """
+    global _cache
+    with _cache_lock:
+        _cache = ParseCache(directory, max_bytes)
+        return _cache
+
+
+def get_cache():
+    """Returns the shared parse cache, or None when caching is off."""
+    return _cache
+
+
+def disable():
+    """Turns off the shared parse cache, entries on disk are kept."""
+    global _cache
+    with _cache_lock:
+        _cache = None
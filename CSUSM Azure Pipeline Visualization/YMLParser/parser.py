@@ -1,17 +1,27 @@
 import json
 import re
 import yaml
-import requests
-from dotenv import load_dotenv
 from functools import singledispatch
 import os
 import pprint
-from cron_descriptor import (
-    Options,
-    CasingTypeEnum,
-    DescriptionTypeEnum,
-    ExpressionDescriptor,
-)  # for cron decrypting
+import sys
+from YMLParser import cron_service  # for cron decrypting
+from YMLParser import devops_client
+from YMLParser import parse_cache
+from YMLParser import response_cache
+from YMLParser import task_matcher
+from YMLParser import tree_walker
+
+# Use libyaml's C loaders when PyYAML was built with them, they build the same
+# dictionaries as the pure Python loaders in a fraction of the time
+try:
+    from yaml import CSafeLoader as SAFE_LOADER, CUnsafeLoader as UNSAFE_LOADER
+
+    LIBYAML_LOADER = True
+except ImportError:
+    from yaml import SafeLoader as SAFE_LOADER, UnsafeLoader as UNSAFE_LOADER
+
+    LIBYAML_LOADER = False
 
 TASK_NAMES_IGNORE_CASE = [
     "Python",
@@ -51,6 +61,43 @@ TASK_ALIAS_MAP = {
     "npm": "npm",
 }
 
+# Add in-house task names with register_task instead of editing the lists above
+TASK_REGISTRY = task_matcher.TaskRegistry(TASK_NAMES_IGNORE_CASE, TASK_ALIAS_MAP)
+
+
+def register_task(name, alias=None):
+    """Adds a task name to look for in pipelines.
+
+    Args:
+        name (str): Task name as it appears in scripts and tasks, matched ignoring case
+        alias (str): Name shown on the VSM, defaults to the name itself
+    """
+    TASK_REGISTRY.register(name, alias)
+
+
+def safe_load(content):
+    """Parses YML text with the fastest available safe loader.
+
+    Args:
+        content (str): The YML text
+
+    Returns:
+        The parsed YML, same as yaml.safe_load
+    """
+    return yaml.load(content, Loader=SAFE_LOADER)
+
+
+def unsafe_load(content):
+    """Parses YML text with the fastest available unsafe loader.
+
+    Args:
+        content (str): The YML text
+
+    Returns:
+        The parsed YML, same as yaml.unsafe_load
+    """
+    return yaml.load(content, Loader=UNSAFE_LOADER)
+
 
 def is_URL(string):
     """Checks if a string is a URL.
@@ -119,32 +166,51 @@ class apiParser(ymlParserInterface):
             pipeline_name (str): Name of the pipeline
             file_path (str): URL path to the YML file
         """
-        try:
-            load_dotenv()
-            pat = os.getenv("PAT")
-            organization_url = os.getenv("ORG_URL")
-        except:
-            print("Error: .env file not found. Create a .env file with PAT and ORG_URL")
-            return None
-
         if not file_path or not pipeline_name:
             print("Error: Missing parameter")
             return None
 
-        try:
-            # Basic validation of URL format
-            if not file_path.startswith(("http://", "https://")):
-                print("Error: Invalid URL format")
+        # Basic validation of URL format
+        if not file_path.startswith(("http://", "https://")):
+            print("Error: Invalid URL format")
+            return None
+
+        cache = response_cache.get_cache()
+        entry = cache.lookup(file_path) if cache is not None else None
+
+        if cache is not None and cache.offline:
+            if entry is None:
+                print(f"Error: Offline and no cached copy of YML file from URL: {file_path}")
                 return None
+            cache.record_hit()
+            return apiParser.add_fields(entry["document"], pipeline_name, file_path)
 
-            response = requests.get(file_path, auth=("", pat))
-            if response.status_code == 200:
+        try:
+            # Shared keep-alive client, credentials are only loaded on first use
+            client = devops_client.get_client()
+        except:
+            print("Error: .env file not found. Create a .env file with PAT and ORG_URL")
+            return None
+
+        try:
+            # Only ask for the body again if the file changed since it was cached
+            request_kwargs = {}
+            headers = response_cache.ResponseCache.conditional_headers(entry)
+            if headers:
+                request_kwargs["headers"] = headers
+
+            response = client.get(file_path, **request_kwargs)
+            if response.status_code == 304 and entry is not None:
+                cache.record_hit()
+                return apiParser.add_fields(entry["document"], pipeline_name, file_path)
+            elif response.status_code == 200:
                 yml_content = response.content.decode("utf-8")
-                yml_data = yaml.safe_load(yml_content)
-                yml_data["origin"] = file_path
-                if "name" not in yml_data:
-                    yml_data["name"] = pipeline_name
-                return yml_data
+                yml_data = safe_load(yml_content)
+                if cache is not None:
+                    cache.record_miss()
+                    if isinstance(yml_data, dict):
+                        cache.store(file_path, response.headers, yml_data)
+                return apiParser.add_fields(yml_data, pipeline_name, file_path)
             else:
                 print(f"Failed to fetch YML file from URL: {file_path}")
                 return None
@@ -152,6 +218,23 @@ class apiParser(ymlParserInterface):
             print(f"Error parsing YML file: {str(e)}")
             return None
 
+    @staticmethod
+    def add_fields(yml_data, pipeline_name: str, file_path: str):
+        """Adds the origin, and the name if the YML has none, to a parsed file.
+
+        Args:
+            yml_data (dict): The parsed YML file
+            pipeline_name (str): Name of the pipeline
+            file_path (str): URL path to the YML file
+
+        Returns:
+            dict: The same dictionary with the fields added
+        """
+        yml_data["origin"] = file_path
+        if "name" not in yml_data:
+            yml_data["name"] = pipeline_name
+        return yml_data
+
 
 class localParser(ymlParserInterface):
     """Parser that implements the generic parser interface. Made to parse a
@@ -161,38 +244,71 @@ class localParser(ymlParserInterface):
         None
     """
 
+    @staticmethod
+    def load_content(content: str):
+        """Turns the text of a YML file into a dictionary.
+
+        Args:
+            content (str): The text of the YML file.
+
+        Returns:
+            dict: The parsed YML, without the origin and name fields.
+        """
+        yml_data = None
+
+        # First try safe_load
+        try:
+            yml_data = safe_load(content)
+        except (yaml.YAMLError, Exception) as e:
+            print(f"Warning: safe_load failed ({str(e)}). Attempting unsafe_load.")
+            try:
+                yml_data = unsafe_load(content)
+            except Exception as e:
+                print(f"Warning: unsafe_load also failed ({str(e)}). Creating basic structure.")
+
+        # Ensure we always return a dictionary with required fields
+        if yml_data is None:
+            yml_data = {}
+        elif not isinstance(yml_data, dict):
+            yml_data = {"content": yml_data}
+        return yml_data
+
     @staticmethod
     def parse_yml(pipeline_name: str, file_path: str):
         """Called by the parser class to parse the YML file.
 
+        Parsed files are reused from the parse cache when it is turned on.
+
         Args:
             file_path (str): The path to the YML file.
             pipeline_name (str): The name of the pipeline.
         """
         try:
+            cache = parse_cache.get_cache()
+            file_stat = None
+            if cache is not None:
+                try:
+                    file_stat = os.stat(file_path)
+                except OSError:
+                    # Can't key an entry without a stat, parse without the cache
+                    cache = None
+
             with open(file_path) as file:
                 content = file.read()
-                yml_data = None
-                
-                # First try safe_load
-                try:
-                    yml_data = yaml.safe_load(content)
-                except (yaml.YAMLError, Exception) as e:
-                    print(f"Warning: safe_load failed ({str(e)}). Attempting unsafe_load.")
-                    try:
-                        yml_data = yaml.unsafe_load(content)
-                    except Exception as e:
-                        print(f"Warning: unsafe_load also failed ({str(e)}). Creating basic structure.")
-                
-                # Ensure we always return a dictionary with required fields
-                if yml_data is None:
-                    yml_data = {}
-                elif not isinstance(yml_data, dict):
-                    yml_data = {"content": yml_data}
-                
-                yml_data["origin"] = file_path
-                yml_data["name"] = pipeline_name
-                return yml_data
+
+            yml_data = None
+            if cache is not None:
+                cache_key = cache.make_key(file_path, file_stat, content.encode("utf-8"))
+                yml_data = cache.get(cache_key)
+
+            if yml_data is None:
+                yml_data = localParser.load_content(content)
+                if cache is not None:
+                    cache.put(cache_key, yml_data)
+
+            yml_data["origin"] = file_path
+            yml_data["name"] = pipeline_name
+            return yml_data
 
         except FileNotFoundError:
             print("Error: File not found. Check file path?")
@@ -202,9 +318,61 @@ class localParser(ymlParserInterface):
             return None
 
 
+def intern_string(value):
+    # Repeated names like "ubuntu-latest" or "Python" share a single string
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class DependencyRef:
+    """A pipeline that another pipeline depends on, referenced by name.
+
+    Stands in for the dependent Pipeline until the VSM is drawn, and only keeps
+    what drawing needs: the name and the coordinates of the card it points to.
+
+    Attributes:
+        name: The name of the pipeline depended on.
+        x: X coordinate of the pipeline depended on, once drawn.
+        y: Y coordinate of the pipeline depended on, once drawn.
+    """
+
+    __slots__ = ("_name", "_x", "_y")
+
+    def __init__(self, name):
+        self._name = intern_string(name)
+        self._x = 0
+        self._y = 0
+
+    def setName(self, name):
+        self._name = intern_string(name)
+
+    def getName(self):
+        return self._name
+
+    def setX(self, x):
+        self._x = x
+
+    def getX(self):
+        return self._x
+
+    def setY(self, y):
+        self._y = y
+
+    def getY(self):
+        return self._y
+
+    def __repr__(self):
+        return f"DependencyRef({self._name!r})"
+
+
 class Pipeline:
     """A DevOps pipeline parsed from a YAML config file.
 
+    Slotted and with lists only created once something is added, since a
+    fleet can hold tens of thousands of pipelines. OS and task names are
+    interned so every pipeline shares one copy of each.
+
     Attributes:
         name: The name of the pipeline.
         os: The operating system the pipeline is running on.
@@ -212,8 +380,25 @@ class Pipeline:
         languages: The languages used in the pipeline.
         jobs: The jobs in the pipeline.
         origin: The repository of where the YML file came from!
+        dependencies: The pipelines this one depends on, usually DependencyRef objects.
+        cycle: Number of the dependency loop the pipeline is part of, None if it isn't in one.
     """
 
+    __slots__ = (
+        "_name",
+        "_os",
+        "_trigger",
+        "_languages",
+        "_tasks",
+        "_jobs",
+        "_artifacts",
+        "_origin",
+        "dependencies",
+        "_cycle",
+        "_x",
+        "_y",
+    )
+
     def __init__(self):
         """Initializes a Pipeline object with just a name.
 
@@ -229,12 +414,13 @@ class Pipeline:
         self._name = None
         self._os = None
         self._trigger = None
-        self._languages = []
-        self._tasks = []
-        self._jobs = []
-        self._artifacts = []
+        self._languages = None
+        self._tasks = None
+        self._jobs = None
+        self._artifacts = None
         self._origin = None
-        self.dependencies = []
+        self.dependencies = None
+        self._cycle = None
         self._x = 0
         self._y = 0
 
@@ -245,27 +431,33 @@ class Pipeline:
         return self._name
 
     def setOS(self, os):
-        self._os = os
+        self._os = intern_string(os)
 
     def getOS(self):
         return self._os
 
     def addLanguage(self, language):
-        self._languages.append(language)
+        self.getLanguages().append(intern_string(language))
 
     def getLanguages(self):
+        if self._languages is None:
+            self._languages = []
         return self._languages
 
     def addJob(self, job):
-        self._jobs.append(job)
+        self.getJobs().append(job)
 
     def getJobs(self):
+        if self._jobs is None:
+            self._jobs = []
         return self._jobs
 
     def addTask(self, task):
-        self._tasks.append(task)
+        self.getTasks().append(intern_string(task))
 
     def getTasks(self):
+        if self._tasks is None:
+            self._tasks = []
         return self._tasks
 
     def setTrigger(self, trigger):
@@ -275,9 +467,11 @@ class Pipeline:
         return self._trigger
 
     def addArtifact(self, artifact):
-        self._artifacts.append(artifact)
+        self.getArtifacts().append(artifact)
 
     def getArtifacts(self):
+        if self._artifacts is None:
+            self._artifacts = []
         return self._artifacts
 
     def setOrigin(self, origin):
@@ -287,11 +481,19 @@ class Pipeline:
         return self._origin
 
     def addDependency(self, dependency):
-        self.dependencies.append(dependency)
+        self.getDependencies().append(dependency)
 
     def getDependencies(self):
+        if self.dependencies is None:
+            self.dependencies = []
         return self.dependencies
 
+    def setCycle(self, cycle):
+        self._cycle = cycle
+
+    def getCycle(self):
+        return self._cycle
+
     def setX(self, x):
         self._x = x
 
@@ -305,9 +507,10 @@ class Pipeline:
         return self._y
 
     def applyTemplate(self, templateParams):
-        self.setOS(parse_os(templateParams))
+        scan = tree_walker.scan_pipeline(templateParams, TASK_NAMES_IGNORE_CASE)
+        self.setOS(parse_pool(scan["pool"]))
 
-        for task in deep_search_multi(templateParams, TASK_NAMES_IGNORE_CASE):
+        for task in scan["tasks"]:
             self.addTask(TASK_ALIAS_MAP.get(task, "Default"))
 
 
@@ -320,8 +523,10 @@ def parse_name(params):
 
 
 def parse_os(params):
-    os = deep_search_single(params, "pool")
+    return parse_pool(deep_search_single(params, "pool"))
 
+
+def parse_pool(os):
     if os is not None:
         if "vmImage" in os:
             os = os["vmImage"]
@@ -329,15 +534,26 @@ def parse_os(params):
     return os
 
 
-def parse_trigger(params):
+def parse_trigger(params, schedules=None):
+    """Returns the trigger of a YML file, the description of its schedule if it has one.
+
+    Args:
+        params (dict): A dictionary of parameters from the YAML config file.
+        schedules (dict): Descriptions by cron expression, from describe_schedules
+
+    Returns:
+        str: The trigger, or None if there isn't one
+    """
 
     if "schedules" in params:
         # When looking for cron, decode the encrypted cron message.
         if "cron" in params["schedules"][0]:
             cron_encrypted = str(params["schedules"][0]["cron"])
 
-            # call the cron descriptor function, with cron argument and display the new message to the console.
-            cron_decrypted = cron_descriptor(cron_encrypted)
+            # Schedules described in a batch are looked up, the rest are described here
+            cron_decrypted = (schedules or {}).get(cron_encrypted)
+            if cron_decrypted is None:
+                cron_decrypted = cron_descriptor(cron_encrypted)
 
             # Update the trigger with the new message.
             return cron_decrypted
@@ -389,26 +605,46 @@ def cron_descriptor(cron_expression):
     if not cron_expression:
         return "No cron expression provided"
 
-    # error handling if an issue generating the human readable message
-    try:
-        # configure options for the description
-        options = Options()
-        options.casing_type = (
-            CasingTypeEnum.Sentence
-        )  # setting the casing to sentence case
-        options.description_type = DescriptionTypeEnum.FULL  # Get full ddescription
+    # Descriptions are cached, repeated schedules are only described once
+    return cron_service.describer.describe(cron_expression)
+
+
+def schedule_cron(params):
+    """Returns the cron expression parse_trigger describes for a YML file.
+
+    Args:
+        params (dict): A dictionary of parameters from the YAML config file.
+
+    Returns:
+        str: The cron of the first schedule, or None if there isn't one
+    """
+    if not isinstance(params, dict) or not params.get("schedules"):
+        return None
+    first_schedule = params["schedules"][0]
+    if isinstance(first_schedule, dict) and "cron" in first_schedule:
+        return str(first_schedule["cron"])
+    return None
+
 
-        # Generalte the description
-        descriptor = ExpressionDescriptor(cron_expression, options)
-        newDescription = descriptor.get_description()
+def describe_schedules(documents):
+    """Describes the schedules of every YML file in a config in one batch.
 
-        # I want to display the message to the user on the console.
-        return newDescription
-    except Exception as e:
-        return f"Error generating description: {str(e)}"
+    Each distinct cron expression is described once. Pass the result to
+    createPipeline, which looks the descriptions up in it.
+
+    Args:
+        documents (list): Parsed YML files, None for files that failed to load
+
+    Returns:
+        dict: Description for each distinct cron expression
+    """
+    crons = [schedule_cron(params) for params in documents]
+    return cron_service.describer.describe_many(cron for cron in crons if cron)
 
 
 class Job:
+    __slots__ = ("name", "tasks", "artifacts")
+
     def __init__(self, name):
         self.name = name
         self.tasks = []
@@ -421,7 +657,7 @@ class Job:
         return self.name
 
     def addTask(self, task):
-        self.tasks.append(task)
+        self.tasks.append(intern_string(task))
 
     def getTasks(self):
         return self.tasks
@@ -473,9 +709,8 @@ def parse_resources(params):
     if "resources" in params:
         if "pipelines" in params["resources"]:
             for pipeline in params["resources"]["pipelines"]:
-                # Rename pipeline if name specified
-                dependent = Pipeline()
-                dependent.setName(pipeline["source"])
+                # Only the name is needed, the real pipeline is matched when drawing
+                dependent = DependencyRef(pipeline["source"])
                 print("Depends on:\t" + str(dependent.getName()))
                 if dependent is not None:
                     dependencies.append(dependent)
@@ -506,113 +741,9 @@ def deep_search_multi(params, keys):
     if not params or not isinstance(params, dict) or not keys:
         return []
 
-    results = []
-
-    # Helper function to check script content
-    def check_script(script_content, key):
-        if isinstance(script_content, str) and key.lower() in script_content.lower():
-            results.append(key)
-            print("Appending " + key + " to results")
-
-    # Iterate through stages
-    if "stages" in params:
-        for stage in params["stages"]:
-            for key in keys:
-                if key in stage:
-                    results.append(key)
-                    print("Appending " + key + " to results")
-            
-            # Check stage script
-            if "script" in stage:
-                for key in keys:
-                    check_script(stage["script"], key)
-
-            # Process stage tasks
-            if "task" in stage:
-                for key in keys:
-                    if key in stage["task"]:
-                        results.append(key)
-                        print("Appending " + key + " to results")
-
-            # Process stage jobs
-            if "jobs" in stage:
-                for job in stage["jobs"]:
-                    for key in keys:
-                        if key in job:
-                            results.append(key)
-                            print("Appending " + key + " to results")
-                    
-                    if "steps" in job:
-                        for step in job["steps"]:
-                            for key in keys:
-                                if key in step:
-                                    results.append(key)
-                                    print("Appending " + key + " to results")
-                                if "task" in step and key in step["task"]:
-                                    results.append(key)
-                                    print("Appending " + key + " to results")
-                                elif "script" in step:
-                                    check_script(step["script"], key)
-
-            # Process stage steps
-            if "steps" in stage:
-                for step in stage["steps"]:
-                    for key in keys:
-                        if key in step:
-                            results.append(key)
-                            print("Appending " + key + " to results")
-                        if "task" in step and key in step["task"]:
-                            results.append(key)
-                            print("Appending " + key + " to results")
-                        elif "script" in step:
-                            check_script(step["script"], key)
-
-    # Process root level jobs
-    if "jobs" in params:
-        for job in params["jobs"]:
-            for key in keys:
-                if key in job:
-                    results.append(key)
-                    print("Appending " + key + " to results")
-            
-            if "steps" in job:
-                for step in job["steps"]:
-                    for key in keys:
-                        if key in step:
-                            results.append(key)
-                            print("Appending " + key + " to results")
-                        if "task" in step and key in step["task"]:
-                            results.append(key)
-                            print("Appending " + key + " to results")
-                        elif "script" in step:
-                            check_script(step["script"], key)
-
-    # Process root level steps
-    if "steps" in params:
-        for step in params["steps"]:
-            for key in keys:
-                if key in step:
-                    results.append(key)
-                    print("Appending " + key + " to results")
-                if "task" in step and key in step["task"]:
-                    results.append(key)
-                    print("Appending " + key + " to results")
-                elif "script" in step:
-                    check_script(step["script"], key)
-
-    # Process root level task
-    if "task" in params:
-        for key in keys:
-            if key in params["task"]:
-                results.append(key)
-                print("Appending " + key + " to results")
-
-    # Process root level script
-    elif "script" in params:
-        for key in keys:
-            check_script(params["script"], key)
-
-    return results
+    visitor = tree_walker.KeywordVisitor(keys)
+    tree_walker.walk_pipeline(params, [visitor])
+    return visitor.results
 
 
 def deep_search_single(params, key):
@@ -629,70 +760,107 @@ def deep_search_single(params, key):
     if not params or not isinstance(params, dict):
         return None
 
-    # Iterate through stages, jobs, steps, and tasks
-    if "stages" in params:
-        for stage in params["stages"]:
-            if key in stage:
-                return stage[key]
-            if "jobs" in stage:
-                for job in stage["jobs"]:
-                    if key in job:
-                        return job[key]
-                    if "steps" in job:
-                        for step in job["steps"]:
-                            if key in step:
-                                return step[key]
-                            if "task" in step and isinstance(step["task"], dict) and key in step["task"]:
-                                return step["task"][key]
-            if "steps" in stage:
-                for step in stage["steps"]:
-                    if key in step:
-                        return step[key]
-                    if "task" in step and isinstance(step["task"], dict) and key in step["task"]:
-                        return step["task"][key]
-            if "task" in stage and isinstance(stage["task"], dict) and key in stage["task"]:
-                return stage["task"][key]
-
-    if "jobs" in params:
-        for job in params["jobs"]:
-            if key in job:
-                return job[key]
-            if "steps" in job:
-                for step in job["steps"]:
-                    if key in step:
-                        return step[key]
-                    if "task" in step and isinstance(step["task"], dict) and key in step["task"]:
-                        return step["task"][key]
-            if "task" in job and isinstance(job["task"], dict) and key in job["task"]:
-                return job["task"][key]
-
-    if "steps" in params:
-        for step in params["steps"]:
-            if key in step:
-                return step[key]
-            if "task" in step and isinstance(step["task"], dict) and key in step["task"]:
-                return step["task"][key]
-
-    if "task" in params and isinstance(params["task"], dict) and key in params["task"]:
-        return params["task"][key]
-
-    return None
+    visitor = tree_walker.FirstMatchVisitor(key)
+    tree_walker.walk_pipeline(params, [visitor])
+    return visitor.value
 
 
 def find_template_repo(repoName, params):
     # Look for repo
-    if "repositories" in params["resources"]:
+    if "repositories" in params.get("resources", {}):
         for repo in params["resources"]["repositories"]:
             if repo["repository"] == repoName:
                 return repo["name"]
 
 
-def get_template_path(partial):
+def config_file_path():
+    # Build OS-agnostic path to configuration file
+    return os.path.join(os.getcwd(), "config", "yml_url_config.json")
+
+
+class TemplateIndex:
+    """Lookup table from partial template paths to template_dictionary entries.
+
+    Built once per run. Every run of consecutive path components of every
+    template is a key, so a partial path is found with one dictionary lookup.
+    Partial paths that aren't whole components ("hello_world" for
+    "echo_hello_world.yml") fall back to a substring search. When a partial
+    path matches several templates the first one in config order is used and
+    a warning is printed.
+
+    Attributes:
+        paths: Normalized template paths, in config order
+    """
+
+    def __init__(self, templateDict):
+        self.paths = []
+        self._by_components = {}
+        self._warned = set()
+
+        for path in templateDict:
+            normalized = os.path.normpath(path)
+            if normalized in self.paths:
+                continue
+            self.paths.append(normalized)
+
+            components = normalized.split(os.sep)
+            for start in range(len(components)):
+                for end in range(start + 1, len(components) + 1):
+                    matches = self._by_components.setdefault(os.sep.join(components[start:end]), [])
+                    matches.append(normalized)
+
+    @classmethod
+    def from_config(cls, path_to_config_file=None):
+        """Builds the index from the template_dictionary of the config file.
+
+        Args:
+            path_to_config_file (str): Config file to read, config/yml_url_config.json if None
+
+        Returns:
+            TemplateIndex: The index
+
+        Raises:
+            FileNotFoundError: If config file cannot be found
+            json.JSONDecodeError: If config file contains invalid JSON
+            KeyError: If template_dictionary key is missing from config
+        """
+        if path_to_config_file is None:
+            path_to_config_file = config_file_path()
+
+        # Read the JSON configuration file
+        with open(path_to_config_file, "r") as f:
+            config_data = json.load(f)
+            return cls(config_data["template_dictionary"])  # May raise KeyError
+
+    def lookup(self, partial):
+        """Finds the template a partial path refers to.
+
+        Args:
+            partial (str): Partial path to search for
+
+        Returns:
+            str: Full normalized path if found, None if not found
+        """
+        partial_norm = os.path.normpath(partial)
+        matches = self._by_components.get(partial_norm)
+        if matches is None:
+            matches = [path for path in self.paths if partial_norm in path]
+        if not matches:
+            return None
+
+        if len(matches) > 1 and partial_norm not in self._warned:
+            self._warned.add(partial_norm)
+            print(f"Warning: template {partial} matches {len(matches)} templates, using {matches[0]}")
+        return matches[0]
+
+
+def get_template_path(partial, index=None):
     """
     Finds the full template path from a partial path in the template dictionary.
     
     Args:
         partial (str): Partial path to search for
+        index (TemplateIndex): Index built for the run, read from the config file if None
         
     Returns:
         str: Full normalized path if found, None if not found
@@ -702,53 +870,168 @@ def get_template_path(partial):
         json.JSONDecodeError: If config file contains invalid JSON
         KeyError: If template_dictionary key is missing from config
     """
-    # Build OS-agnostic path to configuration file
-    path_to_config_file = os.path.join(os.getcwd(), "config", "yml_url_config.json")
-
-    # Read the JSON configuration file
-    with open(path_to_config_file, "r") as f:
-        config_data = json.load(f)
-        templateDict = config_data["template_dictionary"]  # May raise KeyError
-
-    # Search for partial path in template dictionary, OS-agnostic
-    partial_norm = os.path.normpath(partial)
-    for path in templateDict:
-        if partial_norm in os.path.normpath(path):
-            return os.path.normpath(path)
-            
-    return None
+    if index is None:
+        index = TemplateIndex.from_config()
+    return index.lookup(partial)
+
+
+def find_and_parse_template(params, templates=None, index=None, references=None):
+    """Parses every template a YML file uses, following nested templates.
+
+    Args:
+        params (dict): A dictionary of parameters from the YAML config file.
+        templates (TemplateResolver): Resolver shared by the run, a new one if None
+        index (TemplateIndex): Template paths for a new resolver, read from the config file if None
+        references (list): The file's template references, found by walking it if None
+
+    Returns:
+        dict: The merged templates, or None if the file uses none that could be parsed
+    """
+    if templates is None:
+        templates = TemplateResolver(index)
+    return templates.resolve(params, references)
 
 
-def find_and_parse_template(params):
-    t = deep_search_single(params, "template")
+def merge_templates(documents):
+    """Combines parsed templates into one document for Pipeline.applyTemplate.
 
-    if t is None:
+    Args:
+        documents (list): Parsed templates, in the order they are referenced
+
+    Returns:
+        dict: The only template unchanged, or the stages, jobs and steps of
+            every template in order. None if there are no templates.
+    """
+    if not documents:
         return None
-    else:
+    if len(documents) == 1:
+        return documents[0]
+
+    merged = {}
+    for section in ["stages", "jobs", "steps"]:
+        for document in documents:
+            if isinstance(document, dict) and isinstance(document.get(section), list):
+                merged.setdefault(section, []).extend(document[section])
+    return merged
+
+
+class TemplateResolver:
+    """Follows the template references of YML files for a whole run.
+
+    Every "template:" reference is followed, in stages, jobs, steps and
+    extends, including references made by the templates themselves. Each
+    template is parsed once per resolver however many pipelines use it, and a
+    template that ends up including itself is reported and skipped.
+
+    Attributes:
+        index: Template paths for remote references, read from the config file if None
+        parse_count: Number of template files parsed so far
+    """
+
+    def __init__(self, index=None):
+        self.index = index
+        self.parse_count = 0
+        self._parsed = {}
+
+    def locate(self, reference, params):
+        """Works out which file a template reference points to.
+
+        Args:
+            reference (str): The value of a "template:" key
+            params (dict): The YML file that holds the reference
+
+        Returns:
+            tuple: (filePath, repoID), or None if the template can't be found
+        """
         print("\nTemplate detected. Parsing...")
         # Split template into repo name and file path
         # If @, it is remote, we go to a different folder (template stored in diff repo)
-        if "@" in t:
-            pair = str(t).split("@")
+        if "@" in reference:
+            pair = str(reference).split("@")
 
             # Get name of repository
-            filePath = get_template_path(pair[0])
+            filePath = get_template_path(pair[0], self.index)
             repoName = pair[1]
 
             repoID = find_template_repo(repoName, params)
             print(f"Parsing template {repoName} at: {filePath}")
         # if no @, template is in th same folder that the yml file is in
         else:
-            filePath = t
+            filePath = reference
             repoID = ""
 
         if filePath is not None and repoID is not None:
-            return parseTemplate(filePath, repoID)
+            return filePath, repoID
         # If we fail to find template, return none
         else:
             print("Error: Please fix your template dictionary :) <3")
             return None
 
+    @staticmethod
+    def path_key(filePath):
+        # The same file reached through different relative paths is one template
+        if is_URL(filePath):
+            return filePath
+        return os.path.normcase(os.path.abspath(filePath))
+
+    def load(self, filePath, repoID):
+        """Parses a template, or returns it from an earlier parse.
+
+        Args:
+            filePath (str): Path or URL of the template
+            repoID (str): Name of the repository holding the template
+
+        Returns:
+            dict: The parsed template, None if it couldn't be parsed
+        """
+        key = self.path_key(filePath)
+        if key not in self._parsed:
+            self._parsed[key] = parseTemplate(filePath, repoID)
+            self.parse_count += 1
+        return self._parsed[key]
+
+    def collect(self, params, including=(), references=None):
+        """Lists the templates a YML file uses, depth first.
+
+        Args:
+            params (dict): The YML file to search for references
+            including (tuple): Path keys of the templates currently being expanded
+            references (list): The file's template references, found by walking it if None
+
+        Returns:
+            list: Each parsed template followed by the templates it uses
+        """
+        if references is None:
+            references = tree_walker.template_references(params)
+        documents = []
+        for reference in references:
+            located = self.locate(reference, params)
+            if located is None:
+                continue
+            key = self.path_key(located[0])
+            if key in including:
+                print("Error: Template cycle detected: " + " -> ".join(including + (key,)))
+                continue
+
+            document = self.load(*located)
+            if document is None:
+                continue
+            documents.append(document)
+            documents.extend(self.collect(document, including + (key,)))
+        return documents
+
+    def resolve(self, params, references=None):
+        """Parses and merges every template a YML file uses.
+
+        Args:
+            params (dict): A dictionary of parameters from the YAML config file.
+            references (list): The file's template references, found by walking it if None
+
+        Returns:
+            dict: The merged templates, None if there are none
+        """
+        return merge_templates(self.collect(params, references=references))
+
 
 def parse_job_tasks(job):
     tasks = []
@@ -768,11 +1051,13 @@ def parse_job_tasks(job):
     return tasks
 
 
-def createPipeline(params):
+def createPipeline(params, templates=None, schedules=None):
     """Creates a Pipeline object from a YAML config file.
 
     Args:
         params (dict): A dictionary of parameters from the YAML config file.
+        templates (TemplateResolver): Resolver shared by the run, a new one if None
+        schedules (dict): Descriptions by cron expression, from describe_schedules
 
     Returns:
         Pipeline: A Pipeline object.
@@ -789,6 +1074,9 @@ def createPipeline(params):
         # TODO: Throw error here when we have a GUI
         print("Error: YAML file is empty")
     else:
+        # Collect pool, templates, artifact and tasks in a single walk of the file
+        scan = tree_walker.scan_pipeline(params, TASK_NAMES_IGNORE_CASE)
+
         # Check for name
         name = parse_name(params)
 
@@ -797,13 +1085,13 @@ def createPipeline(params):
         else:
             newPipeline.setName(name)
         # Check for OS spec
-        newPipeline.setOS(parse_os(params))
+        newPipeline.setOS(parse_pool(scan["pool"]))
         # Check for schedules
-        newPipeline.setTrigger(parse_trigger(params))
+        newPipeline.setTrigger(parse_trigger(params, schedules))
         # Check for repo URL
         newPipeline.setOrigin(parse_origin(params))
         # Check for connections to other pipelines
-        template = find_and_parse_template(params)
+        template = find_and_parse_template(params, templates, references=scan["templates"])
         if template is not None:
             newPipeline.applyTemplate(template)
 
@@ -811,9 +1099,9 @@ def createPipeline(params):
             newPipeline.addDependency(dependency)
 
         # Check for jobs, tasks, artifacts
-        for task in deep_search_multi(params, TASK_NAMES_IGNORE_CASE):
+        for task in scan["tasks"]:
             newPipeline.addTask(TASK_ALIAS_MAP.get(task, "Default"))
-        newPipeline.addArtifact(deep_search_single(params, "publish"))
+        newPipeline.addArtifact(scan["publish"])
 
     return newPipeline
 
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import pickle
+import threading
+
+# Where remote YML responses are kept, relative to the working directory
+DEFAULT_CACHE_DIR = os.path.join(".vsm_cache", "responses")
+
+CACHE_EXTENSION = ".pickle"
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class ResponseCache:
+    """On-disk cache of remote YML files for conditional requests.
+
+    Each URL keeps the parsed document along with the ETag and Last-Modified
+    headers it was served with. Later fetches send them back as If-None-Match
+    and If-Modified-Since so an unchanged file comes back as a bodiless 304.
+    In offline mode the cached document is used without any request at all.
+
+    Attributes:
+        directory: Folder the cache entries are written to
+        offline: Serve only from the cache, never touch the network
+        hits: Fetches answered by a 304 or from the cache while offline
+        misses: Fetches that downloaded the full file
+        stores: Downloaded documents written to the cache
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, offline=False):
+        self.directory = directory
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+
+    def _entry_path(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + CACHE_EXTENSION)
+
+    def lookup(self, url):
+        """Loads the cached entry for a URL.
+
+        Args:
+            url (str): The URL of the YML file
+
+        Returns:
+            dict: The entry with document, etag and last_modified, or None
+        """
+        entry_path = self._entry_path(url)
+        try:
+            with open(entry_path, "rb") as entry_file:
+                entry = pickle.load(entry_file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: ignoring unreadable cache entry {entry_path} ({str(e)}).")
+            return None
+
+        # Two URLs sharing a hash is unlikely, but never serve the wrong file
+        if entry.get("url") != url:
+            return None
+        return entry
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Builds the revalidation headers for a cached entry.
+
+        Args:
+            entry (dict): Entry from lookup, or None
+
+        Returns:
+            dict: If-None-Match and/or If-Modified-Since, empty without an entry
+        """
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, response_headers, document):
+        """Saves a downloaded document along with its validators.
+
+        Responses without an ETag or Last-Modified can't be revalidated, but are
+        still kept so offline mode can serve them.
+
+        Args:
+            url (str): The URL of the YML file
+            response_headers (Mapping): Headers of the 200 response
+            document: The parsed YML, before origin and name are added
+        """
+        entry = {
+            "url": url,
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified"),
+            "document": document,
+        }
+        entry_path = self._entry_path(url)
+        temp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, "wb") as entry_file:
+                pickle.dump(entry, entry_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, entry_path)
+        except Exception as e:
+            print(f"Warning: could not write cache entry {entry_path} ({str(e)}).")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.stores += 1
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def stats(self):
+        """Returns the hit/miss counters.
+
+        Returns:
+            dict: hits, misses and stores
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "stores": self.stores}
+
+
+def configure(directory=DEFAULT_CACHE_DIR, offline=False):
+    """Turns on the shared response cache used by apiParser.
+
+    Args:
+        directory (str): Folder the cache entries are written to
+        offline (bool): Serve only from the cache, never touch the network
+
+    Returns:
+        ResponseCache: The new shared cache
+    """
+    global _cache
+    with _cache_lock:
+        _cache = ResponseCache(directory, offline)
+        return _cache
+
+
+def get_cache():
+    """Returns the shared response cache, or None when caching is off."""
+    return _cache
+
+
+def disable():
+    """Turns off the shared response cache, entries on disk are kept."""
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -0,0 +1,129 @@
+"""Task and language detection in pipeline scripts.
+
+A TaskMatcher is compiled once per list of task names and reports which of
+them appear in a script, ignoring case, with one lowercase copy of the script.
+The TaskRegistry holds the task names createPipeline looks for, so new ones
+can be added at runtime.
+"""
+import threading
+from functools import lru_cache
+
+
+class TaskMatcher:
+    """Finds which task names appear in a piece of text, ignoring case.
+
+    Names that only differ in case ("Python", "python") share one pattern, and
+    a pattern that contains another ("javascript" contains "java") marks both
+    as found, so each distinct pattern is searched for at most once.
+
+    Attributes:
+        keys: The task names, in the order hits are reported
+    """
+
+    def __init__(self, keys):
+        self.keys = tuple(keys)
+        self._lowered_keys = tuple(key.lower() for key in self.keys)
+
+        # Longest first, so a hit on "javascript" makes searching for "java" unnecessary
+        self._patterns = sorted(set(self._lowered_keys) - {""}, key=len, reverse=True)
+        self._implied = {
+            pattern: frozenset(other for other in self._patterns if other in pattern)
+            for pattern in self._patterns
+        }
+        # The empty name is in every string
+        self._always = frozenset({""}) if "" in self._lowered_keys else frozenset()
+
+    def found_patterns(self, text):
+        """Returns the lowercased task names that appear in the text.
+
+        Args:
+            text (str): The script to search
+
+        Returns:
+            frozenset: The lowercased names found
+        """
+        text_lower = text.lower()
+        found = set(self._always)
+        for pattern in self._patterns:
+            if pattern not in found and pattern in text_lower:
+                found |= self._implied[pattern]
+        return frozenset(found)
+
+    def find(self, text):
+        """Lists the task names that appear in the text, in key order.
+
+        Args:
+            text (str): The script to search
+
+        Returns:
+            list: Every key whose lowercase form is in the lowercased text
+        """
+        if not isinstance(text, str):
+            return []
+        found = self.found_patterns(text)
+        return [key for key, lowered in zip(self.keys, self._lowered_keys) if lowered in found]
+
+
+@lru_cache(maxsize=32)
+def _compile(keys):
+    return TaskMatcher(keys)
+
+
+def compile_matcher(keys):
+    """Returns a TaskMatcher for the keys, compiled once per distinct list.
+
+    Args:
+        keys (list): Task names to look for
+
+    Returns:
+        TaskMatcher: The shared matcher for these names
+    """
+    return _compile(tuple(keys))
+
+
+class TaskRegistry:
+    """The task names searched for and the names they are displayed as.
+
+    The registry edits the name list and alias map it was given in place, so
+    code reading them directly sees registered tasks too.
+
+    Attributes:
+        names: Task names searched for in pipelines, in result order
+        aliases: Display name for each task name
+    """
+
+    def __init__(self, names, aliases):
+        self.names = names
+        self.aliases = aliases
+        self._lock = threading.Lock()
+
+    def register(self, name, alias=None):
+        """Adds a task name, or changes the display name of an existing one.
+
+        Args:
+            name (str): Task name as it appears in scripts and tasks
+            alias (str): Name shown on the VSM, defaults to the name itself
+        """
+        with self._lock:
+            if name not in self.names:
+                self.names.append(name)
+            self.aliases[name] = alias if alias is not None else name
+
+    def unregister(self, name):
+        """Removes a task name added with register.
+
+        Args:
+            name (str): Task name to remove
+        """
+        with self._lock:
+            if name in self.names:
+                self.names.remove(name)
+            self.aliases.pop(name, None)
+
+    def alias(self, name, default="Default"):
+        """Returns the display name for a task name."""
+        return self.aliases.get(name, default)
+
+    def matcher(self):
+        """Returns the compiled matcher for the current task names."""
+        return compile_matcher(self.names)
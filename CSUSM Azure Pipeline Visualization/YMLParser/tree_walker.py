@@ -0,0 +1,290 @@
+"""Single pass traversal of a parsed pipeline YML.
+
+walk_pipeline visits every stage, job and step once and hands each node to a
+list of visitors, so several searches share one traversal instead of each
+walking the whole tree again.
+"""
+from YMLParser import task_matcher
+
+
+class PipelineVisitor:
+    """Base class for visitors passed to walk_pipeline.
+
+    Hooks are called in document order: enter_stage, then the stage's jobs
+    (enter_job, visit_step for each step, leave_job), then the stage's own
+    steps, then leave_stage. Root level jobs and steps follow the same pattern
+    with stage set to None, and finish is called last with the whole document.
+
+    Attributes:
+        done: Set to True once the visitor needs no more nodes
+    """
+
+    done = False
+
+    def enter_stage(self, stage):
+        pass
+
+    def leave_stage(self, stage):
+        pass
+
+    def enter_job(self, job, stage):
+        pass
+
+    def leave_job(self, job, stage):
+        pass
+
+    def visit_step(self, step):
+        pass
+
+    def finish(self, params):
+        pass
+
+
+def walk_pipeline(params, visitors):
+    """Walks the stages, jobs and steps of a pipeline once.
+
+    The walk ends early when every visitor is done.
+
+    Args:
+        params (dict): A dictionary of parameters from the YAML config file.
+        visitors (list): PipelineVisitor objects to call for each node.
+    """
+    if not params or not isinstance(params, dict):
+        return
+
+    visitors = list(visitors)
+
+    def call(hook, *args):
+        # Returns True once there's nothing left to visit for
+        remaining = False
+        for visitor in visitors:
+            if not visitor.done:
+                getattr(visitor, hook)(*args)
+                remaining = remaining or not visitor.done
+        return not remaining
+
+    def walk_job(job, stage):
+        if call("enter_job", job, stage):
+            return True
+        if "steps" in job:
+            for step in job["steps"]:
+                if call("visit_step", step):
+                    return True
+        return call("leave_job", job, stage)
+
+    if "stages" in params:
+        for stage in params["stages"]:
+            if call("enter_stage", stage):
+                return
+            if "jobs" in stage:
+                for job in stage["jobs"]:
+                    if walk_job(job, stage):
+                        return
+            if "steps" in stage:
+                for step in stage["steps"]:
+                    if call("visit_step", step):
+                        return
+            if call("leave_stage", stage):
+                return
+
+    if "jobs" in params:
+        for job in params["jobs"]:
+            if walk_job(job, None):
+                return
+
+    if "steps" in params:
+        for step in params["steps"]:
+            if call("visit_step", step):
+                return
+
+    call("finish", params)
+
+
+def _task_value(node, key):
+    # Tasks written as a mapping can carry the key themselves
+    if "task" in node and isinstance(node["task"], dict) and key in node["task"]:
+        return True, node["task"][key]
+    return False, None
+
+
+class FirstMatchVisitor(PipelineVisitor):
+    """Finds the first value stored under a key, see deep_search_single.
+
+    Stages and jobs are checked before their children, a step before its
+    task, and the task of a stage or root level job after its children.
+
+    Attributes:
+        key: The key to look for
+        value: The value found, None until then
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.value = None
+
+    def _found(self, value):
+        self.value = value
+        self.done = True
+
+    def enter_stage(self, stage):
+        if self.key in stage:
+            self._found(stage[self.key])
+
+    def leave_stage(self, stage):
+        found, value = _task_value(stage, self.key)
+        if found:
+            self._found(value)
+
+    def enter_job(self, job, stage):
+        if self.key in job:
+            self._found(job[self.key])
+
+    def leave_job(self, job, stage):
+        if stage is None:
+            found, value = _task_value(job, self.key)
+            if found:
+                self._found(value)
+
+    def visit_step(self, step):
+        if self.key in step:
+            self._found(step[self.key])
+            return
+        found, value = _task_value(step, self.key)
+        if found:
+            self._found(value)
+
+    def finish(self, params):
+        found, value = _task_value(params, self.key)
+        if found:
+            self._found(value)
+
+
+class KeywordVisitor(PipelineVisitor):
+    """Collects every hit of a list of keywords, see deep_search_multi.
+
+    A keyword hits when it is a key of a node, appears in a task name, or
+    appears in a script regardless of case. Hits are kept in document order,
+    and in keyword order within a node.
+
+    Attributes:
+        keys: The keywords to look for
+        results: The keywords hit so far, once per hit
+    """
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self._lowered = [key.lower() for key in self.keys]
+        self._matcher = task_matcher.compile_matcher(self.keys)
+        self.results = []
+
+    def _add(self, key):
+        self.results.append(key)
+        print("Appending " + key + " to results")
+
+    def _check_script(self, script_content):
+        for key in self._matcher.find(script_content):
+            self._add(key)
+
+    def enter_stage(self, stage):
+        for key in self.keys:
+            if key in stage:
+                self._add(key)
+        if "script" in stage:
+            self._check_script(stage["script"])
+        if "task" in stage:
+            for key in self.keys:
+                if key in stage["task"]:
+                    self._add(key)
+
+    def enter_job(self, job, stage):
+        for key in self.keys:
+            if key in job:
+                self._add(key)
+
+    def visit_step(self, step):
+        has_task = "task" in step
+        has_script = "script" in step
+        script = step["script"] if has_script else None
+        # Every keyword in the script, found in one pass of the matcher
+        script_hits = self._matcher.found_patterns(script) if isinstance(script, str) else None
+        for key, key_lower in zip(self.keys, self._lowered):
+            if key in step:
+                self._add(key)
+            # A task that doesn't name the keyword still lets the script be checked
+            if has_task and key in step["task"]:
+                self._add(key)
+            elif script_hits is not None and key_lower in script_hits:
+                self._add(key)
+
+    def finish(self, params):
+        if "task" in params:
+            for key in self.keys:
+                if key in params["task"]:
+                    self._add(key)
+        elif "script" in params:
+            self._check_script(params["script"])
+
+
+class TemplateReferenceVisitor(PipelineVisitor):
+    """Collects every "template:" reference, including extends.
+
+    Attributes:
+        references: The template references in document order
+    """
+
+    def __init__(self):
+        self.references = []
+
+    def _check(self, node):
+        if isinstance(node, dict) and isinstance(node.get("template"), str):
+            self.references.append(node["template"])
+
+    def enter_stage(self, stage):
+        self._check(stage)
+
+    def enter_job(self, job, stage):
+        self._check(job)
+
+    def visit_step(self, step):
+        self._check(step)
+
+    def finish(self, params):
+        self._check(params.get("extends"))
+
+
+def template_references(params):
+    """Lists the template references of a pipeline.
+
+    Args:
+        params (dict): A dictionary of parameters from the YAML config file.
+
+    Returns:
+        list: The "template:" values of stages, jobs, steps and extends
+    """
+    visitor = TemplateReferenceVisitor()
+    walk_pipeline(params, [visitor])
+    return visitor.references
+
+
+def scan_pipeline(params, keys):
+    """Collects everything createPipeline needs from a pipeline in one walk.
+
+    Args:
+        params (dict): A dictionary of parameters from the YAML config file.
+        keys (list): Task and language keywords to look for.
+
+    Returns:
+        dict: The first "pool" and "publish" values, the template references
+            under "templates" and the keyword hits under "tasks".
+    """
+    pool = FirstMatchVisitor("pool")
+    templates = TemplateReferenceVisitor()
+    publish = FirstMatchVisitor("publish")
+    tasks = KeywordVisitor(keys)
+    walk_pipeline(params, [pool, templates, publish, tasks])
+    return {
+        "pool": pool.value,
+        "templates": templates.references,
+        "publish": publish.value,
+        "tasks": tasks.results,
+    }
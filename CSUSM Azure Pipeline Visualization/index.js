@@ -96,6 +96,50 @@ function makeDraggable(evt) {
     };
   }
 
+  /**
+   * @name findCard
+   * @description Find the card at one end of a line by the card id the line
+   * carries. VSMs made before lines carried it are searched instead, for the
+   * card with a line starting where this one does
+   * @param {Element} line 
+   * @param {string} attribute "data-source" or "data-target"
+   * @param {string} prefix "post_" or "pre_", where the card id is in line ids
+   * @returns {Element}
+   */
+  function findCard(line, attribute, prefix) {
+    const card = document.getElementById(line.getAttribute(attribute));
+    if (card) return card;
+
+    const rects = document.getElementsByTagName('rect');
+    const lines = document.getElementsByTagName('line');
+    for (let j = 0; j < rects.length; j++) {
+      for (let k = 0; k < lines.length; k++) {
+        if (lines[k].id.includes(prefix + rects[j].id) && lines[k].id.includes("SegmentA") &&
+            lines[k].getAttributeNS(null, "x1") === line.getAttributeNS(null, "x1") &&
+            lines[k].getAttributeNS(null, "y1") === line.getAttributeNS(null, "y1")) {
+          return rects[j];
+        }
+      }
+    }
+    return null;
+  }
+
+  /**
+   * @name isLineOf
+   * @description Whether a line starts or ends at a card, by the card id the
+   * line carries. VSMs made before lines carried it are matched on the line id
+   * @param {Element} line 
+   * @param {string} attribute "data-source" or "data-target"
+   * @param {string} prefix "post_" or "pre_", where the card id is in line ids
+   * @param {Element} card 
+   * @returns {boolean}
+   */
+  function isLineOf(line, attribute, prefix, card) {
+    const cardId = line.getAttribute(attribute);
+    if (cardId !== null) return cardId === card.id;
+    return line.id.includes(prefix + card.id);
+  }
+
   /**
    * @name handlePreLines
    * @description Handles the drag animations for lines connected
@@ -114,38 +158,19 @@ function makeDraggable(evt) {
 
     // Grab all lines connected to left side of selectedElement
     for (let i = 0; i < lines.length; i++) {
-      // If line is connected to selectedElement on left side (Pre_rect_x_y)
-      if (lines[i].id.includes("pre_" + selectedElement.id)) {
+      // If line ends at selectedElement, on its left side
+      if (isLineOf(lines[i], "data-target", "pre_", selectedElement)) {
         // Track seg a & b
-        if (lines[i].id.includes("SegmentA")) {
+        if (lines[i].id.endsWith("-SegmentA")) {
           connectedLinesA.push(lines[i]);
-        } else if (lines[i].id.includes("SegmentB")) {
+        } else if (lines[i].id.endsWith("-SegmentB")) {
           connectedLinesB.push(lines[i]);
         }
       }
     }
     
     for (let i = 0; i < connectedLinesA.length; i++) {
-      // Find source element by checking all rects and their post lines
-      let sourceElement = null;
-      const rects = document.getElementsByTagName('rect');
-      for (let j = 0; j < rects.length; j++) {
-        const rect = rects[j];
-        const rectLines = document.getElementsByTagName('line');
-        
-        // Check each line connected to this rect's post side
-        for (let k = 0; k < rectLines.length; k++) {
-          if (rectLines[k].id.includes("post_" + rect.id) && rectLines[k].id.includes("SegmentA")) {
-            // Compare coordinates with current line
-            if (rectLines[k].getAttributeNS(null, "x1") === connectedLinesA[i].getAttributeNS(null, "x1") &&
-                rectLines[k].getAttributeNS(null, "y1") === connectedLinesA[i].getAttributeNS(null, "y1")) {
-              sourceElement = rect;
-              break;
-            }
-          }
-        }
-        if (sourceElement) break;
-      }
+      let sourceElement = findCard(connectedLinesA[i], "data-source", "post_");
       sourceX = parseFloat(sourceElement.getAttributeNS(null, "x"));
       sourceY = parseFloat(sourceElement.getAttributeNS(null, "y"));
 
@@ -192,26 +217,7 @@ function makeDraggable(evt) {
       var ax;
       var ay;
 
-      // Find source element by checking all rects and their post lines
-      let sourceElement = null;
-      const rects = document.getElementsByTagName('rect');
-      for (let j = 0; j < rects.length; j++) {
-        const rect = rects[j];
-        const rectLines = document.getElementsByTagName('line');
-        
-        // Check each line connected to this rect's post side
-        for (let k = 0; k < rectLines.length; k++) {
-          if (rectLines[k].id.includes("post_" + rect.id) && rectLines[k].id.includes("SegmentA")) {
-            // Compare coordinates with current line
-            if (rectLines[k].getAttributeNS(null, "x1") === connectedLinesA[i].getAttributeNS(null, "x1") &&
-                rectLines[k].getAttributeNS(null, "y1") === connectedLinesA[i].getAttributeNS(null, "y1")) {
-              sourceElement = rect;
-              break;
-            }
-          }
-        }
-        if (sourceElement) break;
-      }
+      let sourceElement = findCard(connectedLinesA[i], "data-source", "post_");
       sourceX = parseFloat(sourceElement.getAttributeNS(null, "x"));
       sourceY = parseFloat(sourceElement.getAttributeNS(null, "y"));
 
@@ -222,34 +228,40 @@ function makeDraggable(evt) {
         connectedLinesB[i].setAttributeNS(null, "x2", parseFloat(selectedElement.getAttributeNS(null, "x")))
         connectedLinesB[i].setAttributeNS(null, "y2", parseFloat(selectedElement.getAttributeNS(null, "y")) + OFFSET_SEGMENT_Y)
 
-        //position and rotate arrowhead
-        arrow.setAttributeNS(null, "x", parseFloat(selectedElement.getAttributeNS(null, "x")) - 21);
-        arrow.setAttributeNS(null, "y", parseFloat(selectedElement.getAttributeNS(null, "y")) + OFFSET_SEGMENT_Y - 12);
-        ax = parseFloat(arrow.getAttributeNS(null, "x"));
-        ay = parseFloat(arrow.getAttributeNS(null, "y"));
-        arrow.setAttribute("transform", `rotate(0 ${ax} ${ay})`);
+        //position and rotate arrowhead, lines drawn with a marker have none
+        if (arrow) {
+          arrow.setAttributeNS(null, "x", parseFloat(selectedElement.getAttributeNS(null, "x")) - 21);
+          arrow.setAttributeNS(null, "y", parseFloat(selectedElement.getAttributeNS(null, "y")) + OFFSET_SEGMENT_Y - 12);
+          ax = parseFloat(arrow.getAttributeNS(null, "x"));
+          ay = parseFloat(arrow.getAttributeNS(null, "y"));
+          arrow.setAttribute("transform", `rotate(0 ${ax} ${ay})`);
+        }
       } else if (parseFloat(selectedElement.getAttributeNS(null, "y")) > sourceY) {
         // line ends on top of selected element
         connectedLinesB[i].setAttributeNS(null, "x2", parseFloat(selectedElement.getAttributeNS(null, "x")) + OFFSET_BOTTOM_X)
         connectedLinesB[i].setAttributeNS(null, "y2", parseFloat(selectedElement.getAttributeNS(null, "y")))
         
-        //position and rotate arrowhead
-        arrow.setAttributeNS(null, "x", parseFloat(selectedElement.getAttributeNS(null, "x")) + OFFSET_BOTTOM_X + 12);
-        arrow.setAttributeNS(null, "y", parseFloat(selectedElement.getAttributeNS(null, "y")) - 21);
-        ax = parseFloat(arrow.getAttributeNS(null, "x"));
-        ay = parseFloat(arrow.getAttributeNS(null, "y"));
-        arrow.setAttribute("transform", `rotate(90 ${ax} ${ay})`);
+        //position and rotate arrowhead, lines drawn with a marker have none
+        if (arrow) {
+          arrow.setAttributeNS(null, "x", parseFloat(selectedElement.getAttributeNS(null, "x")) + OFFSET_BOTTOM_X + 12);
+          arrow.setAttributeNS(null, "y", parseFloat(selectedElement.getAttributeNS(null, "y")) - 21);
+          ax = parseFloat(arrow.getAttributeNS(null, "x"));
+          ay = parseFloat(arrow.getAttributeNS(null, "y"));
+          arrow.setAttribute("transform", `rotate(90 ${ax} ${ay})`);
+        }
       } else {
         // line ends below selected element
         connectedLinesB[i].setAttributeNS(null, "x2", parseFloat(selectedElement.getAttributeNS(null, "x")) + OFFSET_BOTTOM_X);
         connectedLinesB[i].setAttributeNS(null, "y2", parseFloat(selectedElement.getAttributeNS(null, "y")) + OFFSET_BOTTOM_Y);
 
-        //position and rotate arrowhead
-        arrow.setAttributeNS(null, "x", parseFloat(selectedElement.getAttributeNS(null, "x")) + OFFSET_BOTTOM_X - 12);
-        arrow.setAttributeNS(null, "y", parseFloat(selectedElement.getAttributeNS(null, "y")) + OFFSET_BOTTOM_Y + 21);
-        ax = parseFloat(arrow.getAttributeNS(null, "x"));
-        ay = parseFloat(arrow.getAttributeNS(null, "y"));
-        arrow.setAttribute("transform", `rotate(270 ${ax} ${ay})`);
+        //position and rotate arrowhead, lines drawn with a marker have none
+        if (arrow) {
+          arrow.setAttributeNS(null, "x", parseFloat(selectedElement.getAttributeNS(null, "x")) + OFFSET_BOTTOM_X - 12);
+          arrow.setAttributeNS(null, "y", parseFloat(selectedElement.getAttributeNS(null, "y")) + OFFSET_BOTTOM_Y + 21);
+          ax = parseFloat(arrow.getAttributeNS(null, "x"));
+          ay = parseFloat(arrow.getAttributeNS(null, "y"));
+          arrow.setAttribute("transform", `rotate(270 ${ax} ${ay})`);
+        }
       }
     }
   }
@@ -269,38 +281,19 @@ function makeDraggable(evt) {
 
     // Grab all lines connected to right side of selectedElement
     for (let i = 0; i < lines.length; i++) {
-      // If line is connected to selectedElement on right side (post_rect_x_y)
-      if (lines[i].id.includes("post_" + selectedElement.id)) {
+      // If line starts at selectedElement, on its right side
+      if (isLineOf(lines[i], "data-source", "post_", selectedElement)) {
         // Track seg a & b
-        if (lines[i].id.includes("SegmentA")) {
+        if (lines[i].id.endsWith("-SegmentA")) {
           connectedLinesA.push(lines[i]);
-        } else if (lines[i].id.includes("SegmentB")) {
+        } else if (lines[i].id.endsWith("-SegmentB")) {
           connectedLinesB.push(lines[i]);
         }
       }
     }
 
     for (let i = 0; i < connectedLinesA.length; i++) {
-      // Find next element by checking all rects and their pre lines
-      let nextElement = null;
-      const rects = document.getElementsByTagName('rect');
-      for (let j = 0; j < rects.length; j++) {
-        const rect = rects[j];
-        const rectLines = document.getElementsByTagName('line');
-        
-        // Check each line connected to this rect's pre side
-        for (let k = 0; k < rectLines.length; k++) {
-          if (rectLines[k].id.includes("pre_" + rect.id) && rectLines[k].id.includes("SegmentA")) {
-            // Compare coordinates with current line
-            if (rectLines[k].getAttributeNS(null, "x1") === connectedLinesA[i].getAttributeNS(null, "x1") &&
-                rectLines[k].getAttributeNS(null, "y1") === connectedLinesA[i].getAttributeNS(null, "y1")) {
-                  nextElement = rect;
-              break;
-            }
-          }
-        }
-        if (nextElement) break;
-      }
+      let nextElement = findCard(connectedLinesA[i], "data-target", "pre_");
       
       handlePreLines(nextElement);
     }
@@ -377,6 +370,8 @@ function makeDraggable(evt) {
   function endDrag() {
     if (selectedElement) {
       const elementId = selectedElement.id;
+      // Name of the pipeline on the card, generate pins the card back here by it
+      const pipeline = selectedElement.getAttribute("data-pipeline");
       const x = parseInt(selectedElement.getAttributeNS(null, "x"));
       const y = parseInt(selectedElement.getAttributeNS(null, "y"));
   
@@ -386,7 +381,7 @@ function makeDraggable(evt) {
         existingElement.x = x;
         existingElement.y = y;
       } else {
-        saveData.push({ id: elementId, x, y });
+        saveData.push({ id: elementId, pipeline, x, y });
       }
     }
   
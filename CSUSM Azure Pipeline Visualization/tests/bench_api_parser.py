@@ -0,0 +1,53 @@
+"""Compares per-file requests.get against the pooled DevOps client.
+
+Run from the project directory:
+    python -m tests.bench_api_parser [latency] [handshake_latency]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from YMLParser import devops_client
+from tests.fake_devops_server import FakeDevOpsServer
+
+FILES = ["A.yml", "B.yml", "C.yml", "D.yml", "E.yml", "F.yml", "G.yml", "H.yml", "I.yml", "J.yml"]
+ROUNDS = 5
+
+
+def fetch_unpooled(url):
+    return requests.get(url, auth=("", "fake_pat")).content
+
+
+def fetch_pooled(url):
+    return devops_client.get_client().get(url).content
+
+
+def run(server, fetch, workers):
+    urls = [server.url_for(name) for name in FILES] * ROUNDS
+    start_connections = server.connections
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(fetch, urls))
+    return time.perf_counter() - start, server.connections - start_connections
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.005
+    handshake_latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+
+    with FakeDevOpsServer(latency=latency, handshake_latency=handshake_latency) as server:
+        for workers in [1, 8]:
+            for label, fetch in [("requests.get", fetch_unpooled), ("pooled client", fetch_pooled)]:
+                devops_client.reset_client()
+                elapsed, connections = run(server, fetch, workers)
+                print(
+                    f"{label:<14} workers={workers}: {len(FILES) * ROUNDS} files "
+                    f"in {elapsed:.3f}s over {connections} connections"
+                )
+    devops_client.reset_client()
+
+
+if __name__ == "__main__":
+    main()
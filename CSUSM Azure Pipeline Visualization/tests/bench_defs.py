@@ -0,0 +1,80 @@
+"""Compares the size of a VSM with shared and per-card definitions.
+
+"per card" puts a new gradient in the defs for every card and a style
+attribute on every text, the way cards used to be drawn. "shared" is what
+drawPipeline does now: one gradient per card color and one style sheet.
+Elements is the number of XML elements in the file.
+
+Run from the project directory:
+    python -m tests.bench_defs [pipelines]
+"""
+import contextlib
+import os
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from unittest.mock import patch
+
+import VSMWizard.main as VSMWizard
+from VSMWizard import svg_defs
+from tests.bench_layout import generated_pipelines
+
+PIPELINE_COUNT = 2000
+TASKS = ["python", "powershell", "npm", "artifact"]
+
+
+def per_card_gradient(canvas, name, stops, start=(0, 0), end=(0, 1)):
+    gradient = canvas.linearGradient(start, end)
+    for offset, color in stops:
+        gradient.add_stop_color(offset, color)
+    canvas.defs.add(gradient)
+    return gradient
+
+
+def inline_styles(element):
+    # Texts get their class rule as a style attribute instead
+    for child in getattr(element, "elements", []):
+        inline_styles(child)
+    if getattr(element, "elementname", None) != "text":
+        return
+    draggable, rule = element.attribs["class"].split(" ")
+    element.attribs["class"] = draggable
+    element.attribs["style"] = VSMWizard.CONST_STYLES[rule]
+
+
+def render(count, fileName, shared):
+    pipelines = generated_pipelines(count)
+    for pipeline in pipelines:
+        pipeline.setTrigger("At 03:00 PM, only on Friday")
+        for task in TASKS:
+            pipeline.addTask(task)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        vsm = VSMWizard.createDrawing(fileName, VSMWizard.CONST_RENDERER_SVGWRITE)
+        if shared:
+            VSMWizard.addPipelinesToVSM(vsm, pipelines, VSMWizard.CONST_LAYOUT_LAYERED)
+        else:
+            with patch.object(svg_defs, "linear_gradient", per_card_gradient):
+                VSMWizard.addPipelinesToVSM(vsm, pipelines, VSMWizard.CONST_LAYOUT_LAYERED)
+            inline_styles(vsm)
+        VSMWizard.resizeSVG(vsm).save()
+
+    size = os.path.getsize(fileName)
+    elements = sum(1 for _ in ET.parse(fileName).iter())
+    return size, elements
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else PIPELINE_COUNT
+    with tempfile.TemporaryDirectory() as directory:
+        fileName = os.path.join(directory, "vsm.svg")
+        old_size, old_elements = render(count, fileName, shared=False)
+        new_size, new_elements = render(count, fileName, shared=True)
+    print(f"{count} pipelines")
+    print(f"  per card {old_size / 1024:9.1f} KB  {old_elements:7} elements")
+    print(f"  shared   {new_size / 1024:9.1f} KB  {new_elements:7} elements")
+    print(f"  saved    {(old_size - new_size) / old_size:9.1%}     {old_elements - new_elements:7} elements")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Measures what the dependency lines add to a VSM.
+
+Counts the XML elements drawn for the lines between cards (segments,
+arrowheads and anything inside them, like animations) and the size of the
+file, for the stream renderer.
+
+Run from the project directory:
+    python -m tests.bench_edges [pipelines]
+"""
+import contextlib
+import os
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+
+import VSMWizard.main as VSMWizard
+from tests.bench_layout import generated_pipelines
+
+PIPELINE_COUNT = 2000
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+def render(count, fileName):
+    pipelines = generated_pipelines(count)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        vsm = VSMWizard.createDrawing(fileName, VSMWizard.CONST_RENDERER_STREAM)
+        VSMWizard.addPipelinesToVSM(vsm, pipelines, VSMWizard.CONST_LAYOUT_LAYERED)
+        VSMWizard.resizeSVG(vsm).save()
+        vsm.close()
+
+    edges = sum(len(pipeline.getDependencies()) for pipeline in pipelines)
+    root = ET.parse(fileName).getroot()
+    drawn = 0
+    for element in root.iter():
+        if element.get("id", "").startswith("post_"):
+            drawn += sum(1 for _ in element.iter())
+    animations = sum(1 for _ in root.iter(SVG + "animate"))
+    elements = sum(1 for _ in root.iter())
+    return edges, drawn, animations, elements, os.path.getsize(fileName)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else PIPELINE_COUNT
+    with tempfile.TemporaryDirectory() as directory:
+        edges, drawn, animations, elements, size = render(count, os.path.join(directory, "vsm.svg"))
+    print(f"{count} pipelines, {edges} dependency lines")
+    print(f"  line elements {drawn:7}  ({drawn / edges:.1f} per line)")
+    print(f"  animations    {animations:7}")
+    print(f"  elements      {elements:7}")
+    print(f"  file          {size / 1024:9.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Times the layered layout on generated dependency graphs.
+
+Each pipeline depends on up to three earlier pipelines near it in the config,
+the shape of chains of builds that fan out and back in. The incremental
+layout is timed on the smallest graph only, it grows much faster than the
+layered one. Crossings are counted between neighbouring columns, before and
+after the ordering sweeps.
+
+Run from the project directory:
+    python -m tests.bench_layout [nodes ...]
+"""
+import contextlib
+import io
+import random
+import sys
+import time
+
+import svgwrite
+
+import VSMWizard.main as VSMWizard
+from VSMWizard import layout
+from YMLParser.parser import DependencyRef, Pipeline
+
+NODE_COUNTS = [1000, 10000]
+INCREMENTAL_NODES = 200
+
+
+def generated_pipelines(count, seed=7):
+    rng = random.Random(seed)
+    pipelines = []
+    for i in range(count):
+        pipeline = Pipeline()
+        pipeline.setName(f"pipeline_{i}")
+        pipeline.setOrigin(f"pipeline_{i}.yml")
+        if i > 0 and rng.random() < 0.9:
+            for _ in range(rng.randint(1, 3)):
+                pipeline.addDependency(DependencyRef(f"pipeline_{rng.randint(max(0, i - 30), i - 1)}"))
+        pipelines.append(pipeline)
+    return pipelines
+
+
+def time_layered(count):
+    pipelines = generated_pipelines(count)
+    edges = layout.dependency_edges(pipelines)
+
+    start = time.perf_counter()
+    layers = layout.assign_layers(len(pipelines), edges)
+    layered = time.perf_counter()
+    columns, after = layout.order_layers(layers, edges)
+    ordered = time.perf_counter()
+    layout.assign_coordinates(
+        columns, edges, layers, VSMWizard.CONST_PIPELINE_WIDTH, VSMWizard.CONST_PIPELINE_HEIGHT
+    )
+    placed = time.perf_counter()
+
+    # Config order, before any sweep
+    _, before = layout.order_layers(layers, edges, sweeps=0)
+
+    print(
+        f"{count:>6} pipelines {len(edges):>6} edges  layers {(layered - start) * 1000:7.1f} ms  "
+        f"ordering {(ordered - layered) * 1000:8.1f} ms  coordinates {(placed - ordered) * 1000:6.1f} ms  "
+        f"crossings {before} -> {after}"
+    )
+
+
+def time_incremental(count):
+    pipelines = generated_pipelines(count)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        VSMWizard.addPipelinesToVSM(svgwrite.Drawing(), pipelines, VSMWizard.CONST_LAYOUT_INCREMENTAL)
+        incremental = time.perf_counter() - start
+
+    pipelines = generated_pipelines(count)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        VSMWizard.addPipelinesToVSM(svgwrite.Drawing(), pipelines, VSMWizard.CONST_LAYOUT_LAYERED)
+        layered = time.perf_counter() - start
+
+    print(f"{count:>6} pipelines drawn  incremental {incremental * 1000:8.1f} ms  layered {layered * 1000:8.1f} ms")
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or NODE_COUNTS
+    for count in counts:
+        time_layered(count)
+    time_incremental(INCREMENTAL_NODES)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Times moving every card of a VSM to a saved position.
+
+"patch" is svg_patch.move_cards, which maps the document in one pass and
+applies the moves in another. "search" is how update_vsm used to do it: a
+search of the whole tree for each card, then a scan of every group for its
+parent, then a regular expression over every id. It grows with the square of
+the card count, so it is only timed up to SEARCH_CARDS cards.
+
+"tree" and "file" patch the saved VSM file from start to finish, with
+svg_patch.patch_tree and ElementTree.write or with svg_patch.patch_file, and
+are shown with their peak memory, traced in a second run.
+
+Run from the project directory:
+    python -m tests.bench_patch [cards ...]
+"""
+import contextlib
+import copy
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+import VSMWizard.main as VSMWizard
+from VSMWizard import element_ids
+from VSMWizard import svg_patch
+from tests.bench_layout import generated_pipelines
+
+CARD_COUNTS = [1000, 5000]
+SEARCH_CARDS = 5000
+NS = {"svg": "http://www.w3.org/2000/svg"}
+
+
+def render(count, fileName):
+    pipelines = generated_pipelines(count)
+    vsm = VSMWizard.createDrawing(fileName, VSMWizard.CONST_RENDERER_STREAM)
+    VSMWizard.addPipelinesToVSM(vsm, pipelines, VSMWizard.CONST_LAYOUT_LAYERED)
+    VSMWizard.addIdIndex(vsm)
+    VSMWizard.resizeSVG(vsm).save()
+    vsm.close()
+    # Every card moves down and to the right
+    return [
+        {"id": element_ids.card_id(p.getName()), "x": p.getX() + 37, "y": p.getY() + 23}
+        for p in pipelines
+    ]
+
+
+def search(root, positions):
+    groups = root.findall(".//{http://www.w3.org/2000/svg}g")
+    for item in positions:
+        element = root.find(f".//*[@id='{item['id']}']", NS)
+        parent_group = None
+        for group in groups:
+            if element in list(group):
+                parent_group = group
+                break
+        svg_patch.move_group(parent_group, element, int(item["x"]), int(item["y"]))
+    for elem in root.findall(".//*[@id]", NS):
+        re.match(r"(post_(rect_\d+_\d+))_(pre_(rect_\d+_\d+))(.*)", elem.get("id"))
+
+
+def patch(root, positions):
+    index = element_ids.read_index(root)
+    svg_patch.move_cards(root, positions, index)
+    element_ids.write_index(root, index)
+
+
+def timed(move, tree, positions):
+    root = copy.deepcopy(tree.getroot())
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        move(root, positions)
+        return time.perf_counter() - start
+
+
+def patch_tree(fileName, output, positions):
+    tree = ET.parse(fileName)
+    svg_patch.patch_tree(tree, positions)
+    tree.write(output)
+
+
+def traced(move, fileName, positions):
+    output = fileName + ".out"
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        move(fileName, output, copy.deepcopy(positions))
+        elapsed = time.perf_counter() - start
+        # Tracing slows it down, so it is timed without
+        tracemalloc.start()
+        move(fileName, output, copy.deepcopy(positions))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return f"{elapsed * 1000:9.1f} ms {peak / 2**20:7.1f} MiB"
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or CARD_COUNTS
+    with tempfile.TemporaryDirectory() as directory:
+        for count in counts:
+            fileName = os.path.join(directory, "vsm.svg")
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                positions = render(count, fileName)
+            tree = ET.parse(fileName)
+            elements = sum(1 for _ in tree.getroot().iter())
+
+            line = f"{count:>6} cards moved, {elements} elements  patch {timed(patch, tree, positions) * 1000:9.1f} ms"
+            if count <= SEARCH_CARDS:
+                line += f"  search {timed(search, tree, positions) * 1000:9.1f} ms"
+            print(line)
+            size = os.path.getsize(fileName) / 2**20
+            print(
+                f"{'':>6} {size:.1f} MiB file  tree {traced(patch_tree, fileName, positions)}"
+                f"  file {traced(svg_patch.patch_file, fileName, positions)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
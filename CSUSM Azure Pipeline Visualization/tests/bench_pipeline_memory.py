@@ -0,0 +1,102 @@
+"""Compares the memory used by the old and the slotted Pipeline model.
+
+LegacyPipeline is a copy of Pipeline before it was slotted: a __dict__ per
+instance, five lists created up front, and a stub Pipeline per dependency.
+
+Run from the project directory:
+    python -m tests.bench_pipeline_memory [pipelines]
+"""
+import sys
+import tracemalloc
+
+from YMLParser.parser import DependencyRef, Pipeline
+
+TASKS = ["Python", "npm", "Powershell", ".NET"]
+OPERATING_SYSTEMS = ["ubuntu-latest", "windows-latest", "macos-latest"]
+
+
+class LegacyPipeline:
+    def __init__(self):
+        self._name = None
+        self._os = None
+        self._trigger = None
+        self._languages = []
+        self._tasks = []
+        self._jobs = []
+        self._artifacts = []
+        self._origin = None
+        self.dependencies = []
+        self._x = 0
+        self._y = 0
+
+    def setName(self, name):
+        self._name = name
+
+    def setOS(self, os):
+        self._os = os
+
+    def addTask(self, task):
+        self._tasks.append(task)
+
+    def setTrigger(self, trigger):
+        self._trigger = trigger
+
+    def addArtifact(self, artifact):
+        self._artifacts.append(artifact)
+
+    def setOrigin(self, origin):
+        self._origin = origin
+
+    def addDependency(self, dependency):
+        self.dependencies.append(dependency)
+
+
+def fresh(text):
+    # Parsed YML hands out a new string object per occurrence, mimic that
+    return "".join(list(text))
+
+
+def build(count, pipeline_class, make_dependency):
+    pipelines = []
+    for i in range(count):
+        pipeline = pipeline_class()
+        pipeline.setName(f"pipeline_{i}")
+        pipeline.setOS(fresh(OPERATING_SYSTEMS[i % len(OPERATING_SYSTEMS)]))
+        pipeline.setTrigger("main")
+        pipeline.setOrigin(f"tests/input/pipeline_{i}.yml")
+        for task in TASKS[: 1 + i % len(TASKS)]:
+            pipeline.addTask(fresh(task))
+        pipeline.addArtifact(None)
+        if i > 0:
+            pipeline.addDependency(make_dependency(f"pipeline_{i - 1}"))
+        pipelines.append(pipeline)
+    return pipelines
+
+
+def legacy_dependency(name):
+    dependent = LegacyPipeline()
+    dependent.setName(name)
+    return dependent
+
+
+def measure(count, pipeline_class, make_dependency):
+    tracemalloc.start()
+    pipelines = build(count, pipeline_class, make_dependency)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del pipelines
+    return current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    old = measure(count, LegacyPipeline, legacy_dependency)
+    new = measure(count, Pipeline, DependencyRef)
+    print(f"{count} pipelines")
+    print(f"  legacy model   {old / 2**20:8.2f} MiB  ({old / count:6.0f} bytes each)")
+    print(f"  slotted model  {new / 2**20:8.2f} MiB  ({new / count:6.0f} bytes each)")
+    print(f"  saved          {(old - new) / old:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Times regenerating a hand-arranged VSM against drawing it fresh.
+
+"fresh" lays out and draws every pipeline. "pinned" draws the same map with
+every card pinned to a saved position, the way generate does with a
+positions file. "mixed" pins nine cards out of ten and lays out the rest
+around them, like new pipelines added to an arranged map. Every run ends
+with the saved SVG, there is no patching pass afterwards.
+
+Run from the project directory:
+    python -m tests.bench_positions [pipelines]
+"""
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+import VSMWizard.main as VSMWizard
+from VSMWizard import element_ids
+from tests.bench_layout import generated_pipelines
+
+PIPELINE_COUNT = 1000
+# How far the saved cards are from where the layout put them
+MOVED_BY = 37
+
+
+def render(count, layoutMode, fileName, positions=None):
+    pipelines = generated_pipelines(count)
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        vsm = VSMWizard.createDrawing(fileName, VSMWizard.CONST_RENDERER_SVGWRITE)
+        VSMWizard.addPipelinesToVSM(vsm, pipelines, layoutMode, positions)
+        VSMWizard.resizeSVG(vsm).save()
+    elapsed = time.perf_counter() - start
+    # The ids the cards were drawn with, numbered for names that are shared
+    return elapsed, pipelines, element_ids.assign_cards(vsm, pipelines)
+
+
+def check_pinned(pipelines, cards, saved):
+    """Fails when a card with a saved position was drawn somewhere else."""
+    misplaced = [
+        cards[p] for p in pipelines if cards[p] in saved and (p.getX(), p.getY()) != saved[cards[p]]
+    ]
+    pinned = sum(1 for p in pipelines if cards[p] in saved)
+    if pinned != len(saved) or misplaced:
+        raise AssertionError(
+            f"{pinned} of {len(saved)} saved cards pinned, {len(misplaced)} not at their saved spot"
+        )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else PIPELINE_COUNT
+    with tempfile.TemporaryDirectory() as directory:
+        fileName = os.path.join(directory, "vsm.svg")
+        for layoutMode in [VSMWizard.CONST_LAYOUT_LAYERED, VSMWizard.CONST_LAYOUT_INCREMENTAL]:
+            fresh, pipelines, cards = render(count, layoutMode, fileName)
+            saved = {cards[p]: (p.getX() + MOVED_BY, p.getY() + MOVED_BY) for p in pipelines}
+            pinned, pipelines, cards = render(count, layoutMode, fileName, saved)
+            check_pinned(pipelines, cards, saved)
+            some = {cardId: xy for i, (cardId, xy) in enumerate(saved.items()) if i % 10}
+            mixed, pipelines, cards = render(count, layoutMode, fileName, some)
+            check_pinned(pipelines, cards, some)
+            print(
+                f"{count} pipelines  {layoutMode:<11}  fresh {fresh * 1000:8.1f} ms  "
+                f"pinned {pinned * 1000:8.1f} ms  mixed {mixed * 1000:8.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Times drawing and saving a VSM with each renderer.
+
+"svgwrite" builds the whole svgwrite tree and serializes it on save, "stream"
+writes every pipeline out as soon as it is drawn. Peak memory is what
+tracemalloc saw while making the pipelines, drawing and saving.
+
+Run from the project directory:
+    python -m tests.bench_renderer [pipelines ...]
+"""
+import contextlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import VSMWizard.main as VSMWizard
+from tests.bench_layout import generated_pipelines
+
+PIPELINE_COUNTS = [100, 500]
+TASKS = ["python", "powershell", "powershell", "npm", "node", "dotnet", "java", "artifact"]
+
+
+def render(count, renderer, fileName):
+    pipelines = generated_pipelines(count)
+    for pipeline in pipelines:
+        pipeline.setTrigger("At 03:00 PM, only on Friday")
+        for task in TASKS:
+            pipeline.addTask(task)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        vsm = VSMWizard.createDrawing(fileName, renderer)
+        VSMWizard.addPipelinesToVSM(vsm, pipelines, VSMWizard.CONST_LAYOUT_LAYERED)
+        VSMWizard.addSaveButton(vsm)
+        vsm = VSMWizard.resizeSVG(vsm)
+        vsm.save()
+
+
+def timed(count, renderer, fileName):
+    start = time.perf_counter()
+    render(count, renderer, fileName)
+    elapsed = time.perf_counter() - start
+
+    # Tracing slows everything down, so memory is measured on a second run
+    tracemalloc.start()
+    render(count, renderer, fileName)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or PIPELINE_COUNTS
+    with tempfile.TemporaryDirectory() as directory:
+        for count in counts:
+            sizes = []
+            for renderer in [VSMWizard.CONST_RENDERER_SVGWRITE, VSMWizard.CONST_RENDERER_STREAM]:
+                fileName = os.path.join(directory, f"{renderer}.svg")
+                elapsed, peak = timed(count, renderer, fileName)
+                sizes.append(os.path.getsize(fileName))
+                print(
+                    f"{count:>6} pipelines  {renderer:<8}  {elapsed * 1000:8.1f} ms  "
+                    f"peak {peak / 1024 / 1024:7.1f} MB  file {sizes[-1] / 1024:8.1f} KB"
+                )
+            assert sizes[0] == sizes[1]
+
+
+if __name__ == "__main__":
+    main()
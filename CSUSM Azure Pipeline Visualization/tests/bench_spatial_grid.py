@@ -0,0 +1,83 @@
+"""Times the collision checks of addPipelinesToVSM.
+
+"scan" is what the layout used to do: compare against every pipeline for
+each pixel or card height moved down. "grid" asks a SpatialGrid instead.
+
+Run from the project directory:
+    python -m tests.bench_spatial_grid
+"""
+import time
+
+from VSMWizard.spatial_grid import SpatialGrid
+
+WIDTH = 300
+HEIGHT = 100
+CARD_COUNTS = [100, 500, 1000]
+
+
+def stacked_corners(count):
+    # Every card in one of a few columns, all starting on the same row
+    return [[50 + (i % 4) * (WIDTH + 50), 50] for i in range(count)]
+
+
+def scan_nudge(corners):
+    for index in range(len(corners)):
+        x, y = corners[index]
+        while any(i != index and corners[i][0] == x and corners[i][1] == y for i in range(len(corners))):
+            y += 1
+        corners[index][1] = y
+
+
+def grid_nudge(corners):
+    grid = SpatialGrid(1, 1)
+    for index, (x, y) in enumerate(corners):
+        grid.insert(index, x, y, 0, 0)
+    for index in range(len(corners)):
+        x, y = corners[index]
+        y = grid.next_free_y(x, y, 0, 0, 1, exclude=index)
+        grid.insert(index, x, y, 0, 0)
+        corners[index][1] = y
+
+
+def column(count):
+    return [(50, 50 + i * (HEIGHT + 50)) for i in range(count)]
+
+
+def scan_free_slot(cards):
+    y = 50
+    while any(50 <= x + WIDTH and x <= 50 + WIDTH and y <= top + HEIGHT and top <= y + HEIGHT for x, top in cards):
+        y += HEIGHT + 50
+    return y
+
+
+def grid_free_slot(cards):
+    grid = SpatialGrid(WIDTH + 50, HEIGHT + 50)
+    for index, (x, y) in enumerate(cards):
+        grid.insert(index, x, y, WIDTH, HEIGHT)
+    return grid.next_free_y(50, 50, WIDTH, HEIGHT, HEIGHT + 50)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    for count in CARD_COUNTS:
+        old_corners = stacked_corners(count)
+        new_corners = stacked_corners(count)
+        old, _ = timed(scan_nudge, old_corners)
+        new, _ = timed(grid_nudge, new_corners)
+        assert old_corners == new_corners
+        print(f"{count:>5} stacked cards  scan {old * 1000:9.2f} ms  grid {new * 1000:7.2f} ms  speedup {old / new:6.1f}x")
+
+        cards = column(count)
+        old, old_y = timed(scan_free_slot, cards)
+        new, new_y = timed(grid_free_slot, cards)
+        assert old_y == new_y
+        print(f"{count:>5} card column    scan {old * 1000:9.2f} ms  grid {new * 1000:7.2f} ms  speedup {old / new:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Compares per-keyword script checks against the compiled TaskMatcher.
+
+"per keyword" is the check deep_search_multi used to do: lowercase the script
+and the keyword and test for a substring, once for every keyword.
+
+Run from the project directory:
+    python -m tests.bench_task_matcher
+"""
+import time
+
+from YMLParser.parser import TASK_NAMES_IGNORE_CASE
+from YMLParser.task_matcher import compile_matcher
+
+SCRIPT_LINES = [1, 10, 100, 1000]
+ROUNDS = 2000
+
+
+def per_keyword(script, keys):
+    return [key for key in keys if key.lower() in script.lower()]
+
+
+def synthetic_script(lines):
+    body = "\n".join(
+        f"echo step {i} && ./configure --prefix=/opt/build{i} && make -j8 install" for i in range(lines)
+    )
+    return body + "\npip install -r requirements.txt && python -m pytest"
+
+
+def best_time(function, *args):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        function(*args)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main():
+    keys = list(TASK_NAMES_IGNORE_CASE)
+    matcher = compile_matcher(keys)
+    for lines in SCRIPT_LINES:
+        script = synthetic_script(lines)
+        assert per_keyword(script, keys) == matcher.find(script)
+        old = best_time(per_keyword, script, keys)
+        new = best_time(matcher.find, script)
+        print(
+            f"{lines:>5} script lines  per keyword {old * 1e6:9.1f} us  "
+            f"TaskMatcher {new * 1e6:9.1f} us  speedup {old / new:4.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Times the pipeline scan createPipeline does on pipelines with many steps.
+
+"separate searches" is what createPipeline used to do: deep_search_single for
+pool, template and publish, then deep_search_multi for the task keywords.
+"scan_pipeline" collects all four in one walk, every template reference in
+place of the first one.
+
+Run from the project directory:
+    python -m tests.bench_tree_walker
+"""
+import contextlib
+import io
+import time
+
+from YMLParser.parser import TASK_NAMES_IGNORE_CASE, deep_search_multi, deep_search_single
+from YMLParser.tree_walker import scan_pipeline
+
+STEP_COUNTS = [1000, 5000, 20000]
+ROUNDS = 3
+
+
+def synthetic_pipeline(step_count, steps_per_job=20, jobs_per_stage=10):
+    """Builds a parsed pipeline with step_count steps and no pool or template."""
+    stages = []
+    made = 0
+    while made < step_count:
+        jobs = []
+        for j in range(jobs_per_stage):
+            steps = []
+            for _ in range(min(steps_per_job, step_count - made)):
+                if made % 4 == 0:
+                    steps.append({"task": "PythonScript@0", "displayName": f"Step {made}"})
+                else:
+                    steps.append({"script": f"echo building step {made} && npm run build", "displayName": f"Step {made}"})
+                made += 1
+            jobs.append({"job": f"Job_{len(stages)}_{j}", "steps": steps})
+            if made >= step_count:
+                break
+        stages.append({"stage": f"Stage_{len(stages)}", "jobs": jobs})
+    return {"trigger": ["main"], "stages": stages}
+
+
+def separate_searches(params):
+    return (
+        deep_search_single(params, "pool"),
+        deep_search_single(params, "template"),
+        deep_search_single(params, "publish"),
+        deep_search_multi(params, TASK_NAMES_IGNORE_CASE),
+    )
+
+
+def single_scan(params):
+    return scan_pipeline(params, TASK_NAMES_IGNORE_CASE)
+
+
+def best_time(function, params):
+    best = None
+    for _ in range(ROUNDS):
+        # The searches print every hit, keep that out of the timing output
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function(params)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    for step_count in STEP_COUNTS:
+        params = synthetic_pipeline(step_count)
+        separate = best_time(separate_searches, params)
+        single = best_time(single_scan, params)
+        print(
+            f"{step_count:>6} steps  separate searches {separate * 1000:8.2f} ms  "
+            f"scan_pipeline {single * 1000:8.2f} ms  speedup {separate / single:4.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
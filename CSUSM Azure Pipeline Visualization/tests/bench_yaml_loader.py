@@ -0,0 +1,78 @@
+"""Compares PyYAML's pure Python SafeLoader against the loader the parser uses.
+
+Run from the project directory:
+    python -m tests.bench_yaml_loader [stages] [jobs] [steps]
+"""
+import os
+import sys
+import time
+
+import yaml
+
+from YMLParser import parser
+from tests.fake_devops_server import INPUT_DIR
+
+ROUNDS = 5
+
+
+def synthetic_pipeline(stages, jobs, steps):
+    """Builds the text of a multi-stage pipeline with stages*jobs*steps steps."""
+    lines = ["trigger:", "  - main", "stages:"]
+    for s in range(stages):
+        lines += [f"  - stage: Stage_{s}", "    jobs:"]
+        for j in range(jobs):
+            lines += [
+                f"      - job: Job_{s}_{j}",
+                "        pool:",
+                "          vmImage: ubuntu-latest",
+                "        steps:",
+            ]
+            for k in range(steps):
+                lines += [
+                    f"          - script: python build.py --stage {s} --job {j} --step {k}",
+                    f"            displayName: Step {k}",
+                ]
+    return "\n".join(lines) + "\n"
+
+
+def time_loader(texts, loader):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for text in texts:
+            yaml.load(text, Loader=loader)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def report(label, texts):
+    pure = time_loader(texts, yaml.SafeLoader)
+    fast = time_loader(texts, parser.SAFE_LOADER)
+    size = sum(len(text) for text in texts)
+    print(
+        f"{label:<28} {size / 1024:9.1f} KiB  SafeLoader {pure * 1000:9.2f} ms  "
+        f"{parser.SAFE_LOADER.__name__} {fast * 1000:9.2f} ms  speedup {pure / fast:5.1f}x"
+    )
+
+
+def main():
+    stages = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    steps = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    if not parser.LIBYAML_LOADER:
+        print("PyYAML was built without libyaml, both columns use the pure Python loader")
+
+    texts = []
+    for folder, _, files in os.walk(INPUT_DIR):
+        for name in files:
+            if name.endswith((".yml", ".yaml")):
+                with open(os.path.join(folder, name)) as f:
+                    texts.append(f.read())
+    report(f"tests/input ({len(texts)} files)", texts)
+
+    for scale in [0.1, 0.5, 1]:
+        s, j, k = max(1, int(stages * scale)), max(1, int(jobs * scale)), steps
+        report(f"synthetic {s}x{j}x{k} steps", [synthetic_pipeline(s, j, k)])
+
+
+if __name__ == "__main__":
+    main()
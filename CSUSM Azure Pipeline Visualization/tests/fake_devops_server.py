@@ -0,0 +1,175 @@
+"""Local stand-in for the Azure DevOps file API.
+
+Serves the YML files under tests/input over HTTP/1.1 keep-alive so the
+apiParser can be exercised (and benchmarked) without a network connection.
+Responses carry an ETag and Last-Modified, and conditional requests for an
+unchanged file get a 304.
+
+Example:
+    with FakeDevOpsServer(latency=0.05) as server:
+        parse_yml_file(["A", server.url_for("A.yml")])
+"""
+import gzip
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "input")
+
+
+class _FakeDevOpsHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connection open between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        stats = self.server.stats
+        with stats["lock"]:
+            stats["connections"] += 1
+        # Stand-in for the TCP + TLS handshake of a real connection
+        time.sleep(self.server.handshake_latency)
+
+    def do_GET(self):
+        stats = self.server.stats
+        with stats["lock"]:
+            stats["requests"] += 1
+            stats["auth_headers"].append(self.headers.get("Authorization"))
+
+        time.sleep(self.server.latency)
+
+        relative_path = self.path.split("?")[0].lstrip("/")
+        file_path = os.path.normpath(os.path.join(self.server.root, relative_path))
+        if not file_path.startswith(self.server.root) or not os.path.isfile(file_path):
+            self._send(404, b"Not found")
+            return
+
+        with open(file_path, "rb") as f:
+            body = f.read()
+
+        etag = '"' + hashlib.sha256(body).hexdigest() + '"'
+        last_modified = formatdate(os.path.getmtime(file_path), usegmt=True)
+        validators = {"ETag": etag, "Last-Modified": last_modified}
+        if self._not_modified(etag, file_path):
+            with stats["lock"]:
+                stats["not_modified"] += 1
+            self._send(304, b"", validators)
+            return
+
+        headers = {"Content-Type": "text/plain; charset=utf-8", **validators}
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+            with stats["lock"]:
+                stats["gzip_responses"] += 1
+        self._send(200, body, headers)
+
+    def _not_modified(self, etag, file_path):
+        if not self.server.conditional:
+            return False
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return if_none_match == etag
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(os.path.getmtime(file_path)) <= since
+        return False
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep test output quiet
+        pass
+
+
+class FakeDevOpsServer:
+    """Threaded HTTP server that serves YML files from a directory.
+
+    Attributes:
+        root: Directory the files are served from
+        latency: Seconds added to every request
+        handshake_latency: Seconds added to every new connection
+        conditional: Answer If-None-Match/If-Modified-Since with 304s
+    """
+
+    def __init__(self, root=INPUT_DIR, latency=0.0, handshake_latency=0.0, conditional=True):
+        self.root = os.path.abspath(root)
+        self.latency = latency
+        self.handshake_latency = handshake_latency
+        self.conditional = conditional
+        self._httpd = None
+        self._thread = None
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FakeDevOpsHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.root = self.root
+        self._httpd.latency = self.latency
+        self._httpd.handshake_latency = self.handshake_latency
+        self._httpd.conditional = self.conditional
+        self._httpd.stats = {
+            "lock": threading.Lock(),
+            "connections": 0,
+            "requests": 0,
+            "gzip_responses": 0,
+            "not_modified": 0,
+            "auth_headers": [],
+        }
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for(self, relative_path):
+        return f"{self.base_url}/{relative_path.replace(os.sep, '/')}"
+
+    @property
+    def connections(self):
+        return self._httpd.stats["connections"]
+
+    @property
+    def requests(self):
+        return self._httpd.stats["requests"]
+
+    @property
+    def gzip_responses(self):
+        return self._httpd.stats["gzip_responses"]
+
+    @property
+    def not_modified(self):
+        return self._httpd.stats["not_modified"]
+
+    @property
+    def auth_headers(self):
+        return list(self._httpd.stats["auth_headers"])
@@ -2,6 +2,8 @@ import unittest
 import svgwrite
 from VSMWizard.main import addSaveButton, sortPipelines
 from collections import defaultdict, deque
+import random
+from YMLParser.parser import DependencyRef, Pipeline
 
 class TestAddSaveButton(unittest.TestCase):
     def test_add_save_button(self):
@@ -80,7 +82,81 @@ class TestSortPipelines(unittest.TestCase):
         pipelineD = MockPipeline("PipelineD", dependencies=[pipelineB, pipelineC])
         pipelines = [pipelineD, pipelineC, pipelineB, pipelineA]
         sortPipelines(pipelines)
-        self.assertEqual([p.getName() for p in pipelines], ["PipelineA", "PipelineB", "PipelineC", "PipelineD"])
+        # B and C are both ready after A, config order puts C first
+        self.assertEqual([p.getName() for p in pipelines], ["PipelineA", "PipelineC", "PipelineB", "PipelineD"])
+
+    def test_sort_siblings_in_config_order(self):
+        pipelineA = MockPipeline("PipelineA")
+        pipelineB = MockPipeline("PipelineB", dependencies=[pipelineA])
+        pipelineC = MockPipeline("PipelineC", dependencies=[pipelineA])
+        pipelines = [pipelineA, pipelineC, pipelineB]
+        sortPipelines(pipelines)
+        self.assertEqual([p.getName() for p in pipelines], ["PipelineA", "PipelineC", "PipelineB"])
+
+    def test_sort_keeps_chains_together(self):
+        pipelineA = MockPipeline("PipelineA")
+        pipelineX = MockPipeline("PipelineX")
+        pipelineB = MockPipeline("PipelineB", dependencies=[pipelineA])
+        pipelineY = MockPipeline("PipelineY", dependencies=[pipelineX])
+        pipelines = [pipelineA, pipelineX, pipelineY, pipelineB]
+        sortPipelines(pipelines)
+        # Each root is followed by everything that depends on it
+        self.assertEqual(
+            [p.getName() for p in pipelines], ["PipelineA", "PipelineB", "PipelineX", "PipelineY"]
+        )
+
+    def test_sort_matches_names_ignoring_case(self):
+        pipelineA = MockPipeline("PipelineA")
+        pipelineB = MockPipeline("PipelineB", dependencies=[MockPipeline("pipelinea")])
+        pipelines = [pipelineB, pipelineA]
+        sortPipelines(pipelines)
+        self.assertEqual([p.getName() for p in pipelines], ["PipelineA", "PipelineB"])
+
+    def test_sort_groups_and_flags_cycles(self):
+        pipelines = [Pipeline() for _ in range(5)]
+        for pipeline, name in zip(pipelines, ["Start", "Loop1", "Other", "Loop2", "End"]):
+            pipeline.setName(name)
+        pipelines[1].addDependency(DependencyRef("Start"))
+        pipelines[1].addDependency(DependencyRef("Loop2"))
+        pipelines[3].addDependency(DependencyRef("Loop1"))
+        pipelines[4].addDependency(DependencyRef("Loop2"))
+        sortPipelines(pipelines)
+        self.assertEqual([p.getName() for p in pipelines], ["Start", "Loop1", "Loop2", "End", "Other"])
+        self.assertEqual([p.getCycle() for p in pipelines], [None, 0, 0, None, None])
+
+    def test_sort_large_graph(self):
+        # 10k pipelines and 50k dependencies, with a few loops mixed in
+        rng = random.Random(15)
+        count = 10000
+        pipelines = []
+        for i in range(count):
+            pipeline = Pipeline()
+            pipeline.setName(f"pipeline_{i}")
+            pipelines.append(pipeline)
+        edges = set()
+        while len(edges) < 50000:
+            target = rng.randrange(1, count)
+            edges.add((rng.randrange(target), target))
+        for source in range(0, count - 10, 1000):
+            edges.add((source + 10, source))
+        for source, target in edges:
+            pipelines[target].addDependency(DependencyRef(f"pipeline_{source}"))
+        rng.shuffle(pipelines)
+
+        sortPipelines(pipelines)
+
+        position = {p.getName(): i for i, p in enumerate(pipelines)}
+        cycle = {p.getName(): p.getCycle() for p in pipelines}
+        self.assertEqual(len(position), count)
+        for source, target in edges:
+            sourceName, targetName = f"pipeline_{source}", f"pipeline_{target}"
+            if cycle[sourceName] is None or cycle[sourceName] != cycle[targetName]:
+                self.assertLess(position[sourceName], position[targetName])
+        # Every loop is in one block
+        for number in set(cycle.values()) - {None}:
+            members = sorted(position[name] for name, c in cycle.items() if c == number)
+            self.assertEqual(members, list(range(members[0], members[0] + len(members))))
+        self.assertTrue(any(c is not None for c in cycle.values()))
 
 class TestHandleDuplicateTasksAdditionalCounter(unittest.TestCase):
     def test_additional_tasks_counter(self):
@@ -3,6 +3,7 @@ import unittest
 from unittest.mock import patch, MagicMock
 import tkinter as tk
 from VSMWizard.menu_gui import MenuGUI
+from VSMWizard import element_ids
 import xml.etree.ElementTree as ET
 import json
 
@@ -156,46 +157,30 @@ class TestMenuGUI(unittest.TestCase):
     @patch('VSMWizard.menu_gui.filedialog.askopenfilename')
     @patch('VSMWizard.menu_gui.webbrowser.open')
     @patch('VSMWizard.menu_gui.ET.parse')
-    def test_update_vsm(self, mock_et_parse, mock_webbrowser_open, mock_askopenfilename):
+    def test_update_vsm_reroutes_lines(self, mock_et_parse, mock_webbrowser_open, mock_askopenfilename):
         # Mock file selection dialogs
         mock_askopenfilename.side_effect = [
             'test.svg',  # First call for SVG file
             'positions.json'  # Second call for JSON file
         ]
 
+        # A card in its group and a line out of it, as generate draws them
+        card = element_ids.card_id("Build")
+        other = element_ids.card_id("Deploy")
+        line = element_ids.edge_id(card, other)
+        svg = f"""<svg xmlns="http://www.w3.org/2000/svg">
+            <g><rect id="{card}" data-pipeline="Build" x="50" y="50" width="300" height="100"/></g>
+            <g><rect id="{other}" data-pipeline="Deploy" x="150" y="150" width="300" height="100"/></g>
+            <line id="{line}-SegmentA" data-source="{card}" data-target="{other}" x1="350" y1="100.0" x2="120" y2="300"/>
+            <line id="{line}-SegmentB" data-source="{card}" data-target="{other}" x1="120" y1="300" x2="150" y2="200.0"/>
+        </svg>"""
+        tree = ET.ElementTree(ET.fromstring(svg))
+        mock_et_parse.return_value = tree
         # Mock JSON data
         test_json_data = [
-            {"id": "rect_50_50", "x": "100", "y": "100"},
-            {"id": "rect_150_150", "x": "200", "y": "200"}
+            {"id": card, "x": "100", "y": "100"},
+            {"id": "card_missing", "x": "200", "y": "200"}
         ]
-        
-        # Mock XML elements and tree
-        mock_root = MagicMock()
-        mock_tree = MagicMock()
-        mock_tree.getroot.return_value = mock_root
-        mock_et_parse.return_value = mock_tree
-        
-        # Mock element finding with proper attribute returns
-        mock_element = MagicMock()
-        mock_element.attrib = {'id': 'post_rect_50_50_pre_rect_150_150'}
-        mock_element.get.side_effect = lambda attr: {
-            'id': 'post_rect_50_50_pre_rect_150_150',
-            'x': '50',
-            'y': '50'
-        }.get(attr)
-        mock_element.set = MagicMock()
-        
-        # Mock findall to return elements with proper attributes
-        mock_root.findall.return_value = [mock_element]
-        mock_root.find.return_value = mock_element
-
-        # Mock groups finding
-        mock_group = MagicMock()
-        mock_group.findall.return_value = [mock_element]
-        mock_root.findall.side_effect = lambda path, ns=None: {
-            ".//{http://www.w3.org/2000/svg}g": [mock_group],
-            ".//*[@id]": [mock_element]
-        }.get(path, [])
 
         # Mock open for JSON file reading
         with patch('builtins.open', unittest.mock.mock_open(read_data=str(test_json_data))), \
@@ -210,13 +195,18 @@ class TestMenuGUI(unittest.TestCase):
             # Verify SVG was parsed
             mock_et_parse.assert_called_once_with('test.svg')
             
-            # Verify element positions were updated
-            # Check that x and y coordinates were updated
-            mock_element.set.assert_any_call('x', '100')
-            mock_element.set.assert_any_call('y', '100')
-            # Check that ID was updated with new coordinates
-            mock_element.set.assert_any_call('id', 'rect_100_100')
-            
+            # Verify element positions were updated, the id stays the same
+            root = tree.getroot()
+            rect = root.find(f".//*[@id='{card}']")
+            self.assertEqual((rect.get("x"), rect.get("y")), ("100", "100"))
+
+            # The line follows the card it starts at, now above and left of the
+            # card it points to, so it leaves the bottom and comes in on top
+            segment_a = root.find(f".//*[@id='{line}-SegmentA']")
+            self.assertEqual((segment_a.get("x1"), segment_a.get("y1")), ("250.0", "200"))
+            segment_b = root.find(f".//*[@id='{line}-SegmentB']")
+            self.assertEqual((segment_b.get("x2"), segment_b.get("y2")), ("300.0", "150"))
+
             # Verify the updated SVG was opened in browser
             mock_webbrowser_open.assert_called_once()
             expected_path = 'file://' + os.path.join('/test', 'test_updated.svg')
@@ -362,7 +352,8 @@ class TestMenuGUI(unittest.TestCase):
         rect = group.find(".//{http://www.w3.org/2000/svg}rect")
         self.assertEqual(rect.get("x"), "150")
         self.assertEqual(rect.get("y"), "150")
-        self.assertEqual(rect.get("id"), "rect_150_150")
+        # The card was renamed after the pipeline on its link, and keeps that id when moved
+        self.assertEqual(rect.get("id"), element_ids.card_id("Link Text"))
 
         # Test text movement inside group
         text = group.find(".//{http://www.w3.org/2000/svg}text")
@@ -381,7 +372,7 @@ class TestMenuGUI(unittest.TestCase):
         self.assertEqual(anchor_text.get("y"), "175")
 
         # Test standalone rectangle
-        standalone_rect = root.find(".//*[@id='rect_250_250']")
+        standalone_rect = root.find(".//*[@id='rect_200_200']")
         self.assertEqual(standalone_rect.get("x"), "250")
         self.assertEqual(standalone_rect.get("y"), "250")
 
@@ -389,19 +380,33 @@ class TestMenuGUI(unittest.TestCase):
         # Instead of using contains(), we'll iterate through all paths
         path = None
         for element in root.findall(".//{http://www.w3.org/2000/svg}path"):
-            if "post_rect" in element.get("id", ""):
+            if "post_" in element.get("id", ""):
                 path = element
                 break
             
-        expected_id = "post_rect_150_150_pre_rect_250_250_arrow"
+        expected_id = element_ids.edge_id(element_ids.card_id("Link Text"), "rect_200_200") + "_arrow"
         self.assertIsNotNone(path, "Path element not found")
         self.assertEqual(path.get("id"), expected_id)
 
+        # The index has the card where it was moved to
+        index = element_ids.read_index(root)
+        self.assertEqual(
+            index["cards"][element_ids.card_id("Link Text")],
+            {"pipeline": "Link Text", "x": 150, "y": 150},
+        )
+
         # Clean up test files
         os.remove('test.svg')
         os.remove('test.json')
         os.remove('test_updated.svg')
 
+        # The save file is written again with the new card id and its pipeline
+        with open('test_updated.json') as f:
+            saved = json.load(f)
+        os.remove('test_updated.json')
+        self.assertEqual(saved[0], {"id": element_ids.card_id("Link Text"), "x": 150, "y": 150, "pipeline": "Link Text"})
+        self.assertEqual(saved[1], {"id": "rect_200_200", "x": 250, "y": 250})
+
         # Verify browser was called to open the file
         mock_webbrowser.assert_called_once()
 
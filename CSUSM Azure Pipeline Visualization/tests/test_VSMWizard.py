@@ -2,10 +2,25 @@ import pytest
 import VSMWizard.main as VSMWizard
 from YMLParser import parser
 from YMLParser.parser import Pipeline
+from VSMWizard.spatial_grid import SpatialGrid
+from VSMWizard import layout
+from VSMWizard import dependency_graph
+from VSMWizard.pipeline_index import PipelineIndex
+from VSMWizard import svg_stream
+from VSMWizard import svg_defs
+from VSMWizard import svg_bounds
+from VSMWizard import element_ids
+from VSMWizard import edge_route
+from VSMWizard import svg_patch
 import svgwrite
 from unittest.mock import patch, MagicMock, mock_open
+import copy
 import os
+import json
+import threading
+import time
 import unittest
+import xml.etree.ElementTree as ET
 
 
 @pytest.mark.xfail(reason="Not implemented")
@@ -30,6 +45,54 @@ def test_drawLine():
     assert line.attribs["stroke"] == "black"
 
 
+@pytest.mark.parametrize(
+    "canvas", [svgwrite.Drawing(), svg_stream.StreamingDrawing()], ids=["svgwrite", "stream"]
+)
+def test_drawEdge(canvas):
+    first = VSMWizard.drawEdge(canvas, (0, 50), (100, 50), "a-SegmentA", "rect_0_0", "rect_100_0")
+    second = VSMWizard.drawEdge(
+        canvas, (100, 50), (130, 50), "a-SegmentB", "rect_0_0", "rect_100_0", arrowhead=True
+    )
+
+    # Styled and looked up through attributes, no animation or image per line
+    assert first.attribs["class"] == "edge"
+    assert first.attribs["data-source"] == "rect_0_0"
+    assert first.attribs["data-target"] == "rect_100_0"
+    assert "marker-end" not in first.attribs
+    assert second.attribs["marker-end"] == "url(#arrowhead)"
+    assert first.elements == [] and second.elements == []
+
+    defs = canvas.defs.tostring()
+    assert defs.count("<marker") == 1
+    assert 'id="arrowhead"' in defs
+    # The highlight rule comes last so it wins over the edge rule
+    assert defs.index(".edge{") < defs.index(".highlight{")
+    assert 'data-source="rect_0_0"' in canvas.tostring()
+
+
+def test_connectDependencies_draws_two_segments_per_dependency():
+    canvas = svgwrite.Drawing()
+    source = Pipeline()
+    source.setName("A")
+    dependent = Pipeline()
+    dependent.setName("B")
+    dependent.setX(400)
+    dependent.addDependency(source)
+
+    VSMWizard.connectDependencies(canvas, canvas.g(), [source, dependent], 1)
+
+    lineID = element_ids.edge_id(element_ids.card_id("A"), element_ids.card_id("B"))
+    assert [e.attribs["id"] for e in canvas.elements if e.elementname == "line"] == [
+        lineID + "-SegmentA",
+        lineID + "-SegmentB",
+    ]
+    assert element_ids.index(canvas)["edges"] == {
+        lineID: {"source": element_ids.card_id("A"), "target": element_ids.card_id("B")}
+    }
+    assert "<animate" not in canvas.tostring()
+    assert "<use" not in canvas.tostring()
+
+
 def test_drawText():
     text = VSMWizard.drawText(
         svgwrite.Drawing(), svgwrite.container.Group(), 0, 1, "test"
@@ -137,6 +200,35 @@ def test_drawPipeline():
     assert resultElement.attribs["y"] == "150"
 
 
+def test_drawPipeline_outlines_cycles():
+    testPipeline = Pipeline()
+    testPipeline.setName("Loop")
+    assert testPipeline.getCycle() is None
+    plain = VSMWizard.drawPipeline(svgwrite.Drawing(), 100, 100, testPipeline).elements[0]
+    assert "stroke" not in plain.attribs
+
+    testPipeline.setCycle(0)
+    rect = VSMWizard.drawPipeline(svgwrite.Drawing(), 100, 100, testPipeline).elements[0]
+
+    assert rect.attribs["stroke"] == VSMWizard.CONST_CYCLE_STROKE
+    assert rect.attribs["class"] == "draggable cycle"
+
+
+def test_strongly_connected_components():
+    # 0 -> 1 -> 2 -> 0 is a loop, 3 hangs off it and 4 points at itself
+    successors = [[1], [2], [0, 3], [], [4]]
+
+    components = dependency_graph.strongly_connected_components(successors)
+
+    assert sorted(sorted(c) for c in components) == [[0, 1, 2], [3], [4]]
+    # A component comes after the ones it points at
+    assert components.index([3]) < [sorted(c) for c in components].index([0, 1, 2])
+
+    groups, loops = dependency_graph.dependency_order([0, 1, 2, 3, 4], [(0, 1), (1, 2), (2, 0), (2, 3), (4, 4)])
+    assert groups == [[0, 1, 2], [3], [4]]
+    assert loops == [True, False, True]
+
+
 def test_getIconPath():
     supportedIcons = [
         "python",
@@ -207,15 +299,17 @@ def test_insertLangIcon_a():
     testPipeline = Pipeline()
     testPipeline.setOS("windows-latest")
     # testing for a box created at x=0 x=1 on the canvas
-    pipeline = VSMWizard.drawPipeline(svgwrite.Drawing(), 0, 1, testPipeline)
+    canvas = svgwrite.Drawing()
+    pipeline = VSMWizard.drawPipeline(canvas, 0, 1, testPipeline)
     # Assert it is returning the right object
     assert pipeline.__class__ == svgwrite.container.Group
     # Grabbing all of the elements of the pipeline and then going to check the properties of the icon
     icon = pipeline.elements[len(pipeline.elements) - 1]
-    # Aseert the function returns a svgwrite.image.Image object
-    assert icon.__class__ == svgwrite.image.Image
+    # Assert the icon places the image defined in the defs
+    assert icon.__class__ == svgwrite.container.Use
+    assert icon.attribs["xlink:href"] == "#icon_windows"
     # Assert the image is the correct image
-    assert icon.attribs["xlink:href"] == "resources\\windows.png"
+    assert 'xlink:href="resources\\windows.png"' in canvas.defs.tostring()
     # Assert the image has the correct coordinates relative to the box
     # TODO: replace hard-coded 265,6 with OS x,y offsets
     assert icon.attribs["x"] == 265
@@ -232,15 +326,17 @@ def test_insertLangIcon_b():
     testPipeline = Pipeline()
     testPipeline.setOS("macOS-latest")
     # Testing for a box created at x=100 and y=100
-    pipeline = VSMWizard.drawPipeline(svgwrite.Drawing(), 100, 100, testPipeline)
+    canvas = svgwrite.Drawing()
+    pipeline = VSMWizard.drawPipeline(canvas, 100, 100, testPipeline)
     # Assert it is returning the right object
     assert pipeline.__class__ == svgwrite.container.Group
     # Grabbing all of the elements of the pipeline and then going to check the properties of the icon
     icon = pipeline.elements[len(pipeline.elements) - 1]
-    # Aseert the function returns a svgwrite.image.Image object
-    assert icon.__class__ == svgwrite.image.Image
+    # Assert the icon places the image defined in the defs
+    assert icon.__class__ == svgwrite.container.Use
+    assert icon.attribs["xlink:href"] == "#icon_macOS"
     # Assert the image is the correct image
-    assert icon.attribs["xlink:href"] == "resources\\macOS.png"
+    assert 'xlink:href="resources\\macOS.png"' in canvas.defs.tostring()
     # Assert the image has the correct coordinates relative to the box
     # TODO: replace hard-coded 365,105 with OS x,y offsets
     assert icon.attribs["x"] == 365
@@ -260,10 +356,10 @@ def test_artifactIcon():
 
     # Find icon in pipeline
     for element in pipeline.elements:
-        if element.__class__ == svgwrite.image.Image:
+        if element.__class__ == svgwrite.container.Use:
             icon = element
 
-    assert icon.attribs["xlink:href"] == "resources\\macOS.png"
+    assert icon.attribs["xlink:href"] == "#icon_macOS"
 
     assert icon.attribs["x"] == 365
     assert icon.attribs["y"] == 105
@@ -272,6 +368,38 @@ def test_artifactIcon():
     assert icon.attribs["height"] == 30
 
 
+def test_useIcon_defines_each_image_once():
+    canvas = svgwrite.Drawing()
+    container = canvas.g()
+    first = VSMWizard.useIcon(canvas, container, "resources\\python.png", 10, 20, 30, 30, "python")
+    second = VSMWizard.useIcon(canvas, container, "resources\\python.png", 50, 20, 30, 30)
+
+    assert first.attribs["xlink:href"] == second.attribs["xlink:href"] == "#icon_python"
+    assert first.attribs["class"] == "draggable"
+    assert canvas.defs.tostring().count("<symbol") == 1
+    assert canvas.defs.tostring().count("<image") == 1
+    assert "<title>python</title>" in first.tostring()
+
+
+def test_useIcon_embedded(tmp_path):
+    iconPath = tmp_path / "python.png"
+    iconPath.write_bytes(b"\x89PNG icon")
+    canvas = svgwrite.Drawing()
+    svg_defs.embed_images(canvas)
+    VSMWizard.useIcon(canvas, canvas.g(), str(iconPath), 0, 0, 30, 30)
+
+    assert 'xlink:href="data:image/png;base64,iVBORyBpY29u"' in canvas.defs.tostring()
+
+
+def test_useIcon_embedded_missing_file_links_instead(capsys):
+    canvas = svgwrite.Drawing()
+    svg_defs.embed_images(canvas)
+    VSMWizard.useIcon(canvas, canvas.g(), "resources\\missing.png", 0, 0, 30, 30)
+
+    assert "Could not embed resources\\missing.png" in capsys.readouterr().out
+    assert 'xlink:href="resources\\missing.png"' in canvas.defs.tostring()
+
+
 @pytest.mark.xfail(reason="Not implemented")
 def test_main():
     assert 4 == 3
@@ -528,46 +656,247 @@ def test_syncDependencyCoordinates_with_sibling_dependencies():
             assert len(pipeline.getDependencies()) == 0
 
 
-def test_drawDummyPipeline_collisionWithExistingPipelines():
+def test_pipelineIndex_ignores_case():
+    pipelines = layeredPipelines(["Build", "Deploy"], {"Deploy": ["BUILD"]})
+    index = PipelineIndex(pipelines)
+
+    assert "build" in index
+    assert "Missing" not in index
+    assert index.get("bUiLd") is pipelines[0]
+    assert index.position("deploy") == 1
+    assert index.get("Missing") is None
+    assert index.dependents("build") == [pipelines[1]]
+
+
+def test_pipelineIndex_last_match_before_position():
+    pipelines = layeredPipelines(["A", "B", "a"], {})
+    index = PipelineIndex(pipelines)
+
+    # Repeated names resolve to the last one, like the old scans over the list
+    assert index.get("A") is pipelines[2]
+    assert index.get("A", before=2) is pipelines[0]
+    assert index.get("A", before=0) is None
+
+    dummy = Pipeline()
+    dummy.setName("C")
+    assert index.add(dummy) == 3
+    assert index.get("c") is dummy
+    assert len(index) == 4
+
+
+def test_syncDependencyCoordinates_ignores_case():
+    pipelines = layeredPipelines(["Build", "Deploy"], {"Deploy": ["BUILD"]})
+    pipelines[0].setX(400)
+    pipelines[0].setY(250)
+
+    VSMWizard.syncDependencyCoordinates(pipelines)
+
+    dependency = pipelines[1].getDependencies()[0]
+    assert (dependency.getX(), dependency.getY()) == (400, 250)
+
+
+def test_checkDepenciesDrawn_only_looks_at_placed_pipelines():
+    # B depends on A, placed before it, and on C, which comes after it
+    pipelines = layeredPipelines(["A", "B", "C"], {"B": ["a", "c"]})
+    pipelines[0].setX(50)
+    pipelines[2].setX(1000)
+
+    x_coord, _ = VSMWizard.checkDepenciesDrawn(pipelines, 1)
+
+    assert x_coord == 50 + VSMWizard.CONST_PIPELINE_WIDTH + 50
+    # Nothing is drawn or added while placing
+    assert len(pipelines) == 3
+
+
+def test_resolveDependencies_adds_only_missing_pipelines():
+    # B depends on C, which comes later in the config, and on Missing
+    pipelines = layeredPipelines(["A", "B", "C", "D"], {"B": ["c", "Missing"], "D": ["missing", "A"]})
 
+    dummies = VSMWizard.resolveDependencies(pipelines)
+
+    assert [p.getName() for p in pipelines] == ["A", "Missing", "B", "C", "D"]
+    assert dummies == {pipelines[1]}
+    assert VSMWizard.isDummy(pipelines[1])
+    assert pipelines[1].getTrigger() == "Dependent pipeline Missing not found"
+    # Nothing left to resolve
+    assert VSMWizard.resolveDependencies(pipelines) == set()
+    assert len(pipelines) == 5
+
+
+def test_addPipelinesToVSM_draws_each_pipeline_once():
     canvas = svgwrite.Drawing()
-    pipelines = [Pipeline()]  # Create a list of existing pipelines
-    dependency = Pipeline()  # Create a dummy Dependency object
-    dependency.setName("test")
-    x_coord = 100
-    y_coord = 200
-    pipelines[0].setX(x_coord)
-    pipelines[0].setY(y_coord)
+    # B comes before the pipeline it depends on, and Missing isn't in the config
+    pipelines = layeredPipelines(["B", "A", "C"], {"B": ["A"], "C": ["Missing"]})
 
-    # Call the function under test
-    VSMWizard.drawDummyPipeline(canvas, pipelines, dependency, x_coord, y_coord)
+    VSMWizard.addPipelinesToVSM(canvas, pipelines)
 
-    # Assert that the dummy pipeline is drawn at a different y-coordinate
-    assert dependency.getY() != y_coord
+    svg = canvas.tostring()
+    assert svg.count('id="dummy_Missing"') == 1
+    assert svg.count("Dependent pipeline Missing not found") == 1
+    # No dummy was drawn for A even though B comes first
+    assert "Dependent pipeline A not found" not in svg
+    assert "dummy_A" not in svg
 
 
-def test_drawDummyPipeline_successfulDraw():
+def test_willCollide_card_below_does_not_collide():
+    placed = Pipeline()
+    placed.setX(100)
+    placed.setY(400)
 
-    # Arrange
+    plToDraw = Pipeline()
+    plToDraw.setX(100)
+    plToDraw.setY(100)
+
+    assert not VSMWizard.willCollide(plToDraw, [placed])
+
+
+def test_willCollide_reuses_grid():
+    placed = Pipeline()
+    placed.setX(100)
+    placed.setY(100)
+    grid = VSMWizard.placedCards([placed])
+
+    plToDraw = Pipeline()
+    plToDraw.setX(150)
+    plToDraw.setY(150)
+
+    # The pipeline list is not scanned when a grid is given
+    assert VSMWizard.willCollide(plToDraw, [], grid)
+
+
+def test_spatialGrid_overlap_and_touching_edges():
+    grid = SpatialGrid(350, 150)
+    grid.insert("a", 50, 50, 300, 100)
+
+    assert grid.overlaps(200, 100, 300, 100)
+    # Cards sharing an edge overlap
+    assert grid.overlaps(350, 50, 300, 100)
+    assert not grid.overlaps(351, 50, 300, 100)
+    assert not grid.overlaps(50, 151, 300, 100)
+    assert not grid.overlaps(50, 50, 300, 100, exclude="a")
+    assert grid.query(0, 0, 1000, 1000) == ["a"]
+
+
+def test_spatialGrid_points_match_exactly():
+    grid = SpatialGrid(350, 150)
+    grid.insert("a", 50, 50, 0, 0)
+    grid.insert("b", 50, 51, 0, 0)
+
+    assert grid.overlaps(50, 50, 0, 0)
+    assert not grid.overlaps(50, 52, 0, 0)
+    assert grid.next_free_y(50, 50, 0, 0, 1) == 52
+    assert grid.next_free_y(50, 50, 0, 0, 1, exclude="a") == 50
+
+
+def test_spatialGrid_move_and_remove():
+    grid = SpatialGrid(350, 150)
+    grid.insert("a", 50, 50, 300, 100)
+    grid.move("a", 1000, 1000)
+
+    assert not grid.overlaps(50, 50, 300, 100)
+    assert grid.overlaps(1100, 1050, 10, 10)
+
+    grid.remove("a")
+    grid.remove("a")
+    assert len(grid) == 0
+    assert not grid.overlaps(1100, 1050, 10, 10)
+
+
+def test_addPipelinesToVSM_nudges_stacked_cards():
     canvas = svgwrite.Drawing()
-    # Create singular pipeline object
-    # This object does not have a dependency, so we expect a dummy to be drawn
-    pipelines = [Pipeline()]
-    # Create singular dependency object
-    dependency = Pipeline()
-    dependency.setName("test")
-    # Set coordinates for the dependency
-    x_coord = 100
-    y_coord = 200
+    pipelines = []
+    for i in range(3):
+        pipeline = Pipeline()
+        pipeline.setName(f"Pipeline{i}")
+        pipelines.append(pipeline)
 
-    # Act
-    VSMWizard.drawDummyPipeline(canvas, pipelines, dependency, x_coord, y_coord)
+    with patch("VSMWizard.main.alignPipelineChain", return_value=0):
+        VSMWizard.addPipelinesToVSM(canvas, pipelines)
+
+    # Every card starts at 50, 50, so each one moves down past the cards still
+    # there, leaving the last one on the spot the others vacated
+    assert [(p.getX(), p.getY()) for p in pipelines] == [(50, 51), (50, 52), (50, 50)]
+
+
+def layeredPipelines(names, dependencies):
+    pipelines = []
+    for name in names:
+        pipeline = Pipeline()
+        pipeline.setName(name)
+        pipeline.setOrigin(f"{name}.yml")
+        for dependency in dependencies.get(name, []):
+            pipeline.addDependency(parser.DependencyRef(dependency))
+        pipelines.append(pipeline)
+    return pipelines
+
+
+def test_layout_longest_path_layers():
+    # D depends on A directly and through B, so it goes after B
+    pipelines = layeredPipelines(["A", "B", "C", "D"], {"B": ["a"], "C": ["A"], "D": ["A", "B"]})
+    edges = layout.dependency_edges(pipelines)
+
+    assert layout.assign_layers(len(pipelines), edges) == [0, 1, 1, 2]
+
+
+def test_layout_breaks_cycles_in_config_order():
+    edges = [(0, 1), (1, 2), (2, 1), (2, 3)]
+
+    assert layout.assign_layers(4, edges) == [0, 1, 2, 3]
+
+
+def test_layout_ordering_removes_crossings():
+    layers = [0, 0, 1, 1]
+    edges = [(0, 3), (1, 2)]
+    columns, crossings = layout.order_layers(layers, edges)
+    position = [0] * 4
+    for column in columns:
+        for row, node in enumerate(column):
+            position[node] = row
+    successors = [[3], [2], [], []]
 
-    # Assert that the dummy pipeline is drawn and added to the pipelines list
-    assert len(pipelines) == 2
-    assert pipelines[1].getName() == dependency.getName()
-    assert pipelines[1].getX() == x_coord
-    assert pipelines[1].getY() == y_coord
+    assert layout.count_crossings([[0, 1], [2, 3]], [0, 1, 0, 1], successors) == 1
+    assert layout.count_crossings(columns, position, successors) == 0
+    assert crossings == 0
+
+
+def test_layout_centres_siblings_on_dependency():
+    step = VSMWizard.CONST_PIPELINE_HEIGHT + 50
+    pipelines = layeredPipelines(["A", "B", "C", "D"], {"C": ["B"], "D": ["B"]})
+
+    layout.layout_pipelines(pipelines, VSMWizard.CONST_PIPELINE_WIDTH, VSMWizard.CONST_PIPELINE_HEIGHT)
+    coordinates = {p.getName(): (p.getX(), p.getY()) for p in pipelines}
+
+    column = 50 + VSMWizard.CONST_PIPELINE_WIDTH + 50
+    assert coordinates["A"] == (50, 50)
+    assert coordinates["B"] == (50, 50 + step)
+    assert coordinates["C"] == (column, 50 + step // 2)
+    assert coordinates["D"] == (column, 50 + step + step // 2)
+
+
+def test_addPipelinesToVSM_layered_draws_missing_dependencies():
+    canvas = svgwrite.Drawing()
+    pipelines = layeredPipelines(["A", "B"], {"B": ["A", "Missing"]})
+
+    VSMWizard.addPipelinesToVSM(canvas, pipelines, VSMWizard.CONST_LAYOUT_LAYERED)
+
+    assert [p.getName() for p in pipelines] == ["A", "Missing", "B"]
+    assert VSMWizard.isDummy(pipelines[1])
+    assert pipelines[2].getX() > pipelines[0].getX()
+    assert pipelines[2].getX() > pipelines[1].getX()
+    ids = [e.attribs.get("id") for e in canvas.elements]
+    assert "dummy_Missing" in ids
+    # One arrow per dependency
+    lines = [e for e in canvas.elements if e.elementname == "line" and e.attribs["id"].endswith("SegmentA")]
+    assert len(lines) == 2
+
+
+def test_addPipelinesToVSM_unknown_layout_mode():
+    canvas = svgwrite.Drawing()
+    pipelines = layeredPipelines(["A"], {})
+
+    VSMWizard.addPipelinesToVSM(canvas, pipelines, "spiral")
+
+    assert (pipelines[0].getX(), pipelines[0].getY()) == (50, 50)
 
 
 def test_svg_dimensions_default():
@@ -609,6 +938,47 @@ def test_svg_dimensions_expandHeight():
     assert vsm["height"] > default_height
 
 
+def test_resizeSVG_fits_off_grid_edges():
+    canvas = svgwrite.Drawing()
+    source = Pipeline()
+    source.setName("Source")
+    source.setX(400)
+    dependent = Pipeline()
+    dependent.setName("Dependent")
+    dependent.setX(100)
+    dependent.setY(10)
+    dependent.addDependency(source)
+    VSMWizard.drawPipeline(canvas, 400, 0, source)
+    VSMWizard.drawPipeline(canvas, 100, 10, dependent)
+
+    # Left of and below its dependency, the line comes in over the top of the card
+    VSMWizard.connectDependencies(canvas, canvas.g(), [source, dependent], 1)
+    box = svg_bounds.bounds(canvas)
+    assert box.min_y == 10 - 30 - VSMWizard.CONST_STROKE_WIDTH / 2
+
+    vsm = VSMWizard.resizeSVG(canvas)
+
+    # The canvas grows up to show it
+    top = -21 - VSMWizard.CONST_CANVAS_MARGIN
+    assert vsm["height"] == 3000 - top
+    assert vsm["width"] == 3000
+    assert vsm["viewBox"] == f"0 {top} 3000 {3000 - top}"
+
+
+def test_resizeSVG_fits_links_and_circles():
+    canvas = svgwrite.Drawing()
+    container = canvas.g()
+    VSMWizard.drawHyperlink(container, 2990, 20, "a" * 20, "https://dev.azure.com", drawing=canvas)
+    VSMWizard.drawCircle(canvas, container, 100, 3100, 15, "red")
+
+    vsm = VSMWizard.resizeSVG(canvas)
+
+    # Text is estimated at 8 pixels a character
+    assert vsm["width"] == 2990 + 20 * 8 + VSMWizard.CONST_CANVAS_MARGIN
+    assert vsm["height"] == 3100 + 15 + VSMWizard.CONST_CANVAS_MARGIN
+    assert vsm["viewBox"] == f"0 0 {vsm['width']} {vsm['height']}"
+
+
 def test_connectDependencies_positioning():
     # Test different pipeline positioning scenarios
     canvas = svgwrite.Drawing()
@@ -787,7 +1157,6 @@ def test_connectDependencies_positioning_logic():
 @patch('VSMWizard.main.parser.createPipeline')
 @patch('VSMWizard.main.sortPipelines')
 @patch('VSMWizard.main.addPipelinesToVSM')
-@patch('VSMWizard.main.consolidateDummies')
 @patch('VSMWizard.main.addSaveButton')
 @patch('VSMWizard.main.resizeSVG')
 @patch('os.path.islink')
@@ -795,7 +1164,7 @@ def test_connectDependencies_positioning_logic():
 @patch('svgwrite.Drawing')
 @patch('builtins.open', new_callable=mock_open, read_data='{"yml_filepath": [["pipeline1", "path1.yml"], ["pipeline2", "path2.yml"]]}')
 def test_generate_success(mock_open_file, mock_drawing, mock_symlink, mock_islink, 
-                         mock_resize, mock_add_button, mock_consolidate, 
+                         mock_resize, mock_add_button, 
                          mock_add_pipelines, mock_sort, mock_create_pipeline, 
                          mock_parse_yml):
     # Setup mocks
@@ -838,9 +1207,6 @@ def test_generate_success(mock_open_file, mock_drawing, mock_symlink, mock_islin
     # Check pipelines were added to VSM
     mock_add_pipelines.assert_called_once()
     
-    # Check dummy pipelines were consolidated
-    mock_consolidate.assert_called_once()
-    
     # Check save button was added
     mock_add_button.assert_called_once()
     
@@ -889,7 +1255,6 @@ def test_generate_yml_parse_error(mock_open, mock_create_pipeline, mock_parse_ym
     with patch('svgwrite.Drawing'), \
          patch('VSMWizard.main.sortPipelines'), \
          patch('VSMWizard.main.addPipelinesToVSM'), \
-         patch('VSMWizard.main.consolidateDummies'), \
          patch('VSMWizard.main.addSaveButton'), \
          patch('VSMWizard.main.resizeSVG'), \
          patch('os.path.islink', return_value=False), \
@@ -923,7 +1288,6 @@ def test_generate_symlink_exists(mock_open, mock_symlink, mock_remove, mock_isli
     with patch('svgwrite.Drawing'), \
          patch('VSMWizard.main.sortPipelines'), \
          patch('VSMWizard.main.addPipelinesToVSM'), \
-         patch('VSMWizard.main.consolidateDummies'), \
          patch('VSMWizard.main.addSaveButton'), \
          patch('VSMWizard.main.resizeSVG'):
         VSMWizard.generate("")
@@ -945,6 +1309,7 @@ def test_generate_custom_filename(mock_open, mock_symlink, mock_islink,
     # Setup mocks
     mock_islink.return_value = False
     mock_pipeline = MagicMock()
+    mock_pipeline.getName.return_value = "pipeline1"
     mock_create_pipeline.return_value = mock_pipeline
     mock_parse_yml.return_value = {"name": "pipeline1"}
     
@@ -952,7 +1317,6 @@ def test_generate_custom_filename(mock_open, mock_symlink, mock_islink,
     with patch('svgwrite.Drawing') as mock_drawing, \
          patch('VSMWizard.main.sortPipelines'), \
          patch('VSMWizard.main.addPipelinesToVSM'), \
-         patch('VSMWizard.main.consolidateDummies'), \
          patch('VSMWizard.main.addSaveButton'), \
          patch('VSMWizard.main.resizeSVG'):
         VSMWizard.generate("custom_name")
@@ -964,6 +1328,652 @@ def test_generate_custom_filename(mock_open, mock_symlink, mock_islink,
     mock_symlink.assert_called_once_with("custom_name.svg", "latest.svg")
 
 
+def test_ingestPipelines_preserves_config_order():
+    # Specs finish out of order, first spec is the slowest
+    delays = {"slow.yml": 0.2, "medium.yml": 0.1, "fast.yml": 0.0}
+    specs = [["slow", "slow.yml"], ["medium", "medium.yml"], ["fast", "fast.yml"]]
+
+    def fake_parse(spec):
+        time.sleep(delays[spec[1]])
+        return {"name": spec[0], "origin": spec[1]}
+
+    with patch('VSMWizard.main.parser.parse_yml_file', side_effect=fake_parse):
+        pipelines = VSMWizard.ingestPipelines(specs, max_workers=3)
+
+    assert [p.getName() for p in pipelines] == ["slow", "medium", "fast"]
+
+
+def test_ingestPipelines_runs_concurrently():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_parse(spec):
+        with lock:
+            active.append(spec)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(spec)
+        return {"name": spec[0]}
+
+    specs = [[f"pl{i}", f"pl{i}.yml"] for i in range(8)]
+    with patch('VSMWizard.main.parser.parse_yml_file', side_effect=fake_parse):
+        VSMWizard.ingestPipelines(specs, max_workers=4)
+
+    # Never more than the worker count, but more than one at a time
+    assert max(peak) <= 4
+    assert max(peak) > 1
+
+
+def test_ingestPipelines_reports_failures_as_file_errors():
+    def fake_parse(spec):
+        if spec[1] == "missing.yml":
+            return None
+        if spec[1] == "broken.yml":
+            raise RuntimeError("connection reset")
+        return {"name": spec[0], "origin": spec[1]}
+
+    specs = [["good", "good.yml"], ["missing", "missing.yml"], ["broken", "broken.yml"]]
+    with patch('VSMWizard.main.parser.parse_yml_file', side_effect=fake_parse):
+        pipelines = VSMWizard.ingestPipelines(specs, max_workers=2)
+
+    assert len(pipelines) == 3
+    assert pipelines[0].getName() == "good"
+    assert pipelines[1].getTrigger() == "File Error check config file path for: missing.yml"
+    assert pipelines[2].getTrigger() == "File Error check config file path for: broken.yml"
+
+
+@patch('VSMWizard.main.ingestPipelines')
+@patch('builtins.open', new_callable=mock_open, read_data='{"yml_filepath": [["pipeline1", "path1.yml"]], "ingest_workers": 3}')
+def test_generate_worker_count(mock_open_file, mock_ingest):
+    mock_pipeline = MagicMock()
+    mock_pipeline.getName.return_value = "pipeline1"
+    mock_ingest.return_value = [mock_pipeline]
+
+    with patch('svgwrite.Drawing'), \
+         patch('VSMWizard.main.sortPipelines'), \
+         patch('VSMWizard.main.addPipelinesToVSM'), \
+         patch('VSMWizard.main.addSaveButton'), \
+         patch('VSMWizard.main.resizeSVG'), \
+         patch('os.path.islink', return_value=False), \
+         patch('os.symlink'):
+        # Worker count comes from the config file by default
+        VSMWizard.generate("")
+        assert mock_ingest.call_args.args == ([["pipeline1", "path1.yml"]], 3)
+
+        # An explicit worker count overrides the config file
+        VSMWizard.generate("", max_workers=1)
+        assert mock_ingest.call_args.args == ([["pipeline1", "path1.yml"]], 1)
+
+
+@patch('VSMWizard.main.ingestPipelines')
+def test_generate_caches(mock_ingest, tmp_path):
+    mock_pipeline = MagicMock()
+    mock_pipeline.getName.return_value = "pipeline1"
+    caches = []
+    mock_ingest.side_effect = lambda specs, workers, templates: caches.append(
+        (VSMWizard.parse_cache.get_cache(), VSMWizard.response_cache.get_cache())
+    ) or [mock_pipeline]
+
+    cache_dir = str(tmp_path / "cache")
+    enabled = json.dumps({
+        "yml_filepath": [["pipeline1", "path1.yml"]],
+        "parse_cache_dir": cache_dir,
+        "parse_cache_max_bytes": 1024,
+        "response_cache_dir": cache_dir,
+        "offline": True,
+    })
+    disabled = json.dumps({"yml_filepath": [["pipeline1", "path1.yml"]], "parse_cache": False, "response_cache": False})
+
+    with patch('svgwrite.Drawing'), \
+         patch('VSMWizard.main.sortPipelines'), \
+         patch('VSMWizard.main.addPipelinesToVSM'), \
+         patch('VSMWizard.main.addSaveButton'), \
+         patch('VSMWizard.main.resizeSVG'), \
+         patch('os.path.islink', return_value=False), \
+         patch('os.symlink'):
+        with patch('builtins.open', mock_open(read_data=enabled)):
+            VSMWizard.generate("")
+        with patch('builtins.open', mock_open(read_data=disabled)):
+            VSMWizard.generate("")
+
+    # The caches are only active while the yml files are ingested
+    local_cache, remote_cache = caches[0]
+    assert local_cache.directory == cache_dir
+    assert local_cache.max_bytes == 1024
+    assert remote_cache.directory == cache_dir
+    assert remote_cache.offline
+    assert caches[1] == (None, None)
+    assert VSMWizard.parse_cache.get_cache() is None
+    assert VSMWizard.response_cache.get_cache() is None
+
+
+@patch('VSMWizard.main.ingestPipelines')
+@patch('builtins.open', new_callable=mock_open, read_data='{"yml_filepath": [["pipeline1", "path1.yml"]], "template_dictionary": ["templates/a/steps.yml"]}')
+def test_generate_shares_template_index(mock_open_file, mock_ingest):
+    mock_pipeline = MagicMock()
+    mock_pipeline.getName.return_value = "pipeline1"
+    mock_ingest.return_value = [mock_pipeline]
+
+    with patch('svgwrite.Drawing'), \
+         patch('VSMWizard.main.sortPipelines'), \
+         patch('VSMWizard.main.addPipelinesToVSM'), \
+         patch('VSMWizard.main.addSaveButton'), \
+         patch('VSMWizard.main.resizeSVG'), \
+         patch('os.path.islink', return_value=False), \
+         patch('os.symlink'):
+        VSMWizard.generate("")
+
+    templates = mock_ingest.call_args.kwargs["templates"]
+    assert templates.index.lookup("a/steps.yml") == os.path.normpath("templates/a/steps.yml")
+    # Only the config file itself was opened, templates are looked up in the index
+    mock_open_file.assert_called_once()
+
+
+@patch('VSMWizard.main.ingestPipelines')
+@patch('builtins.open', new_callable=mock_open, read_data='{"yml_filepath": [["pipeline1", "path1.yml"]], "layout": "layered"}')
+def test_generate_layout_mode(mock_open_file, mock_ingest):
+    mock_pipeline = MagicMock()
+    mock_pipeline.getName.return_value = "pipeline1"
+    mock_ingest.return_value = [mock_pipeline]
+
+    with patch('svgwrite.Drawing'), \
+         patch('VSMWizard.main.sortPipelines'), \
+         patch('VSMWizard.main.addPipelinesToVSM') as mock_add, \
+         patch('VSMWizard.main.addSaveButton'), \
+         patch('VSMWizard.main.resizeSVG'), \
+         patch('os.path.islink', return_value=False), \
+         patch('os.symlink'):
+        VSMWizard.generate("")
+
+    assert mock_add.call_args.args[2] == VSMWizard.CONST_LAYOUT_LAYERED
+
+
+@patch('VSMWizard.main.ingestPipelines')
+@patch('builtins.open', new_callable=mock_open, read_data='{"yml_filepath": [["pipeline1", "path1.yml"]], "renderer": "stream"}')
+def test_generate_renderer(mock_open_file, mock_ingest):
+    mock_pipeline = MagicMock()
+    mock_pipeline.getName.return_value = "pipeline1"
+    mock_ingest.return_value = [mock_pipeline]
+
+    with patch('svgwrite.Drawing') as mock_drawing, \
+         patch('VSMWizard.main.sortPipelines'), \
+         patch('VSMWizard.main.addPipelinesToVSM') as mock_add, \
+         patch('VSMWizard.main.addSaveButton'), \
+         patch('VSMWizard.main.resizeSVG', side_effect=lambda vsm: vsm), \
+         patch('os.path.islink', return_value=False), \
+         patch('os.symlink'):
+        VSMWizard.generate("")
+
+    mock_drawing.assert_not_called()
+    vsm = mock_add.call_args.args[0]
+    assert isinstance(vsm, svg_stream.StreamingDrawing)
+    # Saved, then its temporary body is let go of
+    mock_open_file.assert_any_call("pipeline1_VSM.svg", "w", encoding="utf-8")
+    assert vsm._body.closed
+
+
+@patch('VSMWizard.main.ingestPipelines')
+@patch('builtins.open', new_callable=mock_open, read_data='{"yml_filepath": [["pipeline1", "path1.yml"]], "positions": "saved.json"}')
+def test_generate_positions(mock_open_file, mock_ingest):
+    mock_pipeline = MagicMock()
+    mock_pipeline.getName.return_value = "pipeline1"
+    mock_ingest.return_value = [mock_pipeline]
+
+    with patch('svgwrite.Drawing'), \
+         patch('VSMWizard.main.sortPipelines'), \
+         patch('VSMWizard.main.loadPositions', return_value={"card_1": (400, 500)}) as mock_load, \
+         patch('VSMWizard.main.addPipelinesToVSM') as mock_add, \
+         patch('VSMWizard.main.addSaveButton'), \
+         patch('VSMWizard.main.resizeSVG'), \
+         patch('os.path.islink', return_value=False), \
+         patch('os.symlink'):
+        VSMWizard.generate("")
+        # A positions file passed in wins over the config
+        VSMWizard.generate("", positionsFile="other.json")
+
+    assert [c.args[0] for c in mock_load.call_args_list] == ["saved.json", "other.json"]
+    assert mock_add.call_args.args[3] == {"card_1": (400, 500)}
+
+
+def test_loadPositions(tmp_path, capsys):
+    positionsFile = tmp_path / "VSM_positions.json"
+    positionsFile.write_text(
+        json.dumps(
+            [
+                {"id": element_ids.card_id(None, 2), "pipeline": None, "x": 5, "y": 6},
+                {"id": "rect_50_50", "pipeline": "Build", "x": 700, "y": 900},
+                {"id": "rect_400_50", "x": 10, "y": 20},
+            ]
+        )
+    )
+
+    assert VSMWizard.loadPositions(str(positionsFile)) == {
+        element_ids.card_id(None, 2): (5, 6),
+        element_ids.card_id("Build"): (700, 900),
+    }
+    assert "rect_400_50 has no pipeline name" in capsys.readouterr().out
+
+
+def test_loadPositions_missing_file(tmp_path, capsys):
+    assert VSMWizard.loadPositions(str(tmp_path / "missing.json")) == {}
+    assert "Could not load positions" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("layoutMode", [VSMWizard.CONST_LAYOUT_INCREMENTAL, VSMWizard.CONST_LAYOUT_LAYERED])
+def test_addPipelinesToVSM_pins_saved_positions(layoutMode):
+    canvas = svgwrite.Drawing()
+    pipelines = layeredPipelines(["A", "B", "C"], {"B": ["A"]})
+
+    VSMWizard.addPipelinesToVSM(canvas, pipelines, layoutMode, positions={element_ids.card_id("A"): (1000, 900)})
+
+    # A stays where it was saved, B is laid out next to it
+    assert (pipelines[0].getX(), pipelines[0].getY()) == (1000, 900)
+    if layoutMode == VSMWizard.CONST_LAYOUT_INCREMENTAL:
+        assert pipelines[1].getX() == 1000 + VSMWizard.CONST_PIPELINE_WIDTH + 50
+    else:
+        assert pipelines[1].getY() == 900
+    # The card knows its pipeline, so the next save is keyed by it
+    rect = canvas.elements[1].elements[0]
+    assert rect.attribs["id"] == element_ids.card_id("A")
+    assert element_ids.index(canvas)["cards"][rect.attribs["id"]] == {"pipeline": "A", "x": 1000, "y": 900}
+    assert rect.attribs["data-pipeline"] == "A"
+    assert 'data-pipeline="A"' in canvas.tostring()
+
+
+@pytest.mark.parametrize("layoutMode", [VSMWizard.CONST_LAYOUT_INCREMENTAL, VSMWizard.CONST_LAYOUT_LAYERED])
+def test_addPipelinesToVSM_pins_pipelines_that_share_a_name_apart(layoutMode):
+    canvas = svgwrite.Drawing()
+    pipelines = layeredPipelines(["Build", "Build", "Deploy"], {})
+    positions = {element_ids.card_id("Build"): (1000, 900), element_ids.card_id("build", 2): (1000, 1200)}
+
+    VSMWizard.addPipelinesToVSM(canvas, pipelines, layoutMode, positions)
+
+    assert [(p.getX(), p.getY()) for p in pipelines[:2]] == [(1000, 900), (1000, 1200)]
+    assert (pipelines[2].getX(), pipelines[2].getY()) not in [(1000, 900), (1000, 1200)]
+
+
+@pytest.mark.parametrize("layoutMode", [VSMWizard.CONST_LAYOUT_INCREMENTAL, VSMWizard.CONST_LAYOUT_LAYERED])
+def test_addPipelinesToVSM_keeps_new_cards_off_pinned_ones(layoutMode):
+    canvas = svgwrite.Drawing()
+    pipelines = layeredPipelines(["A", "B"], {})
+
+    # B was moved to where A would go
+    VSMWizard.addPipelinesToVSM(canvas, pipelines, layoutMode, positions={element_ids.card_id("B"): (50, 50)})
+
+    assert (pipelines[1].getX(), pipelines[1].getY()) == (50, 50)
+    assert pipelines[0].getX() == 50
+    assert pipelines[0].getY() >= 50 + VSMWizard.CONST_PIPELINE_HEIGHT
+
+
+def test_layout_every_pipeline_pinned_skips_layout():
+    pipelines = layeredPipelines(["A", "B"], {"B": ["A"]})
+
+    with patch.object(layout, "order_layers") as mock_order:
+        columns = layout.layout_pipelines(pipelines, 300, 100, pinned={0: (10, 20), 1: (30, 40)})
+
+    mock_order.assert_not_called()
+    assert columns is None
+    assert [(p.getX(), p.getY()) for p in pipelines] == [(10, 20), (30, 40)]
+
+
+def renderedPipelines(renderer, layoutMode):
+    # A fan out, a dependency loop, a missing dependency and a task row, far
+    # enough to the right to grow the canvas past its minimum size
+    names = [f"P{i}" for i in range(12)]
+    dependencies = {names[i]: [names[i - 1]] for i in range(1, 10)}
+    dependencies["P10"] = ["P3", "P11"]
+    dependencies["P11"] = ["P10", "Missing"]
+    pipelines = layeredPipelines(names, dependencies)
+    pipelines[2].setTrigger("On push to <main> & \"release\"")
+    for task in ["python", "python", "java", "npm", "node", "dotnet", "artifact"]:
+        pipelines[4].addTask(task)
+    VSMWizard.sortPipelines(pipelines)
+
+    vsm = VSMWizard.createDrawing("test.svg", renderer)
+    VSMWizard.addPipelinesToVSM(vsm, pipelines, layoutMode)
+    VSMWizard.addSaveButton(vsm)
+    vsm.add(vsm.script(href=".\\index.js"))
+    VSMWizard.addIdIndex(vsm)
+    return VSMWizard.resizeSVG(vsm)
+
+
+@pytest.mark.parametrize("layoutMode", [VSMWizard.CONST_LAYOUT_INCREMENTAL, VSMWizard.CONST_LAYOUT_LAYERED])
+def test_streamed_drawing_matches_svgwrite(layoutMode):
+    expected = renderedPipelines(VSMWizard.CONST_RENDERER_SVGWRITE, layoutMode)
+    streamed = renderedPipelines(VSMWizard.CONST_RENDERER_STREAM, layoutMode)
+
+    assert isinstance(streamed, svg_stream.StreamingDrawing)
+    assert int(expected["width"]) > 3000
+    assert streamed.tostring() == expected.tostring()
+
+
+def test_card_id_comes_from_the_pipeline_name():
+    assert element_ids.card_id("Build") == element_ids.card_id("build")
+    assert element_ids.card_id("Build") != element_ids.card_id("Deploy")
+    assert len(element_ids.card_id("Build")) == len("card_") + element_ids.CARD_HASH_LENGTH
+    assert element_ids.edge_id("card_a", "card_b") == "post_card_a_pre_card_b"
+
+
+def test_pipelines_that_share_a_name_get_their_own_cards(capsys):
+    specs = [["a", "missing_a.yml"], ["b", "missing_b.yml"]]
+    with patch('VSMWizard.main.parser.parse_yml_file', return_value=None):
+        failed = VSMWizard.ingestPipelines(specs, max_workers=1)
+    builds = layeredPipelines(["Build", "build", "Deploy"], {"Deploy": ["Build"]})
+
+    root = drawnVSM(failed + builds)
+
+    unnamed = [element_ids.card_id(None), element_ids.card_id(None, 2)]
+    build = [element_ids.card_id("Build"), element_ids.card_id("Build", 2)]
+    assert list(element_ids.read_index(root)["cards"]) == unnamed + build + [element_ids.card_id("Deploy")]
+    ids = [e.get("id") for e in root.iter() if e.get("id")]
+    for card in unnamed + build:
+        assert ids.count(card) == 1
+    # Like every other lookup by name, the dependency is the last pipeline with it
+    lineID = element_ids.edge_id(build[1], element_ids.card_id("Deploy"))
+    assert lineID + "-SegmentA" in ids
+    out = capsys.readouterr().out
+    assert f"more than one pipeline is named None, card 2 of them gets the id {unnamed[1]}" in out
+    assert f"more than one pipeline is named build, card 2 of them gets the id {build[1]}" in out
+
+
+@pytest.mark.parametrize("renderer", [VSMWizard.CONST_RENDERER_SVGWRITE, VSMWizard.CONST_RENDERER_STREAM])
+def test_addIdIndex(renderer):
+    vsm = renderedPipelines(renderer, VSMWizard.CONST_LAYOUT_LAYERED)
+    root = ET.fromstring(vsm.tostring())
+
+    saved = element_ids.read_index(root)
+    assert saved == element_ids.build_index(root)
+    assert saved["cards"][element_ids.card_id("P0")]["pipeline"] == "P0"
+    assert saved["cards"][element_ids.card_id("Missing")]["pipeline"] == "Missing"
+    lineID = element_ids.edge_id(element_ids.card_id("P3"), element_ids.card_id("P10"))
+    assert saved["edges"][lineID] == {"source": element_ids.card_id("P3"), "target": element_ids.card_id("P10")}
+    # Every id in the index is on the VSM once
+    ids = [e.get("id") for e in root.iter() if e.get("id")]
+    for card in saved["cards"]:
+        assert ids.count(card) == 1
+    for edge in saved["edges"]:
+        assert ids.count(edge + "-SegmentA") == 1
+
+
+def test_index_json_keeps_cdata_closed():
+    entries = element_ids.new_index()
+    element_ids.add_card(entries, "card_x", "a]]>b", 0, 0)
+
+    assert "]]>" not in element_ids.index_json(entries)
+    assert json.loads(element_ids.index_json(entries)) == entries
+
+
+LEGACY_SVG = """<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">
+<g><rect class="draggable" id="rect_0_0" x="0" y="0" /><a xlink:href="a.yml"><text x="10" y="20">A</text></a></g>
+<g><rect class="draggable" id="rect_400_-50" x="400" y="-50" /><a xlink:href="b.yml"><text x="410" y="-30">B</text></a></g>
+<line id="post_rect_0_0_pre_rect_400_-50-SegmentA" x1="300" y1="50" x2="370" y2="0" />
+<line id="post_rect_0_0_pre_rect_400_-50-SegmentB" x1="370" y1="0" x2="400" y2="0" />
+<image id="post_rect_0_0_pre_rect_400_-50-arrow" x="379" y="-12" />
+</svg>"""
+
+
+def test_migrate_svg():
+    root = ET.fromstring(LEGACY_SVG)
+    a, b = element_ids.card_id("A"), element_ids.card_id("B")
+
+    renamed = element_ids.migrate_svg(root)
+
+    assert renamed == {"rect_0_0": a, "rect_400_-50": b}
+    rects = root.findall(".//{http://www.w3.org/2000/svg}rect")
+    assert [(r.get("id"), r.get("data-pipeline")) for r in rects] == [(a, "A"), (b, "B")]
+    lineID = element_ids.edge_id(a, b)
+    assert [e.get("id") for e in root if e.get("id", "").startswith("post_")] == [
+        lineID + "-SegmentA",
+        lineID + "-SegmentB",
+        lineID + "-arrow",
+    ]
+    assert element_ids.read_index(root) == {
+        "cards": {a: {"pipeline": "A", "x": 0, "y": 0}, b: {"pipeline": "B", "x": 400, "y": -50}},
+        "edges": {lineID: {"source": a, "target": b}},
+    }
+    # Migrated files are left alone
+    assert element_ids.migrate_svg(root) == {}
+    assert len(root.findall("{http://www.w3.org/2000/svg}script")) == 1
+
+
+def test_migrate_svg_numbers_cards_that_share_a_name():
+    root = ET.fromstring(LEGACY_SVG.replace(">B<", ">A<"))
+
+    renamed = element_ids.migrate_svg(root)
+
+    assert renamed == {"rect_0_0": element_ids.card_id("A"), "rect_400_-50": element_ids.card_id("A", 2)}
+    assert len(element_ids.read_index(root)["cards"]) == 2
+
+
+def test_migrate_positions():
+    root = ET.fromstring(LEGACY_SVG)
+    renamed = element_ids.migrate_svg(root)
+    entries = [{"id": "rect_400_-50", "x": 700, "y": 0}, {"id": "rect_9_9", "x": 1, "y": 2}]
+
+    element_ids.migrate_positions(entries, renamed, element_ids.read_index(root)["cards"])
+
+    assert entries == [
+        {"id": element_ids.card_id("B"), "x": 700, "y": 0, "pipeline": "B"},
+        {"id": "rect_9_9", "x": 1, "y": 2},
+    ]
+
+
+def drawnVSM(pipelines, positions=None):
+    vsm = svgwrite.Drawing()
+    VSMWizard.addPipelinesToVSM(vsm, pipelines, VSMWizard.CONST_LAYOUT_LAYERED, positions)
+    VSMWizard.addIdIndex(vsm)
+    return ET.fromstring(vsm.tostring())
+
+
+def linePoints(root):
+    return {
+        line.get("id"): tuple(line.get(a) for a in ("x1", "y1", "x2", "y2"))
+        for line in root.iter("{http://www.w3.org/2000/svg}line")
+    }
+
+
+def test_move_cards_redraws_lines_like_generate():
+    dependencies = {"B": ["A"], "C": ["A", "B"]}
+    pinned = layeredPipelines(["A", "B", "C"], dependencies)
+    expected = drawnVSM(pinned, positions={element_ids.card_id("A"): (1000, 900)})
+    root = drawnVSM(layeredPipelines(["A", "B", "C"], dependencies))
+    index = element_ids.read_index(root)
+    moves = [
+        {"id": element_ids.card_id(p.getName()), "x": p.getX(), "y": p.getY()} for p in pinned
+    ]
+
+    moved = svg_patch.move_cards(root, moves, index)
+
+    assert moved == {element_ids.card_id(name) for name in "ABC"}
+    assert linePoints(root) == linePoints(expected)
+    assert index == element_ids.read_index(expected)
+    # Everything on the card went along with it
+    card = root.find(f".//*[@id='{element_ids.card_id('A')}']")
+    text = root.find(".//{http://www.w3.org/2000/svg}a/{http://www.w3.org/2000/svg}text")
+    assert (card.get("x"), card.get("y")) == ("1000", "900")
+    assert (text.get("x"), text.get("y")) == ("1010", "920")
+
+
+def test_move_cards_redraws_every_copy_of_a_line():
+    root = drawnVSM(layeredPipelines(["A", "B"], {"B": ["A"]}))
+    # A pipeline that depends on another twice gets the same line twice
+    lines = [copy.deepcopy(line) for line in root.iter("{http://www.w3.org/2000/svg}line")]
+    root.extend(lines)
+    before = linePoints(root)
+
+    svg_patch.move_cards(root, [{"id": element_ids.card_id("B"), "x": 900, "y": 700}])
+
+    points = [
+        tuple(line.get(a) for a in ("x1", "y1", "x2", "y2"))
+        for line in root.iter("{http://www.w3.org/2000/svg}line")
+    ]
+    assert points[: len(lines)] == points[len(lines) :] == list(linePoints(root).values())
+    assert linePoints(root) != before
+
+
+def test_move_cards_skips_unknown_ids(capsys):
+    root = drawnVSM(layeredPipelines(["A", "B"], {"B": ["A"]}))
+    before = linePoints(root)
+
+    moved = svg_patch.move_cards(root, [{"id": "rect_0_0", "x": 5, "y": 5}])
+
+    assert moved == set()
+    assert linePoints(root) == before
+    assert "Element with id rect_0_0 not found." in capsys.readouterr().out
+
+
+def test_edge_route_goes_around_cards_to_the_left():
+    # Right edge to left edge when the target is to the right
+    assert edge_route.route((0, 0), (400, 0), 300, 100) == ((300, 50.0), (370, 50.0), (400, 50.0))
+    # Bottom to top when it is below and to the left
+    assert edge_route.route((400, 0), (0, 200), 300, 100) == ((550.0, 100), (150.0, 170), (150.0, 200))
+    # Top to bottom when it is above and to the left
+    assert edge_route.route((400, 200), (0, 0), 300, 100) == ((550.0, 200), (150.0, 130), (150.0, 100))
+
+
+def drawnSVG(path, pipelines, index=True):
+    vsm = svgwrite.Drawing(str(path))
+    VSMWizard.addPipelinesToVSM(vsm, pipelines, VSMWizard.CONST_LAYOUT_LAYERED)
+    if index:
+        VSMWizard.addIdIndex(vsm)
+    vsm.save()
+    return path
+
+
+@pytest.mark.parametrize(
+    "vsm, moves",
+    [
+        ("drawn", [{"id": "A", "x": 1000, "y": 900}, {"id": "C", "x": 50, "y": 700}, {"id": "rect_9_9", "x": 1, "y": 2}]),
+        ("unindexed", [{"id": "B", "x": -40, "y": 60}]),
+        ("legacy", [{"id": "rect_400_-50", "x": 700, "y": 0}]),
+        ("shared", [{"id": "rect_400_-50", "x": 700, "y": 0}]),
+        ("reordered", [{"id": "A", "x": 1000, "y": 900}, {"id": "C", "x": 50, "y": 700}]),
+        ("legacy reordered", [{"id": "rect_400_-50", "x": 700, "y": 0}]),
+        ("drawn", []),
+    ],
+)
+def test_patch_file_writes_what_patch_tree_does(tmp_path, vsm, moves):
+    ET.register_namespace("", "http://www.w3.org/2000/svg")
+    pipelines = layeredPipelines(["A", "B", "C"], {"B": ["A"], "C": ["A", "B"]})
+    if vsm == "legacy":
+        source = tmp_path / "vsm.svg"
+        source.write_text(LEGACY_SVG)
+    elif vsm == "shared":
+        source = tmp_path / "vsm.svg"
+        source.write_text(LEGACY_SVG.replace(">B<", ">A<"))
+    elif vsm == "legacy reordered":
+        # Lines before the cards they join
+        source = tmp_path / "vsm.svg"
+        lines = LEGACY_SVG.splitlines()
+        source.write_text("\n".join(lines[:1] + lines[3:6] + lines[1:3] + lines[6:]))
+    else:
+        source = drawnSVG(tmp_path / "vsm.svg", pipelines, index=vsm in ("drawn", "reordered"))
+    if vsm == "reordered":
+        # The index and the lines before the cards, patch_file holds them until it has read the cards
+        tree = ET.parse(source)
+        root = tree.getroot()
+        ahead = [e for e in root if e.get("id", "").startswith("post_") or e.get("id") == element_ids.INDEX_ID]
+        for element in ahead:
+            root.remove(element)
+        root[0:0] = ahead
+        tree.write(source)
+    for move in moves:
+        if move["id"] in "ABC":
+            move["id"] = element_ids.card_id(move["id"])
+    streamed = copy.deepcopy(moves)
+
+    tree = ET.parse(source)
+    renamed = svg_patch.patch_tree(tree, moves)
+    tree.write(tmp_path / "tree.svg")
+
+    assert svg_patch.patch_file(str(source), str(tmp_path / "stream.svg"), streamed) == renamed
+    assert streamed == moves
+    # The same document, namespaces may be declared on other elements and with other prefixes
+    streamed_svg = ET.canonicalize(from_file=tmp_path / "stream.svg", rewrite_prefixes=True)
+    assert streamed_svg == ET.canonicalize(from_file=tmp_path / "tree.svg", rewrite_prefixes=True)
+
+
+def test_streamed_drawing_writes_pipelines_out_as_they_are_drawn(tmp_path):
+    vsm = VSMWizard.createDrawing(str(tmp_path / "test.svg"), VSMWizard.CONST_RENDERER_STREAM)
+    pipelines = layeredPipelines(["A", "B"], {"B": ["A"]})
+
+    VSMWizard.addPipelinesToVSM(vsm, pipelines)
+
+    # The flushed elements are gone, their extent is still known
+    assert vsm.elements == []
+    box = svg_bounds.bounds(vsm)
+    assert box.max_x == pipelines[1].getX() + VSMWizard.CONST_PIPELINE_WIDTH
+    assert box.max_y == pipelines[1].getY() + VSMWizard.CONST_PIPELINE_HEIGHT
+
+    VSMWizard.resizeSVG(vsm)
+    vsm.save()
+    vsm.close()
+    saved = (tmp_path / "test.svg").read_text(encoding="utf-8")
+    assert saved.startswith('<?xml version="1.0" encoding="utf-8" ?>\n<svg baseProfile="full" height="3000"')
+    assert saved.count("<rect ") == 2
+    assert saved.endswith("</svg>")
+
+
+def test_createDrawing_falls_back_to_svgwrite():
+    vsm = VSMWizard.createDrawing("test.svg", "canvas")
+
+    assert isinstance(vsm, svgwrite.Drawing)
+
+
+@pytest.mark.parametrize("renderer", [VSMWizard.CONST_RENDERER_SVGWRITE, VSMWizard.CONST_RENDERER_STREAM])
+def test_drawPipeline_shares_definitions(renderer):
+    canvas = VSMWizard.createDrawing("test.svg", renderer)
+    pipelines = layeredPipelines(["A", "B"], {})
+    pipelines.append(VSMWizard.createDummyPipeline("C"))
+
+    for i, pipeline in enumerate(pipelines):
+        VSMWizard.drawPipeline(canvas, 50, 50 + i * 150, pipeline)
+
+    # One gradient per card color and one style sheet, whatever the card count
+    ids = sorted(d.attribs["id"] for d in canvas.defs.elements if d.elementname == "linearGradient")
+    assert ids == ["dummyGradient", "mainGradient"]
+    styles = [d for d in canvas.defs.elements if d.elementname == "style"]
+    assert len(styles) == 1
+    svg = canvas.tostring()
+    assert svg.count("url(#mainGradient)") == 2
+    assert svg.count("url(#dummyGradient)") == 1
+    assert svg.count(".label{font-family:Helvetica;}") == 1
+    assert 'class="draggable label"' in svg
+    assert "style=" not in svg
+
+
+def test_svg_defs_adds_each_definition_once():
+    canvas = svgwrite.Drawing()
+
+    first = svg_defs.linear_gradient(canvas, "gray", ((0, "#fff"), (1, "#000")))
+    again = svg_defs.linear_gradient(canvas, "gray", ((0, "#fff"), (1, "#000")))
+    assert first is again
+    assert svg_defs.style(canvas, "label", "font-family:Helvetica;") == "label"
+    svg_defs.style(canvas, "label", "font-family:Helvetica;")
+    svg_defs.style(canvas, "note", "font-size:10px;")
+
+    drawn = []
+    def arrowhead(marker):
+        drawn.append(marker)
+        marker.add(canvas.path(d="M 0 0 L 10 5 L 0 10 z"))
+
+    for _ in range(3):
+        marker = svg_defs.marker(canvas, "arrow", arrowhead, (10, 5), (10, 10))
+    assert marker["id"] == "arrow"
+    assert len(drawn) == 1
+
+    # Each drawing gets its own definitions
+    other = svgwrite.Drawing()
+    assert svg_defs.linear_gradient(other, "gray", ((0, "#fff"), (1, "#000"))) is not first
+
+    defs = canvas.defs.tostring()
+    assert defs.count("<linearGradient") == 1
+    assert defs.count("<marker") == 1
+    assert "<![CDATA[.label{font-family:Helvetica;}.note{font-size:10px;}]]>" in defs
+
+
 def test_handleDummyPipelineTrigger():
     # Create test objects
     canvas = svgwrite.Drawing()
@@ -1147,13 +2157,13 @@ class TestHandleDuplicateTasks(unittest.TestCase):
         
         # Store original functions to restore after test
         self.original_getIconPath = VSMWizard.getIconPath
-        self.original_insertIcon = VSMWizard.insertIcon
+        self.original_useIcon = VSMWizard.useIcon
         self.original_drawCircle = VSMWizard.drawCircle
         self.original_drawText = VSMWizard.drawText
         
         # Mock functions
         VSMWizard.getIconPath = lambda taskIcon: f"resources/{taskIcon}.png"
-        VSMWizard.insertIcon = lambda container, href, x, y, width, height, description=None: container.add(
+        VSMWizard.useIcon = lambda canvas, container, href, x, y, width, height, description=None: container.add(
             svgwrite.image.Image(href, insert=(x, y), size=(width, height))
         )
         VSMWizard.drawCircle = lambda canvas, container, x, y, r, fill: container.add(
@@ -1166,7 +2176,7 @@ class TestHandleDuplicateTasks(unittest.TestCase):
     def tearDown(self):
         # Restore original functions
         VSMWizard.getIconPath = self.original_getIconPath
-        VSMWizard.insertIcon = self.original_insertIcon
+        VSMWizard.useIcon = self.original_useIcon
         VSMWizard.drawCircle = self.original_drawCircle
         VSMWizard.drawText = self.original_drawText
     
@@ -1224,85 +2234,3 @@ class TestHandleDuplicateTasks(unittest.TestCase):
         additional_task_texts = [t for t in texts if t.text.startswith("+")]
         self.assertEqual(len(additional_task_texts), 1)
         self.assertEqual(additional_task_texts[0].text, "+1")
-
-
-def test_consolidateDummies():
-    """Test that dummy pipelines are properly consolidated into real pipelines"""
-    # Setup
-    canvas = svgwrite.Drawing()
-    
-    # Create a mock Pipeline class
-    class MockPipeline:
-        def __init__(self, name, origin=None, x=0, y=0):
-            self.name = name
-            self.origin = origin
-            self.x = x
-            self.y = y
-            
-        def getName(self):
-            return self.name
-            
-        def getOrigin(self):
-            return self.origin
-            
-        def getX(self):
-            return self.x
-            
-        def getY(self):
-            return self.y
-            
-        def setX(self, x):
-            self.x = x
-            
-        def setY(self, y):
-            self.y = y
-    
-    # Create pipelines - one real and one dummy with the same name
-    real_pipeline = MockPipeline("test-pipeline", origin="https://example.com", x=200, y=200)
-    pipelines = [real_pipeline]
-    
-    # Create a dummy pipeline container in the VSM
-    dummy_container = svgwrite.container.Group()
-    dummy_container.attribs["id"] = "dummy_test-pipeline"
-    
-    # Add a rectangle to the dummy container (simulating what drawPipeline would do)
-    dummy_rect = svgwrite.shapes.Rect(insert=(50, 50), size=(VSMWizard.CONST_PIPELINE_WIDTH, VSMWizard.CONST_PIPELINE_HEIGHT))
-    dummy_rect.attribs["x"] = "50"
-    dummy_rect.attribs["y"] = "50"
-    dummy_container.add(dummy_rect)
-    
-    # Add text element with pipeline name
-    dummy_text = svgwrite.text.Text("test-pipeline", insert=(60, 70))
-    dummy_container.add(dummy_text)
-    
-    # Add the dummy container to the canvas
-    canvas.add(dummy_container)
-    
-    # Add a line connected to the dummy pipeline
-    line = svgwrite.shapes.Line(
-        start=(50 + VSMWizard.CONST_PIPELINE_WIDTH, 50 + VSMWizard.CONST_PIPELINE_HEIGHT/2),
-        end=(150, 100)
-    )
-    line.attribs["id"] = f"post_rect_50_50_pre_rect_150_100-SegmentA"
-    line.attribs["x1"] = str(50 + VSMWizard.CONST_PIPELINE_WIDTH)
-    line.attribs["y1"] = str(50 + VSMWizard.CONST_PIPELINE_HEIGHT/2)
-    canvas.add(line)
-    
-    # Add the dummy pipeline to the dictionary
-    VSMWizard.dummyPipelinesDict["test-pipeline"] = None
-    
-    # Call the function under test
-    VSMWizard.consolidateDummies(canvas, pipelines)
-    
-    # Assertions
-    
-    # 1. Check that the dummy container is now hidden
-    assert dummy_container.attribs["visibility"] == "hidden"
-    
-    # 2. Check that the line has been updated to connect to the real pipeline
-    assert line.attribs["id"] == f"post_rect_200_200_pre_rect_150_100-SegmentA"
-    assert float(line.attribs["x1"]) == 200 + VSMWizard.CONST_PIPELINE_WIDTH
-    assert float(line.attribs["y1"]) == 200 + VSMWizard.CONST_PIPELINE_HEIGHT/2
-    
-    # Clean up the global dictionary
-    VSMWizard.dummyPipelinesDict.clear()
@@ -1,10 +1,22 @@
 import os
 import json
+import pickle
+import yaml
+import time
 import requests
 from unittest.mock import patch, MagicMock, mock_open
 import pytest
 from dotenv import load_dotenv
 from YMLParser import parser
+from YMLParser import devops_client
+from YMLParser import parse_cache
+from YMLParser import response_cache
+from YMLParser.parse_cache import ParseCache
+from YMLParser.tree_walker import PipelineVisitor, walk_pipeline, scan_pipeline, template_references
+from YMLParser.task_matcher import compile_matcher
+from YMLParser.cron_service import CronDescriber, shared_options
+from cron_descriptor import CasingTypeEnum, ExpressionDescriptor
+from tests.fake_devops_server import FakeDevOpsServer, INPUT_DIR
 import YMLParser
 from YMLParser.parser import (
     Pipeline,
@@ -24,7 +36,11 @@ from YMLParser.parser import (
     deep_search_multi,
     createPipeline,
     parse_jobs,
-    parse_job_tasks
+    parse_job_tasks,
+    TemplateResolver,
+    TemplateIndex,
+    DependencyRef,
+    merge_templates
 )
 
 @pytest.fixture
@@ -73,8 +89,8 @@ def test_local_parser_unsafe_load():
     mock_file = mock_open(read_data=test_yaml_content)
     
     with patch("builtins.open", mock_file), \
-         patch("yaml.safe_load", side_effect=Exception("safe_load failed")), \
-         patch("yaml.unsafe_load") as mock_unsafe_load:
+         patch("YMLParser.parser.safe_load", side_effect=Exception("safe_load failed")), \
+         patch("YMLParser.parser.unsafe_load") as mock_unsafe_load:
         
         mock_unsafe_load.return_value = {"attr": "value"}
         result = localParser.parse_yml("test_pipeline", "local/path/file.yml")
@@ -85,14 +101,8 @@ def test_local_parser_unsafe_load():
         assert result["attr"] == "value"
         mock_unsafe_load.assert_called_once()
 
-@patch('YMLParser.parser.requests')
-@patch('YMLParser.parser.load_dotenv')
-def test_parse_yml_file_url(mock_load_dotenv, mock_requests):
-    # Setup mock environment
-    mock_load_dotenv.return_value = None
-    os.environ['PAT'] = 'fake_pat'
-    os.environ['ORG_URL'] = 'https://dev.azure.com/fake-org'
-    
+@patch('YMLParser.parser.devops_client.get_client')
+def test_parse_yml_file_url(mock_get_client):
     # Setup mock response
     mock_response = MagicMock()
     mock_response.status_code = 200
@@ -101,7 +111,7 @@ def test_parse_yml_file_url(mock_load_dotenv, mock_requests):
     trigger:
       - main
     """
-    mock_requests.get.return_value = mock_response
+    mock_get_client.return_value.get.return_value = mock_response
 
     # Test the function
     result = parse_yml_file(["test_pipeline", "https://example.com/pipeline.yml"])
@@ -109,27 +119,21 @@ def test_parse_yml_file_url(mock_load_dotenv, mock_requests):
     # Verify results
     assert result is not None
     assert result["name"] == "test_pipeline"
-    mock_requests.get.assert_called_once()
-
-@patch('YMLParser.parser.requests')
-@patch('YMLParser.parser.load_dotenv')
-def test_parse_yml_file_url_failure(mock_load_dotenv, mock_requests):
-    # Setup mock environment
-    mock_load_dotenv.return_value = None
-    os.environ['PAT'] = 'fake_pat'
-    os.environ['ORG_URL'] = 'https://dev.azure.com/fake-org'
-    
+    mock_get_client.return_value.get.assert_called_once_with("https://example.com/pipeline.yml")
+
+@patch('YMLParser.parser.devops_client.get_client')
+def test_parse_yml_file_url_failure(mock_get_client):
     # Setup mock response for failure
     mock_response = MagicMock()
     mock_response.status_code = 404
-    mock_requests.get.return_value = mock_response
+    mock_get_client.return_value.get.return_value = mock_response
 
     # Test the function
     result = parse_yml_file(["test_pipeline", "https://example.com/pipeline.yml"])
     
     # Verify results
     assert result is None
-    mock_requests.get.assert_called_once()
+    mock_get_client.return_value.get.assert_called_once()
 
 def test_parse_yml_file_local_file_not_found():
     with patch("builtins.open", mock_open()) as mock_file:
@@ -960,7 +964,8 @@ def test_find_template_repo_no_repositories():
     assert result is None
 
 def test_api_parser_missing_env_vars():
-    with patch('dotenv.load_dotenv', side_effect=Exception):
+    devops_client.reset_client()
+    with patch('YMLParser.devops_client.load_credentials', side_effect=Exception):
         result = apiParser.parse_yml("test_pipeline", "https://example.com/pipeline.yml")
         assert result is None
 
@@ -995,7 +1000,7 @@ def test_local_parser_non_dict_yaml():
         assert result["name"] == "test_pipeline"
 
 def test_api_parser_network_error():
-    with patch('requests.get', side_effect=requests.exceptions.RequestException):
+    with patch('requests.Session.get', side_effect=requests.exceptions.RequestException):
         result = apiParser.parse_yml("test_pipeline", "https://example.com/pipeline.yml")
         assert result is None
 
@@ -1400,3 +1405,505 @@ def test_get_template_path_missing_dictionary_key(tmp_path):
         # Act & Assert
         with pytest.raises(KeyError):
             get_template_path("any_template.yml")
+
+@pytest.fixture
+def devops_server():
+    devops_client.reset_client()
+    with FakeDevOpsServer() as server:
+        yield server
+    devops_client.reset_client()
+
+def test_api_parser_reuses_connection(devops_server):
+    with patch('YMLParser.devops_client.load_credentials', return_value=("fake_pat", None)):
+        for name in ["A", "B", "C", "D"]:
+            result = parse_yml_file([name, devops_server.url_for(f"{name}.yml")])
+            assert result["name"] == name
+
+    # Four files over a single keep-alive connection
+    assert devops_server.requests == 4
+    assert devops_server.connections == 1
+
+def test_api_parser_matches_local_parser(devops_server):
+    with patch('YMLParser.devops_client.load_credentials', return_value=(None, None)):
+        remote = parse_yml_file(["A", devops_server.url_for("A.yml")])
+    local = parse_yml_file(["A", os.path.join(INPUT_DIR, "A.yml")])
+
+    remote.pop("origin")
+    local.pop("origin")
+    assert remote == local
+    assert devops_server.gzip_responses == 1
+
+def test_api_parser_loads_credentials_once(devops_server):
+    with patch('YMLParser.devops_client.load_credentials', return_value=("fake_pat", None)) as mock_credentials:
+        parse_yml_file(["A", devops_server.url_for("A.yml")])
+        parse_yml_file(["B", devops_server.url_for("B.yml")])
+
+    mock_credentials.assert_called_once()
+    assert all(header and header.startswith("Basic ") for header in devops_server.auth_headers)
+
+def test_api_parser_missing_remote_file(devops_server):
+    with patch('YMLParser.devops_client.load_credentials', return_value=(None, None)):
+        result = parse_yml_file(["missing", devops_server.url_for("missing.yml")])
+    assert result is None
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = parse_cache.configure(str(tmp_path / "cache"))
+    yield cache
+    parse_cache.disable()
+
+def test_local_parser_cache_hit(cache, tmp_path):
+    yml_path = tmp_path / "pipeline.yml"
+    yml_path.write_text("trigger:\n  - main\n")
+
+    first = localParser.parse_yml("first", str(yml_path))
+    with patch('YMLParser.parser.safe_load') as mock_safe_load:
+        second = localParser.parse_yml("second", str(yml_path))
+        mock_safe_load.assert_not_called()
+
+    assert first["trigger"] == second["trigger"] == ["main"]
+    # Name and origin are filled in per call, not cached
+    assert second["name"] == "second"
+    assert second["origin"] == str(yml_path)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["stores"] == 1
+
+def test_local_parser_cache_miss_on_change(cache, tmp_path):
+    yml_path = tmp_path / "pipeline.yml"
+    yml_path.write_text("trigger:\n  - main\n")
+    localParser.parse_yml("pipeline", str(yml_path))
+
+    yml_path.write_text("trigger:\n  - develop\n")
+    result = localParser.parse_yml("pipeline", str(yml_path))
+
+    assert result["trigger"] == ["develop"]
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["misses"] == 2
+
+def test_local_parser_cache_bypassed_without_stat(cache):
+    with patch("builtins.open", mock_open(read_data="attr: value")):
+        result = localParser.parse_yml("test_pipeline", "local/path/file.yml")
+
+    assert result["attr"] == "value"
+    assert cache.stats()["misses"] == 0
+    assert cache.stats()["stores"] == 0
+
+def test_parse_cache_evicts_least_recently_used(tmp_path):
+    document = {"steps": ["x" * 1000]}
+    entry_size = len(pickle.dumps(document, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = ParseCache(str(tmp_path), max_bytes=entry_size * 2)
+
+    cache.put("a", document)
+    cache.put("b", document)
+    # Make "a" the oldest entry, then touch it so "b" becomes least recently used
+    os.utime(tmp_path / "a.pickle", ns=(0, 0))
+    os.utime(tmp_path / "b.pickle", ns=(1, 1))
+    assert cache.get("a") == document
+    cache.put("c", document)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == document
+    assert cache.get("c") == document
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= entry_size * 2
+
+def test_parse_cache_drops_corrupt_entry(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    (tmp_path / "broken.pickle").write_bytes(b"not a pickle")
+
+    assert cache.get("broken") is None
+    assert not (tmp_path / "broken.pickle").exists()
+
+@pytest.fixture
+def remote_cache(tmp_path):
+    remote_cache = response_cache.configure(str(tmp_path / "responses"))
+    yield remote_cache
+    response_cache.disable()
+
+def test_api_parser_revalidates_with_etag(devops_server, remote_cache):
+    url = devops_server.url_for("A.yml")
+    with patch('YMLParser.devops_client.load_credentials', return_value=(None, None)):
+        first = parse_yml_file(["A", url])
+        second = parse_yml_file(["A", url])
+
+    assert first == second
+    assert devops_server.requests == 2
+    assert devops_server.not_modified == 1
+    assert remote_cache.stats() == {"hits": 1, "misses": 1, "stores": 1}
+
+def test_api_parser_revalidates_with_last_modified(tmp_path, remote_cache):
+    served_dir = tmp_path / "served"
+    served_dir.mkdir()
+    yml_path = served_dir / "pipeline.yml"
+    yml_path.write_text("trigger:\n  - main\n")
+
+    devops_client.reset_client()
+    with FakeDevOpsServer(root=str(served_dir)) as server, \
+         patch('YMLParser.devops_client.load_credentials', return_value=(None, None)):
+        url = server.url_for("pipeline.yml")
+        parse_yml_file(["pipeline", url])
+
+        # Only the date is sent back when the server didn't give an ETag
+        entry = remote_cache.lookup(url)
+        entry["etag"] = None
+        remote_cache.store(url, {"Last-Modified": entry["last_modified"]}, entry["document"])
+        assert parse_yml_file(["pipeline", url])["trigger"] == ["main"]
+        assert server.not_modified == 1
+
+        # A newer file comes back in full and replaces the cached copy
+        yml_path.write_text("trigger:\n  - develop\n")
+        os.utime(yml_path, (time.time() + 60, time.time() + 60))
+        assert parse_yml_file(["pipeline", url])["trigger"] == ["develop"]
+        assert server.not_modified == 1
+    devops_client.reset_client()
+
+def test_api_parser_offline_mode(devops_server, tmp_path):
+    cache_dir = str(tmp_path / "responses")
+    url = devops_server.url_for("B.yml")
+    response_cache.configure(cache_dir)
+    with patch('YMLParser.devops_client.load_credentials', return_value=(None, None)):
+        online = parse_yml_file(["B", url])
+
+    offline_cache = response_cache.configure(cache_dir, offline=True)
+    with patch('YMLParser.devops_client.get_client') as mock_get_client:
+        offline = parse_yml_file(["B", url])
+        missing = parse_yml_file(["missing", devops_server.url_for("missing.yml")])
+        mock_get_client.assert_not_called()
+    response_cache.disable()
+
+    assert offline == online
+    assert missing is None
+    assert devops_server.requests == 1
+    assert offline_cache.stats()["hits"] == 1
+
+def test_loader_uses_libyaml_when_available():
+    assert parser.LIBYAML_LOADER == hasattr(yaml, "CSafeLoader")
+    if parser.LIBYAML_LOADER:
+        assert parser.SAFE_LOADER is yaml.CSafeLoader
+        assert parser.UNSAFE_LOADER is yaml.CUnsafeLoader
+    else:
+        assert parser.SAFE_LOADER is yaml.SafeLoader
+        assert parser.UNSAFE_LOADER is yaml.UnsafeLoader
+
+def test_loaders_build_identical_dicts():
+    yml_paths = []
+    for folder, _, files in os.walk(INPUT_DIR):
+        yml_paths += [os.path.join(folder, f) for f in files if f.endswith((".yml", ".yaml"))]
+    assert yml_paths
+
+    for yml_path in sorted(yml_paths):
+        fast = localParser.parse_yml("pipeline", yml_path)
+        with patch('YMLParser.parser.SAFE_LOADER', yaml.SafeLoader), \
+             patch('YMLParser.parser.UNSAFE_LOADER', yaml.UnsafeLoader):
+            pure = localParser.parse_yml("pipeline", yml_path)
+        assert fast == pure, yml_path
+        assert fast["origin"] == yml_path
+        assert fast["name"] == "pipeline"
+
+class RecordingVisitor(PipelineVisitor):
+    def __init__(self, stop_at=None):
+        self.calls = []
+        self.stop_at = stop_at
+
+    def _record(self, call):
+        self.calls.append(call)
+        if call == self.stop_at:
+            self.done = True
+
+    def enter_stage(self, stage):
+        self._record(("enter_stage", stage["stage"]))
+
+    def leave_stage(self, stage):
+        self._record(("leave_stage", stage["stage"]))
+
+    def enter_job(self, job, stage):
+        self._record(("enter_job", job["job"]))
+
+    def leave_job(self, job, stage):
+        self._record(("leave_job", job["job"]))
+
+    def visit_step(self, step):
+        self._record(("step", step["script"]))
+
+    def finish(self, params):
+        self._record(("finish",))
+
+WALK_ORDER_YAML = {
+    "stages": [
+        {"stage": "S1", "jobs": [{"job": "J1", "steps": [{"script": "a"}, {"script": "b"}]}], "steps": [{"script": "c"}]},
+    ],
+    "jobs": [{"job": "J2", "steps": [{"script": "d"}]}],
+    "steps": [{"script": "e"}],
+}
+
+def test_walk_pipeline_visits_in_document_order():
+    visitor = RecordingVisitor()
+    walk_pipeline(WALK_ORDER_YAML, [visitor])
+
+    assert visitor.calls == [
+        ("enter_stage", "S1"),
+        ("enter_job", "J1"),
+        ("step", "a"),
+        ("step", "b"),
+        ("leave_job", "J1"),
+        ("step", "c"),
+        ("leave_stage", "S1"),
+        ("enter_job", "J2"),
+        ("step", "d"),
+        ("leave_job", "J2"),
+        ("step", "e"),
+        ("finish",),
+    ]
+
+def test_walk_pipeline_stops_when_all_visitors_done():
+    early = RecordingVisitor(stop_at=("step", "a"))
+    late = RecordingVisitor(stop_at=("step", "d"))
+    walk_pipeline(WALK_ORDER_YAML, [early, late])
+
+    assert early.calls[-1] == ("step", "a")
+    assert late.calls[-1] == ("step", "d")
+    assert len(late.calls) == 9
+
+def test_scan_pipeline_matches_separate_searches():
+    for folder, _, files in os.walk(INPUT_DIR):
+        for name in files:
+            if not name.endswith(".yml"):
+                continue
+            params = localParser.parse_yml(name, os.path.join(folder, name))
+            scan = scan_pipeline(params, TASK_NAMES_IGNORE_CASE)
+
+            assert scan["pool"] == deep_search_single(params, "pool"), name
+            assert scan["templates"] == template_references(params), name
+            assert scan["publish"] == deep_search_single(params, "publish"), name
+            assert scan["tasks"] == deep_search_multi(params, TASK_NAMES_IGNORE_CASE), name
+
+def test_deep_search_multi_task_miss_checks_script():
+    yaml_data = {"steps": [{"task": "Bash@3", "script": "python build.py"}]}
+    assert deep_search_multi(yaml_data, ["python", "Bash"]) == ["python", "Bash"]
+
+def test_task_matcher_reports_hits_in_key_order():
+    matcher = compile_matcher(["Python", "python", "Java", "java", "JavaScript", "npm"])
+
+    assert matcher.find("npm run build && node JAVASCRIPT/index.js && python x.py") == [
+        "Python", "python", "Java", "java", "JavaScript", "npm"
+    ]
+    assert matcher.find("echo hello") == []
+    assert matcher.find(None) == []
+
+def test_task_matcher_compiled_once_per_key_list():
+    assert compile_matcher(["a", "b"]) is compile_matcher(["a", "b"])
+    assert compile_matcher(["a", "b"]) is not compile_matcher(["a", "c"])
+
+def test_register_task():
+    yaml_data = {"steps": [{"script": "acmebuild --release"}]}
+    assert deep_search_multi(yaml_data, TASK_NAMES_IGNORE_CASE) == []
+
+    parser.register_task("AcmeBuild", "Acme")
+    try:
+        assert TASK_NAMES_IGNORE_CASE[-1] == "AcmeBuild"
+        assert TASK_ALIAS_MAP["AcmeBuild"] == "Acme"
+        assert createPipeline(yaml_data).getTasks() == ["Acme"]
+    finally:
+        parser.TASK_REGISTRY.unregister("AcmeBuild")
+
+    assert "AcmeBuild" not in TASK_NAMES_IGNORE_CASE
+    assert "AcmeBuild" not in TASK_ALIAS_MAP
+
+def test_cron_describer_caches_descriptions():
+    describer = CronDescriber(maxsize=2)
+    with patch('YMLParser.cron_service.ExpressionDescriptor', wraps=ExpressionDescriptor) as mock_descriptor:
+        first = describer.describe("0 3 * * *")
+        second = describer.describe("0 3 * * *")
+        assert mock_descriptor.call_count == 1
+
+    assert first == second == cron_descriptor("0 3 * * *")
+    assert describer.stats()["hits"] == 1
+    assert describer.stats()["misses"] == 1
+    assert describer.stats()["hit_rate"] == 0.5
+
+def test_cron_describer_keys_on_options():
+    describer = CronDescriber()
+    sentence = describer.describe("0 15 * * Fri")
+    lower = describer.describe("0 15 * * Fri", casing_type=CasingTypeEnum.LowerCase)
+
+    assert lower == sentence.lower()
+    assert describer.stats()["misses"] == 2
+    assert shared_options(CasingTypeEnum.LowerCase) is shared_options(CasingTypeEnum.LowerCase)
+
+def test_cron_describer_bounded():
+    describer = CronDescriber(maxsize=2)
+    for expression in ["0 1 * * *", "0 2 * * *", "0 3 * * *"]:
+        describer.describe(expression)
+
+    assert describer.stats()["size"] == 2
+    describer.describe("0 1 * * *")
+    assert describer.stats()["misses"] == 4
+
+def test_describe_schedules_batch():
+    documents = [
+        {"schedules": [{"cron": "0 3 * * *"}]},
+        {"schedules": [{"cron": "0 3 * * *"}, {"cron": "0 4 * * *"}]},
+        {"trigger": ["main"]},
+        None,
+        {"schedules": [{"cron": "0 15 * * Fri"}]},
+    ]
+    descriptions = parser.describe_schedules(documents)
+
+    assert list(descriptions) == ["0 3 * * *", "0 15 * * Fri"]
+    assert descriptions["0 15 * * Fri"] == cron_descriptor("0 15 * * Fri")
+    assert parse_trigger(documents[0]) == descriptions["0 3 * * *"]
+
+def test_create_pipeline_looks_up_batch_descriptions():
+    documents = [{"schedules": [{"cron": "0 3 * * *"}]}, {"schedules": [{"cron": "0 3 * * *"}]}]
+    descriptions = parser.describe_schedules(documents)
+
+    with patch('YMLParser.cron_service.describer.describe') as mock_describe:
+        pipelines = [createPipeline(document, schedules=descriptions) for document in documents]
+        mock_describe.assert_not_called()
+
+    assert [p.getTrigger() for p in pipelines] == [descriptions["0 3 * * *"]] * 2
+
+def test_template_resolver_follows_nested_templates(tmp_path):
+    steps = tmp_path / "steps.yml"
+    steps.write_text("steps:\n  - script: npm install\n")
+    jobs = tmp_path / "jobs.yml"
+    jobs.write_text(f"jobs:\n  - job: Build\n    pool:\n      vmImage: ubuntu-latest\n    steps:\n      - template: {steps}\n")
+    params = {"extends": {"template": str(jobs)}, "steps": [{"script": "python run.py"}]}
+
+    resolver = TemplateResolver()
+    merged = resolver.resolve(params)
+
+    assert resolver.parse_count == 2
+    assert merged["jobs"][0]["job"] == "Build"
+    assert merged["steps"] == [{"script": "npm install"}]
+
+    pipeline = createPipeline(params, resolver)
+    assert pipeline.getOS() == "ubuntu-latest"
+    assert "npm" in pipeline.getTasks()
+    # Already parsed for this run
+    assert resolver.parse_count == 2
+
+def test_createPipeline_walks_the_pipeline_once(tmp_path):
+    steps = tmp_path / "steps.yml"
+    steps.write_text("steps:\n  - script: npm install\n")
+    params = {"steps": [{"template": str(steps)}, {"script": "python run.py"}]}
+
+    with patch("YMLParser.tree_walker.walk_pipeline", wraps=parser.tree_walker.walk_pipeline) as walk:
+        pipeline = createPipeline(params, TemplateResolver())
+
+    assert "npm" in pipeline.getTasks()
+    # One walk of the pipeline, the template's references and its own scan
+    walked = [call.args[0] for call in walk.call_args_list]
+    assert walked.count(params) == 1
+
+def test_template_resolver_detects_cycles(tmp_path, capsys):
+    first = tmp_path / "first.yml"
+    second = tmp_path / "second.yml"
+    first.write_text(f"steps:\n  - script: echo first\n  - template: {second}\n")
+    second.write_text(f"steps:\n  - script: echo second\n  - template: {first}\n")
+
+    resolver = TemplateResolver()
+    merged = resolver.resolve({"steps": [{"template": str(first)}]})
+
+    assert resolver.parse_count == 2
+    assert [step.get("script") for step in merged["steps"]] == ["echo first", None, "echo second", None]
+    assert "Template cycle detected" in capsys.readouterr().out
+
+def test_template_resolver_parses_shared_templates_once():
+    def fake_parse(filePath, repoID):
+        return {"steps": [{"script": f"echo {filePath}"}]}
+
+    resolver = TemplateResolver()
+    with patch("YMLParser.parser.parseTemplate", side_effect=fake_parse) as mock_parse:
+        for i in range(300):
+            createPipeline({"name": f"pipeline_{i}", "steps": [{"template": f"template_{i % 10}.yml"}]}, resolver)
+
+    assert mock_parse.call_count == 10
+    assert resolver.parse_count == 10
+
+def test_merge_templates():
+    assert merge_templates([]) is None
+    only = {"steps": [{"script": "a"}], "pool": "x"}
+    assert merge_templates([only]) is only
+    assert merge_templates([only, {"jobs": [{"job": "J"}], "steps": [{"script": "b"}]}]) == {
+        "jobs": [{"job": "J"}],
+        "steps": [{"script": "a"}, {"script": "b"}],
+    }
+
+def test_template_index_lookup():
+    index = TemplateIndex([
+        "templates/build/steps.yml",
+        "templates/deploy/steps.yml",
+        "/shared/templates/echo_hello_world.yml",
+        "templates/build/steps.yml",
+    ])
+
+    assert index.paths == [
+        os.path.normpath("templates/build/steps.yml"),
+        os.path.normpath("templates/deploy/steps.yml"),
+        os.path.normpath("/shared/templates/echo_hello_world.yml"),
+    ]
+    assert index.lookup("deploy/steps.yml") == os.path.normpath("templates/deploy/steps.yml")
+    assert index.lookup("/shared/templates/echo_hello_world.yml") == os.path.normpath("/shared/templates/echo_hello_world.yml")
+    # Not whole components, falls back to a substring search
+    assert index.lookup("hello_world") == os.path.normpath("/shared/templates/echo_hello_world.yml")
+    assert index.lookup("missing.yml") is None
+
+def test_template_index_ambiguous_match(capsys):
+    index = TemplateIndex(["templates/build/steps.yml", "templates/deploy/steps.yml"])
+
+    assert index.lookup("steps.yml") == os.path.normpath("templates/build/steps.yml")
+    assert index.lookup("steps.yml") == os.path.normpath("templates/build/steps.yml")
+    # Warned about once
+    assert capsys.readouterr().out.count("matches 2 templates") == 1
+
+def test_find_and_parse_template_with_index():
+    index = TemplateIndex(["repo/templates/steps.yml"])
+    params = {
+        "resources": {"repositories": [{"repository": "shared", "name": "SharedRepo"}]},
+        "steps": [{"template": "templates/steps.yml@shared"}],
+    }
+
+    with patch("builtins.open", side_effect=AssertionError("config file read")), \
+         patch("YMLParser.parser.parseTemplate", return_value={"steps": []}) as mock_parse_template:
+        find_and_parse_template(params, index=index)
+
+    mock_parse_template.assert_called_once_with(os.path.normpath("repo/templates/steps.yml"), "SharedRepo")
+
+def test_pipeline_is_slotted():
+    pipeline = Pipeline()
+    assert not hasattr(pipeline, "__dict__")
+    with pytest.raises(AttributeError):
+        pipeline.unknown = 1
+
+    # Lists come into existence when first used, and stay the same list after
+    tasks = pipeline.getTasks()
+    assert tasks == []
+    pipeline.addTask("Python")
+    assert pipeline.getTasks() is tasks
+    assert pipeline.getDependencies() == []
+
+def test_pipeline_interns_os_and_tasks():
+    first, second = Pipeline(), Pipeline()
+    first.setOS("".join(["ubuntu", "-latest"]))
+    second.setOS("".join(["ubuntu-", "latest"]))
+    first.addTask("".join(["Pyth", "on"]))
+    second.addTask("".join(["Py", "thon"]))
+
+    assert first.getOS() is second.getOS()
+    assert first.getTasks()[0] is second.getTasks()[0]
+
+def test_dependencies_are_name_references():
+    pipeline = createPipeline({
+        "name": "consumer",
+        "resources": {"pipelines": [{"pipeline": "upstream", "source": "Producer"}]},
+    })
+
+    dependency = pipeline.getDependencies()[0]
+    assert isinstance(dependency, DependencyRef)
+    assert dependency.getName() == "Producer"
+    dependency.setX(250)
+    dependency.setY(100)
+    assert (dependency.getX(), dependency.getY()) == (250, 100)
+    assert not hasattr(dependency, "__dict__")